@@ -0,0 +1,93 @@
+"""
+Compares the memory allocated per call by decrypting bytes-like envelopes into a
+reusable output buffer through libsodium, against splitting strings and decrypting
+through PyNaCl as `decrypt_content` and `decrypt_file` used to. Buffers allocated
+by cffi are not seen by `tracemalloc`, so the peaks before understate what was used.
+
+Run from the repository root with `python -m benchmarks.bench_alloc`.
+"""
+
+import base64
+import timeit
+import tracemalloc
+from typing import Callable
+
+from formsg.testing import SyntheticForm
+from formsg.util.crypto import (
+    DecryptionContext,
+    convert_encrypted_attachment_to_file_content,
+)
+
+SIZES = [1024, 64 * 1024, 1024 * 1024]
+REPEAT = 50
+
+
+def strings_and_pynacl(context: DecryptionContext, encrypted_content: str) -> bytes:
+    submission_public_key, nonce, ciphertext = map(
+        lambda part: base64.b64decode(part),
+        [encrypted_content.split(";")[0]] + encrypted_content.split(";")[1].split(":"),
+    )
+    return context.box(submission_public_key).decrypt(ciphertext, nonce)
+
+
+def file_with_pynacl(context: DecryptionContext, encrypted_file) -> bytes:
+    box = context.box(encrypted_file["submission_public_key"])
+    return box.decrypt(
+        encrypted_file["binary"], base64.b64decode(encrypted_file["nonce"])
+    )
+
+
+def peak_per_call(func: Callable[[], object]) -> int:
+    """
+    Returns the peak memory allocated by a call, after a warm-up call.
+    """
+    func()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    form = SyntheticForm()
+    print(f"{'scenario':<32} {'size':>8} {'peak (KB)':>10} {'time (ms)':>10}")
+    for size in SIZES:
+        context = DecryptionContext(form.secret_key)
+        encrypted_content = form.encrypt(bytes(size))
+        encrypted_bytes = encrypted_content.encode()
+        encrypted_file = convert_encrypted_attachment_to_file_content(
+            form.encrypt_attachment(bytes(size))
+        )
+        out = bytearray()
+        scenarios = [
+            (
+                "before: strings and PyNaCl",
+                lambda: strings_and_pynacl(context, encrypted_content),
+            ),
+            (
+                "decrypt_content(str)",
+                lambda: context.decrypt_content(encrypted_content),
+            ),
+            (
+                "decrypt_content(bytes)",
+                lambda: context.decrypt_content(encrypted_bytes),
+            ),
+            (
+                "decrypt_into(bytes, out)",
+                lambda: context.decrypt_into(encrypted_bytes, out),
+            ),
+            (
+                "before: file with PyNaCl",
+                lambda: file_with_pynacl(context, encrypted_file),
+            ),
+            ("decrypt_file", lambda: context.decrypt_file(encrypted_file)),
+        ]
+        for name, func in scenarios:
+            peak = peak_per_call(func)
+            elapsed = min(timeit.repeat(func, number=REPEAT, repeat=3)) / REPEAT
+            print(f"{name:<32} {size:>8} {peak / 1024:>10.1f} {elapsed * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares the JSON backends on decrypted submissions of 10, 100 and 1000 fields,
+parsing from bytes against the old decode-then-parse.
+
+Run from the repository root with `python -m benchmarks.bench_json`.
+"""
+
+import json
+import timeit
+
+from formsg.testing import generate_responses
+from formsg.util.json_backend import JSON_BACKENDS
+
+FIELD_COUNTS = [10, 100, 1000]
+REPEAT = 5
+
+
+def _available_backends():
+    backends = {}
+    for name, backend in JSON_BACKENDS.items():
+        try:
+            backends[name] = backend()
+        except ImportError:
+            print(f"{name} is not installed, skipping")
+    return backends
+
+
+def main():
+    backends = _available_backends()
+    print(
+        f"{'fields':>6} {'size (KB)':>10} {'decode+json (us)':>17}"
+        + "".join(f" {name + ' (us)':>12}" for name in backends)
+    )
+    for count in FIELD_COUNTS:
+        payload = json.dumps(generate_responses(count)).encode("utf-8")
+        number = max(10000 // count, 10)
+        timings = [
+            min(
+                timeit.repeat(
+                    lambda: json.loads(payload.decode("utf-8")),
+                    number=number,
+                    repeat=REPEAT,
+                )
+            )
+        ]
+        for backend in backends.values():
+            timings.append(
+                min(
+                    timeit.repeat(
+                        lambda: backend.loads(payload), number=number, repeat=REPEAT
+                    )
+                )
+            )
+        print(
+            f"{count:>6} {len(payload) / 1024:>10.1f}"
+            + f" {timings[0] / number * 1e6:>17.1f}"
+            + "".join(f" {t / number * 1e6:>12.1f}" for t in timings[1:])
+        )
+
+
+if __name__ == "__main__":
+    main()
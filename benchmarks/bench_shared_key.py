@@ -0,0 +1,79 @@
+"""
+Compares decrypting a submission with a fresh key exchange per payload against
+a single `DecryptionContext` shared by the content and every attachment.
+
+Run from the repository root with `python -m benchmarks.bench_shared_key`.
+"""
+
+import base64
+import timeit
+
+from nacl.public import Box, PrivateKey
+from nacl.utils import random
+
+from formsg.util.crypto import DecryptionContext
+
+ATTACHMENT_COUNTS = [0, 1, 5, 10, 20, 50]
+ATTACHMENT_SIZE = 1024
+REPEAT = 200
+
+
+def _b64(b: bytes) -> str:
+    return base64.b64encode(b).decode("utf-8")
+
+
+def _make_submission(attachment_count: int):
+    form_key = PrivateKey.generate()
+    submission_key = PrivateKey.generate()
+    box = Box(submission_key, form_key.public_key)
+    submission_public_key = _b64(bytes(submission_key.public_key))
+
+    nonce = random(Box.NONCE_SIZE)
+    encrypted_content = "{};{}:{}".format(
+        submission_public_key,
+        _b64(nonce),
+        _b64(box.encrypt(b"[]", nonce).ciphertext),
+    )
+    files = []
+    for _ in range(attachment_count):
+        nonce = random(Box.NONCE_SIZE)
+        files.append(
+            {
+                "submission_public_key": submission_public_key,
+                "nonce": _b64(nonce),
+                "binary": box.encrypt(random(ATTACHMENT_SIZE), nonce).ciphertext,
+            }
+        )
+    return _b64(bytes(form_key)), encrypted_content, files
+
+
+def per_payload(form_secret_key, encrypted_content, files):
+    DecryptionContext(form_secret_key).decrypt_content(encrypted_content)
+    for f in files:
+        DecryptionContext(form_secret_key).decrypt_file(f)
+
+
+def shared_context(form_secret_key, encrypted_content, files):
+    context = DecryptionContext(form_secret_key)
+    context.decrypt_content(encrypted_content)
+    for f in files:
+        context.decrypt_file(f)
+
+
+def main():
+    print(
+        f"{'attachments':>11} {'per-payload (ms)':>17} {'shared (ms)':>12} {'speedup':>8}"
+    )
+    for count in ATTACHMENT_COUNTS:
+        args = _make_submission(count)
+        before = min(timeit.repeat(lambda: per_payload(*args), number=REPEAT, repeat=3))
+        after = min(
+            timeit.repeat(lambda: shared_context(*args), number=REPEAT, repeat=3)
+        )
+        print(
+            f"{count:>11} {before / REPEAT * 1000:>17.3f} {after / REPEAT * 1000:>12.3f} {before / after:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
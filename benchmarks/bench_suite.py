@@ -0,0 +1,243 @@
+"""
+Measures throughput and p50/p99 latency of `Webhook.authenticate`, `Crypto.decrypt`,
+`Crypto.decrypt_file`, `Crypto.decrypt_attachments`, `Verification.authenticate_submission`
+and encryption on synthetic submissions,
+with attachments served from a local server so that it runs offline.
+
+Run from the repository root with `python -m benchmarks.bench_suite`.
+Save a baseline with `--save baseline.json`, and compare a later run against it
+with `--baseline baseline.json`. Scenarios whose p50 latency grew by more than
+`--threshold` are reported as regressions.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from formsg.crypto import Crypto
+from formsg.testing import AttachmentServer, SyntheticForm, generate_responses
+from formsg.util.crypto import (
+    convert_encrypted_attachment_to_file_content,
+    generate_signing_keypair,
+)
+from formsg.util.verification import sign_field
+from formsg.verification import Verification
+from formsg.webhook import Webhook
+
+URI = "https://example.com/submissions"
+
+Result = Dict[str, float]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Returns the p-th percentile of sorted values, by the nearest-rank method.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def measure(func: Callable[[], object], min_time: float, min_runs: int) -> Result:
+    """
+    Calls `func` repeatedly, after a few warm-up calls, for at least `min_time`
+    seconds and `min_runs` calls.
+    """
+    for _ in range(3):
+        func()
+    latencies: List[float] = []
+    started = time.perf_counter()
+    while len(latencies) < min_runs or time.perf_counter() - started < min_time:
+        call_started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_started)
+    total = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "runs": len(latencies),
+        "ops_per_sec": len(latencies) / total,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def scenarios(server: AttachmentServer) -> List[Tuple[str, Callable[[], object]]]:
+    small, large = SyntheticForm(field_count=10), SyntheticForm(field_count=1000)
+    form = SyntheticForm(field_count=100)
+    crypto = Crypto(form.signing_public_key)
+    webhook = Webhook(form.signing_public_key)
+
+    params = form.submission()
+    header = form.signature_header(URI, params["submissionId"])  # type: ignore
+    verified_params = form.submission(verified=True)
+    small_params, large_params = small.submission(), large.submission()
+    small_crypto = Crypto(small.signing_public_key)
+    large_crypto = Crypto(large.signing_public_key)
+    file = os.urandom(1024 * 1024)
+    encrypted_file = convert_encrypted_attachment_to_file_content(
+        form.encrypt_attachment(file)
+    )
+    responses = crypto.decrypt(form.secret_key, params)["responses"]  # type: ignore
+    field_ids = [response["_id"] for response in responses[:3]]
+    large_field_ids = [f"{i:024x}" for i in (5, 500, 995)]
+
+    # reads a few fields and not the verified content, as most consumers do
+    def decrypt_submission():
+        submission = crypto.decrypt_submission(form.secret_key, verified_params)
+        return [submission.answer(field_id) for field_id in field_ids]  # type: ignore
+
+    attachment_params = form.submission(
+        attachment_sizes=[256 * 1024] * 3, server=server
+    )
+
+    # a verified email or mobile answer in every 20 fields
+    verification_keypair = generate_signing_keypair()
+    verification = Verification(
+        verification_keypair["publicKey"], transaction_expiry=3600
+    )
+    created_at = int(time.time() * 1000)
+    signed_responses = generate_responses(100)
+    for response in signed_responses[::20]:
+        response["answer"] = "test@open.gov.sg"
+        response["signature"] = sign_field(
+            "transaction",
+            form.form_id,
+            response["_id"],
+            response["answer"],
+            verification_keypair["secretKey"],
+            created_at - 1000,
+        )
+
+    return [
+        ("authenticate", lambda: webhook.authenticate(header, URI)),
+        (
+            "decrypt[10 fields]",
+            lambda: small_crypto.decrypt(small.secret_key, small_params),
+        ),
+        ("decrypt[100 fields]", lambda: crypto.decrypt(form.secret_key, params)),
+        (
+            "decrypt[1000 fields]",
+            lambda: large_crypto.decrypt(large.secret_key, large_params),
+        ),
+        (
+            "decrypt[1000 fields, 3 projected]",
+            lambda: large_crypto.decrypt(
+                large.secret_key, large_params, fields=large_field_ids
+            ),
+        ),
+        (
+            "decrypt[100 fields, verified]",
+            lambda: crypto.decrypt(form.secret_key, verified_params),
+        ),
+        ("decrypt_submission[100 fields, verified]", decrypt_submission),
+        (
+            "authenticate_submission[5 signed]",
+            lambda: verification.authenticate_submission(signed_responses, created_at),
+        ),
+        (
+            "decrypt_file[1 MB]",
+            lambda: crypto.decrypt_file(form.secret_key, encrypted_file),
+        ),
+        ("encrypt[100 fields]", lambda: crypto.encrypt(responses, form.public_key)),
+        ("encrypt_file[1 MB]", lambda: crypto.encrypt_file(file, form.public_key)),
+        (
+            "decrypt_attachments[3 x 256 KB]",
+            lambda: crypto.decrypt_attachments(form.secret_key, attachment_params),
+        ),
+    ]
+
+
+def compare(
+    results: Dict[str, Result], baseline: Dict[str, Result]
+) -> Dict[str, Optional[float]]:
+    """
+    Returns the relative change in p50 latency of each scenario against the baseline,
+    or None for scenarios missing from the baseline.
+    """
+    changes: Dict[str, Optional[float]] = {}
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or not before.get("p50_ms"):
+            changes[name] = None
+        else:
+            changes[name] = result["p50_ms"] / before["p50_ms"] - 1
+    return changes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", help="JSON results of an earlier run")
+    parser.add_argument("--save", help="Write the results as JSON to this path")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative growth in p50 latency reported as a regression (default 0.1)",
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=1.0, help="Seconds to run each scenario"
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 1 if any scenario regressed",
+    )
+    args = parser.parse_args(argv)
+
+    baseline: Dict[str, Result] = {}
+    if args.baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        else:
+            print(f"No baseline at {args.baseline}, skipping comparison")
+
+    results: Dict[str, Result] = {}
+    with AttachmentServer() as server:
+        for name, func in scenarios(server):
+            results[name] = measure(func, args.min_time, min_runs=20)
+
+    changes = compare(results, baseline)
+    print(
+        f"{'scenario':<40} {'ops/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}"
+        + (f" {'vs baseline':>12}" if baseline else "")
+    )
+    regressions = []
+    for name, result in results.items():
+        line = f"{name:<40} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f}"
+        change = changes[name]
+        if baseline:
+            line += f" {'-':>12}" if change is None else f" {change:>+11.1%}"
+            if change is not None and change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    if regressions:
+        print(
+            f"{len(regressions)} scenario(s) regressed by more than {args.threshold:.0%}"
+        )
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Tracks the per-call cost of `Webhook.authenticate`, and compares it against
+building the `VerifyKey` on every call.
+
+Run from the repository root with `python -m benchmarks.bench_webhook`.
+"""
+
+import base64
+import time
+import timeit
+
+from nacl.bindings import crypto_sign_keypair
+
+from formsg.util.crypto import load_verify_key
+from formsg.util.parser import parse_signature_header
+from formsg.util.webhook import has_epoch_expired, is_signature_valid
+from formsg.webhook import Webhook
+
+NUMBER = 5000
+URI = "https://some-endpoint.com/post"
+
+
+def main():
+    public_key, secret_key = crypto_sign_keypair()
+    webhook = Webhook(
+        base64.b64encode(public_key).decode("utf-8"),
+        base64.b64encode(secret_key).decode("utf-8"),
+    )
+    epoch = int(time.time() * 1000)
+    params = {
+        "uri": URI,
+        "submissionId": "someSubmissionId",
+        "formId": "someFormId",
+        "epoch": epoch,
+    }
+    header = webhook.construct_header(
+        dict(params, signature=webhook.generate_signature(params))
+    )
+
+    def uncached():
+        signature_header = parse_signature_header(header)
+        has_epoch_expired(signature_header["t"])
+        verify_key = load_verify_key.__wrapped__(webhook.public_key)  # type: ignore
+        is_signature_valid(URI, signature_header, verify_key)
+
+    cached = min(
+        timeit.repeat(
+            lambda: webhook.authenticate(header, URI), number=NUMBER, repeat=3
+        )
+    )
+    rebuilt = min(timeit.repeat(uncached, number=NUMBER, repeat=3))
+    print(f"Webhook.authenticate:       {cached / NUMBER * 1e6:8.1f} us/call")
+    print(f"VerifyKey built per call:   {rebuilt / NUMBER * 1e6:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,33 @@
 import json
-from flask import Flask, request, Response
+
+from flask import Flask, Response, request
+
 import formsg
-from formsg.exceptions import WebhookAuthenticateException
+from formsg.middleware import WebhookWSGIMiddleware
 
 app = Flask(__name__)
 
 FORM_SECRET_KEY = "YOUR-SECRET-KEY"
-YOUR_WEBHOOK_URI = "your-webhook-uri"
+YOUR_WEBHOOK_URI = "https://your-domain.com/webhook"
 
 # accepts STAGING or PRODUCTION, determines whether to use staging or production public signing keys
 sdk = formsg.FormSdk("PRODUCTION")
 
+# authenticates each webhook from its X-FormSG-Signature header before the body is read,
+# then decrypts it once. Webhooks that fail are rejected before reaching the route.
+# pass attachments=True to also download and decrypt attachments
+app.wsgi_app = WebhookWSGIMiddleware(  # type: ignore
+    app.wsgi_app, sdk, YOUR_WEBHOOK_URI, FORM_SECRET_KEY
+)
+
 
 @app.route("/webhook", methods=["POST"])
 def webhook_route():
-    posted_data = json.loads(request.data)
-
-    try:
-        sdk.webhooks.authenticate(
-            request.headers["X-FormSG-Signature"], YOUR_WEBHOOK_URI
-        )
-    except WebhookAuthenticateException as e:
-        print(e)
-        return Response("Unauthorized", 401)
-
-    # decryption without attachments
-    # if `verifiedContent` exists as a key in `posted_data['data']`, the return object will include a verified key
-    responses = sdk.crypto.decrypt(FORM_SECRET_KEY, posted_data["data"])
-
-    # decryption with attachments
-    responses_with_attachments = sdk.crypto.decrypt_with_attachments(
-        FORM_SECRET_KEY, posted_data["data"]
-    )
+    submission = request.environ["formsg.submission"]
+
+    # if `verifiedContent` was submitted, the content will include a verified key
+    responses = submission["content"]["responses"]
+    print(submission["submissionId"], len(responses))
+
+    # with attachments=True, `submission["attachments"]` maps field IDs to decrypted files
     return Response(json.dumps({"message": "ok"}), 202)
@@ -1 +1,30 @@
-from formsg.sdk import FormSdk  # noqa
+import sys
+from typing import TYPE_CHECKING
+
+# the public API is imported on first access, so that `import formsg` stays cheap
+# for processes, like serverless webhook receivers, that only use part of it
+_EXPORTS = {
+    "FormKeyring": "formsg.keyring",
+    "FormSdk": "formsg.sdk",
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING or sys.version_info < (3, 7):
+    # module `__getattr__` needs Python 3.7
+    from formsg.keyring import FormKeyring  # noqa
+    from formsg.sdk import FormSdk  # noqa
+else:
+
+    def __getattr__(name: str):
+        module = _EXPORTS.get(name)
+        if module is None:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        import importlib
+
+        value = getattr(importlib.import_module(module), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(list(globals()) + __all__)
@@ -0,0 +1,5 @@
+import sys
+
+from formsg.cli import main
+
+sys.exit(main())
@@ -0,0 +1,403 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Collection, Dict, Optional, Union
+
+from formsg.cache import DecryptCache, attachment_cache_key
+from formsg.exceptions import (
+    AttachmentDecryptionException,
+    AttachmentDownloadException,
+    AttachmentTooLargeException,
+)
+from formsg.instrumentation import Observer, Stage
+from formsg.keyring import FormKeyring
+from formsg.limits import Limit, Limits
+from formsg.replay import ReplayCache
+from formsg.schemas.crypto import (
+    DecryptedContent,
+    DecryptedContentAndAttachments,
+    DecryptedFile,
+    DecryptParams,
+)
+from formsg.sdk import FormSdk
+from formsg.util.crypto import (
+    DecryptionContext,
+    FormSecretKey,
+    convert_encrypted_attachment_to_file_content,
+)
+from formsg.util.json_backend import JsonBackend
+
+logger = logging.getLogger(__name__)
+
+# seconds each attachment download may take, unless another timeout is given
+DEFAULT_TIMEOUT = 30.0
+
+
+class AsyncTransport(ABC):
+    """
+    The HTTP client used by :class:`AsyncFormSdk` to download attachments.
+    """
+
+    @abstractmethod
+    async def get(self, url: str, timeout: Optional[float] = None) -> bytes:
+        """
+        Downloads the body at the given URL.
+        :param url: The URL to download
+        :param timeout: Timeout in seconds. Defaults to the transport's own.
+        :raises AttachmentDownloadException: if the body could not be downloaded
+        """
+
+    async def close(self):
+        pass
+
+
+class AiohttpTransport(AsyncTransport):
+    def __init__(
+        self,
+        limit: int = 32,
+        limits: Optional[Limits] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+        Downloads over a shared `aiohttp.ClientSession`. Requires `aiohttp` to be installed.
+        :param limit: Maximum number of simultaneous connections
+        :param limits: Optional limits whose `max_attachment_size` is enforced while downloading
+        :param timeout: Default timeout of each download in seconds
+        """
+        import aiohttp  # noqa: F401
+
+        self.limit = limit
+        self.limits = limits
+        self.timeout = timeout
+        self._session: Any = None
+
+    async def get(self, url: str, timeout: Optional[float] = None) -> bytes:
+        import aiohttp
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit)
+            )
+        try:
+            async with self._session.get(
+                url,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.timeout if timeout is None else timeout
+                ),
+            ) as response:
+                response.raise_for_status()
+                if self.limits is None or self.limits.max_attachment_size is None:
+                    return await response.read()
+                return await self._read_limited(response, self.limits)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise AttachmentDownloadException(
+                f"Failed to download attachment: {e}"
+            ) from e
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @staticmethod
+    async def _read_limited(response: Any, limits: Limits) -> bytes:
+        limit = limits.max_attachment_size
+        if response.content_length is not None:
+            if not limits.allows_attachment(response.content_length):
+                raise AttachmentTooLargeException(
+                    f"Attachment of {response.content_length} bytes exceeds the maximum size"
+                )
+            return await response.read()
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(65536):
+            body += chunk
+            if len(body) > limit:  # type: ignore
+                limits.reject(Limit.ATTACHMENT_SIZE)
+                raise AttachmentTooLargeException(
+                    f"Attachment exceeds the maximum size of {limit} bytes"
+                )
+        return bytes(body)
+
+
+class RequestsTransport(AsyncTransport):
+    def __init__(
+        self,
+        limit: int = 32,
+        limits: Optional[Limits] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+        Downloads over a pooled `requests.Session` on a thread pool, for when `aiohttp` is not installed.
+        :param limit: Maximum number of simultaneous connections
+        :param limits: Optional limits whose `max_attachment_size` is enforced while downloading
+        :param timeout: Default read timeout of each download in seconds
+        """
+        from formsg.attachments import AttachmentDownloader
+
+        self._downloader = AttachmentDownloader(
+            max_workers=limit,
+            retries=0,
+            timeout=(3.05, timeout),
+            limits=limits or Limits(max_attachment_size=None),
+        )
+
+    async def get(self, url: str, timeout: Optional[float] = None) -> bytes:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._downloader._executor, self._get, url, timeout
+        )
+
+    def _get(self, url: str, timeout: Optional[float]) -> bytes:
+        import requests
+
+        downloader = self._downloader
+        try:
+            response = downloader.session.get(
+                url, timeout=timeout or downloader.timeout, stream=True
+            )
+            with response:
+                response.raise_for_status()
+                if downloader._content_length(response) is None:
+                    return b"".join(downloader._iter_content(response, None))
+                return response.content
+        except requests.RequestException as e:
+            raise AttachmentDownloadException(
+                f"Failed to download attachment: {e}"
+            ) from e
+
+    async def close(self):
+        self._downloader.close()
+
+
+def default_transport(
+    limit: int = 32, limits: Optional[Limits] = None, timeout: float = DEFAULT_TIMEOUT
+) -> AsyncTransport:
+    try:
+        return AiohttpTransport(limit, limits, timeout)
+    except ImportError:
+        return RequestsTransport(limit, limits, timeout)
+
+
+class AsyncFormSdk(object):
+    def __init__(
+        self,
+        mode: str,
+        webhook_secret_key: Optional[str] = None,
+        keyring: Optional[FormKeyring] = None,
+        transport: Optional[AsyncTransport] = None,
+        max_connections: int = 32,
+        executor: Optional[Executor] = None,
+        json_backend: Union[str, JsonBackend, None] = None,
+        validator: Optional[Callable[[Any], bool]] = None,
+        observer: Optional[Observer] = None,
+        replay_cache: Optional[ReplayCache] = None,
+        cache: Optional[DecryptCache] = None,
+        verification_public_key: Optional[str] = None,
+        verification_secret_key: Optional[str] = None,
+        transaction_expiry: Optional[float] = None,
+        limits: Optional[Limits] = None,
+        download_timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+        An asyncio version of :class:`FormSdk`, for webhook handlers running on an event loop.
+        Attachments are downloaded concurrently on `transport`, and the CPU-bound crypto is run on `executor`.
+        :param mode: STAGING or PRODUCTION
+        :param webhook_secret_key: Optional webhook secret key, needed to generate signatures
+        :param keyring: Optional keyring holding the secret keys of many forms
+        :param transport: HTTP client to download attachments with. Defaults to `aiohttp` if installed, else a threaded `requests` session.
+        :param max_connections: Maximum number of attachments downloaded at once
+        :param executor: Executor to run crypto on. Defaults to a thread pool.
+        :param json_backend: The JSON backend to parse submissions and attachment records with, or its name. Defaults to `orjson` if installed.
+        :param validator: Checks the shape of decrypted responses. See :class:`Crypto`.
+        :param observer: Optional callable reporting the duration and size of each stage, see :mod:`formsg.instrumentation`
+        :param replay_cache: Optional cache of the webhooks received, to reject replays with. See :mod:`formsg.replay`.
+        :param cache: Optional cache of decrypted attachments, so that retried webhooks are not downloaded and decrypted again. See :mod:`formsg.cache`.
+        :param verification_public_key: Optional public key to authenticate verified fields with. See :class:`Verification`.
+        :param verification_secret_key: Optional secret key, needed to generate signatures of verified fields
+        :param transaction_expiry: How long a verification stays valid, in seconds. Needed to authenticate verified fields.
+        :param limits: Limits on the size of webhooks, submissions and attachments, checked before they are decoded. See :mod:`formsg.limits`.
+        :param download_timeout: Timeout of each attachment download in seconds, so that a stalled download fails even without a `timeout` for the whole submission
+        """
+        self._sdk = FormSdk(
+            mode,
+            webhook_secret_key,
+            keyring,
+            json_backend=json_backend,
+            validator=validator,
+            observer=observer,
+            replay_cache=replay_cache,
+            cache=cache,
+            verification_public_key=verification_public_key,
+            verification_secret_key=verification_secret_key,
+            transaction_expiry=transaction_expiry,
+            limits=limits,
+        )
+        self.mode = self._sdk.mode
+        self.public_key = self._sdk.public_key
+        self.keyring = keyring
+        self.crypto = self._sdk.crypto
+        self.webhooks = self._sdk.webhooks
+        self.verification = self._sdk.verification
+        self.limits = self._sdk.limits
+        self.download_timeout = download_timeout
+        self.transport = transport or default_transport(
+            max_connections, self.limits, download_timeout
+        )
+        self.max_connections = max_connections
+        self.executor = executor or ThreadPoolExecutor()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def authenticate(self, header: str, uri: str) -> bool:
+        """
+        Authenticates a webhook. See :meth:`Webhook.authenticate`.
+        :raises WebhookAuthenticateException: If the signature or uri cannot be verified
+        """
+        return await self._run(self.webhooks.authenticate, header, uri)
+
+    async def decrypt(
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        fields: Optional[Collection[str]] = None,
+    ) -> Union[DecryptedContent, None]:
+        """
+        Decrypts an encrypted submission. See :meth:`Crypto.decrypt`.
+        """
+        return await self._run(
+            self.crypto.decrypt, form_secret_key, decrypt_params, fields
+        )
+
+    async def decrypt_attachments(
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        timeout: Optional[float] = None,
+        fields: Optional[Collection[str]] = None,
+    ) -> Union[DecryptedContentAndAttachments, None]:
+        """
+        Decrypts an encrypted submission, and downloads and decrypts its attachments concurrently.
+        See :meth:`Crypto.decrypt_attachments`.
+        :param timeout: Optional time limit in seconds for downloading all attachments
+        :param fields: Optional IDs of the fields to return. Only the attachments of these fields are downloaded.
+        """
+        if "attachmentDownloadUrls" not in decrypt_params:
+            logger.error("`attachmentDownloadUrls` param not passed")
+            return None
+
+        attachment_records = self.crypto._project_attachments(
+            decrypt_params.get("attachmentDownloadUrls", {}), fields  # type: ignore
+        )
+        # loading the form secret key derives its public key, an X25519 operation
+        context = await self._run(self.crypto._create_context, form_secret_key)
+        if not context:
+            return None
+        decrypted_content = await self._run(
+            self.crypto._decrypt, context, decrypt_params, fields
+        )
+        if not decrypted_content:
+            return None
+        filenames = self.crypto._attachment_filenames(
+            decrypted_content, attachment_records  # type: ignore
+        )
+        if filenames is None:
+            return None
+
+        try:
+            decrypted_records = await asyncio.wait_for(
+                self._decrypt_records(
+                    context,
+                    filenames,
+                    attachment_records,  # type: ignore
+                    decrypt_params.get("submissionId"),
+                ),
+                timeout,
+            )
+        except AttachmentDecryptionException:
+            raise
+        except Exception as e:
+            logger.error(e)
+            return None
+        return {"content": decrypted_content, "attachments": decrypted_records}
+
+    async def close(self):
+        await self.transport.close()
+
+    async def _decrypt_records(
+        self,
+        context: DecryptionContext,
+        filenames: Dict[str, str],
+        attachment_records: Dict[str, str],
+        submission_id: Optional[str] = None,
+    ) -> Dict[str, DecryptedFile]:
+        field_ids = list(attachment_records)
+        decrypted_files = await asyncio.gather(
+            *[
+                self._decrypt_record(
+                    context, attachment_records[field_id], submission_id
+                )
+                for field_id in field_ids
+            ]
+        )
+        return {
+            field_id: {"filename": filenames[field_id], "content": decrypted_file}
+            for field_id, decrypted_file in zip(field_ids, decrypted_files)
+        }
+
+    async def _decrypt_record(
+        self, context: DecryptionContext, url: str, submission_id: Optional[str] = None
+    ) -> bytes:
+        cache = self.crypto.cache
+        key = None
+        if cache is not None and submission_id:
+            key = attachment_cache_key(submission_id, url)
+            # a disk tier blocks, so lookups are run on the executor
+            cached = await self._run(cache.get, key)
+            if cached is not None:
+                return cached
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        observer = self.crypto.observer
+        async with self._semaphore:
+            if observer is not None:
+                started = time.perf_counter()
+            body = await self.transport.get(url, self.download_timeout)
+            # for transports that do not enforce the limit as they download
+            if not self.limits.allows_attachment(len(body)):
+                raise AttachmentTooLargeException(
+                    f"Attachment of {len(body)} bytes exceeds the maximum size"
+                )
+            if observer is not None:
+                observer(
+                    Stage.ATTACHMENT_DOWNLOAD, time.perf_counter() - started, len(body)
+                )
+        decrypted_file = await self._run(
+            _decrypt_attachment_body, context, body, self.crypto.json_backend, observer
+        )
+        if key is not None:
+            await self._run(cache.set, key, decrypted_file)  # type: ignore
+        return decrypted_file
+
+    async def _run(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+
+def _decrypt_attachment_body(
+    context: DecryptionContext,
+    body: bytes,
+    json_backend: JsonBackend,
+    observer: Optional[Observer] = None,
+) -> bytes:
+    if observer is not None:
+        started = time.perf_counter()
+    encrypted_file = convert_encrypted_attachment_to_file_content(
+        json_backend.loads(body)
+    )
+    decrypted_file = context.decrypt_file(encrypted_file)
+    if observer is not None:
+        observer(Stage.ATTACHMENT_DECRYPT, time.perf_counter() - started, len(body))
+    if not decrypted_file:
+        raise AttachmentDecryptionException()
+    return decrypted_file
@@ -0,0 +1,259 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+
+from formsg.exceptions import AttachmentDownloadException, AttachmentTooLargeException
+from formsg.limits import Limit, Limits
+from formsg.util.json_backend import JsonBackend, get_json_backend
+
+# `requests` is imported when the first session is created, so that importing
+# the SDK does not pay for it unless attachments are downloaded
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# (connect timeout, read timeout) in seconds, as accepted by `requests`
+Timeout = Union[float, Tuple[float, float]]
+
+
+class AttachmentDownloader(object):
+    def __init__(
+        self,
+        max_workers: int = 8,
+        pool_maxsize: Optional[int] = None,
+        timeout: Timeout = (3.05, 30),
+        retries: int = 3,
+        backoff_factor: float = 0.2,
+        submission_timeout: Optional[float] = None,
+        session: Optional["requests.Session"] = None,
+        chunk_size: int = 65536,
+        json_backend: Union[str, JsonBackend, None] = None,
+        limits: Optional[Limits] = None,
+    ):
+        """
+        Downloads the attachments of submissions concurrently over a shared, pooled HTTP session.
+        :param max_workers: Maximum number of attachments downloaded and decrypted at once
+        :param pool_maxsize: Maximum number of connections kept open per host. Defaults to max_workers.
+        :param timeout: Timeout of each request in seconds, or a (connect, read) tuple
+        :param retries: Number of times a failed request is retried, with exponential backoff
+        :param backoff_factor: Backoff factor in seconds between retries
+        :param submission_timeout: Default time limit in seconds for downloading all the attachments of one submission. None for no limit.
+        :param session: Optional session to use instead of creating one
+        :param chunk_size: Size in bytes of the chunks read when streaming an attachment
+        :param json_backend: The JSON backend to parse attachment records with, or its name. Defaults to `orjson` if installed.
+        :param limits: Limits whose `max_attachment_size` is enforced while downloading, from the Content-Length if given, else by counting the bytes read. Defaults to :class:`Limits` with its default values.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.submission_timeout = submission_timeout
+        self.chunk_size = chunk_size
+        self.json_backend = get_json_backend(json_backend)
+        self.limits = limits or Limits()
+        self._session = session
+        self._session_args = (pool_maxsize or max_workers, retries, backoff_factor)
+        self._session_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def session(self) -> "requests.Session":
+        """
+        The pooled HTTP session, created on first use.
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session(*self._session_args)
+        return self._session
+
+    @staticmethod
+    def _create_session(
+        pool_maxsize: int, retries: int, backoff_factor: float
+    ) -> "requests.Session":
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+        )
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def fetch(self, url: str, deadline: Optional[float] = None) -> Any:
+        """
+        Downloads an encrypted attachment record.
+        :param url: The attachment download URL
+        :param deadline: Optional `time.monotonic()` value by which the download must complete
+        :returns the decoded JSON body
+        :raises AttachmentDownloadException: if the attachment could not be downloaded in time
+        :raises AttachmentTooLargeException: if the attachment is larger than `limits.max_attachment_size`
+        """
+        try:
+            response = self.session.get(
+                url, timeout=self._timeout_before(deadline), stream=True
+            )
+            with response:
+                response.raise_for_status()
+                content_length = self._content_length(response)
+                if content_length is None:
+                    body = b"".join(self._iter_content(response, deadline))
+                else:
+                    body = response.content
+            # parsed from the raw body, skipping the charset detection and
+            # decoding of `response.json()`
+            return self.json_backend.loads(body)
+        except (_request_exception(), ValueError) as e:
+            raise AttachmentDownloadException(
+                f"Failed to download attachment: {e}"
+            ) from e
+
+    def fetch_stream(
+        self, url: str, deadline: Optional[float] = None
+    ) -> Tuple[Optional[int], Iterator[bytes]]:
+        """
+        Starts downloading an encrypted attachment record without reading its body into memory.
+        :param url: The attachment download URL
+        :param deadline: Optional `time.monotonic()` value by which the download must complete
+        :returns the size of the body if known, and an iterator over chunks of the body
+        :raises AttachmentDownloadException: if the attachment could not be downloaded in time
+        :raises AttachmentTooLargeException: if the attachment is larger than `limits.max_attachment_size`
+        """
+        try:
+            response = self.session.get(
+                url, timeout=self._timeout_before(deadline), stream=True
+            )
+            response.raise_for_status()
+            content_length = self._content_length(response)
+        except _request_exception() as e:
+            raise AttachmentDownloadException(
+                f"Failed to download attachment: {e}"
+            ) from e
+        except AttachmentTooLargeException:
+            response.close()
+            raise
+        return content_length, self._iter_content(response, deadline)
+
+    def map(
+        self,
+        func: Callable[[str, str], T],
+        urls: Mapping[str, str],
+        deadline: Optional[float] = None,
+    ) -> Dict[str, T]:
+        """
+        Calls `func(field_id, url)` for every attachment on the worker pool, and collects the results.
+        :param func: Called with each field ID and download URL, typically to download and decrypt the attachment
+        :param urls: Mapping of field ID to attachment download URL
+        :param deadline: Optional `time.monotonic()` value by which all the calls must complete
+        :returns a mapping of field ID to the result of `func`
+        :raises AttachmentDownloadException: if the deadline was exceeded
+        """
+        futures: Dict[str, Future] = {
+            field_id: self._executor.submit(func, field_id, url)
+            for field_id, url in urls.items()
+        }
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        done, not_done = wait(
+            futures.values(), timeout=timeout, return_when=FIRST_EXCEPTION
+        )
+        for future in not_done:
+            future.cancel()
+
+        results = {}
+        for field_id, future in futures.items():
+            if future in done:
+                # re-raises the first exception hit by any attachment
+                results[field_id] = future.result()
+        if not_done:
+            raise AttachmentDownloadException("Submission deadline exceeded")
+        return results
+
+    def deadline(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Returns the `time.monotonic()` value by which a submission's attachments must be downloaded.
+        :param timeout: Time limit in seconds. Defaults to `submission_timeout`.
+        """
+        if timeout is None:
+            timeout = self.submission_timeout
+        return None if timeout is None else time.monotonic() + timeout
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+    def _content_length(self, response: "requests.Response") -> Optional[int]:
+        # rejects a body declared too large before any of it is read
+        content_length = response.headers.get("Content-Length")
+        try:
+            size = int(content_length) if content_length else None
+        except ValueError:
+            return None
+        if size is not None and not self.limits.allows_attachment(size):
+            raise AttachmentTooLargeException(
+                f"Attachment of {size} bytes exceeds the maximum size"
+            )
+        return size
+
+    def _iter_content(
+        self, response: "requests.Response", deadline: Optional[float]
+    ) -> Iterator[bytes]:
+        # bodies without a Content-Length are counted as they are read
+        limit = self.limits.max_attachment_size
+        size = 0
+        try:
+            with response:
+                for chunk in response.iter_content(self.chunk_size):
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise AttachmentDownloadException(
+                            "Submission deadline exceeded"
+                        )
+                    size += len(chunk)
+                    if limit is not None and size > limit:
+                        self.limits.reject(Limit.ATTACHMENT_SIZE)
+                        raise AttachmentTooLargeException(
+                            f"Attachment exceeds the maximum size of {limit} bytes"
+                        )
+                    yield chunk
+        except _request_exception() as e:
+            raise AttachmentDownloadException(
+                f"Failed to download attachment: {e}"
+            ) from e
+
+    def _timeout_before(self, deadline: Optional[float]) -> Timeout:
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise AttachmentDownloadException("Submission deadline exceeded")
+        if isinstance(self.timeout, tuple):
+            return (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+        return min(self.timeout, remaining)
+
+
+def _request_exception() -> Type[Exception]:
+    # only evaluated when handling an exception, so `requests` is imported lazily
+    import requests
+
+    return requests.RequestException
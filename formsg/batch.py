@@ -0,0 +1,200 @@
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from nacl.public import PrivateKey
+
+from formsg.crypto import Crypto
+from formsg.exceptions import DecryptWorkerException
+from formsg.limits import Limits
+from formsg.result import LIMIT_FAILURES, DecryptFailureReason
+from formsg.schemas.crypto import DecryptManyResult, DecryptParams
+from formsg.util.crypto import DecryptionContext, FormSecretKey
+from formsg.util.json_backend import JsonBackend
+
+# set in each worker process by `_init_worker`, so that the keys are decoded
+# once per worker instead of once per payload
+_worker_crypto: Optional[Crypto] = None
+_worker_private_key: Optional[PrivateKey] = None
+_worker_batch: Optional[bytes] = None
+
+_Chunk = List[Tuple[int, DecryptParams]]
+
+# an ID unique to each batch, then the arguments of `_init_worker`
+_Setup = Tuple[bytes, str, bytes, JsonBackend, Callable[[Any], bool], Limits]
+
+# rejections by a limit are counted in the workers' copies of the limits
+_FAILURE_LIMITS = {reason: limit for limit, reason in LIMIT_FAILURES.items()}
+
+
+def decrypt_many(
+    crypto: Crypto,
+    form_secret_key: FormSecretKey,
+    iterable: Iterable[DecryptParams],
+    workers: Optional[int] = None,
+    chunksize: int = 64,
+    ordered: bool = True,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[DecryptManyResult]:
+    """
+    Decrypts many submissions on a pool of worker processes. See :meth:`Crypto.decrypt_many`.
+    """
+    # decoded before the generator is created, so that a bad key fails at the call
+    # rather than in every worker
+    private_key = DecryptionContext(form_secret_key).private_key
+    return _decrypt_many(
+        crypto, private_key, iterable, workers, chunksize, ordered, max_in_flight
+    )
+
+
+def _decrypt_many(
+    crypto: Crypto,
+    private_key: PrivateKey,
+    iterable: Iterable[DecryptParams],
+    workers: Optional[int],
+    chunksize: int,
+    ordered: bool,
+    max_in_flight: Optional[int],
+) -> Iterator[DecryptManyResult]:
+    chunks = _chunked(iterable, chunksize)
+
+    if workers == 0:
+        for chunk in chunks:
+            yield from _decrypt_chunk(crypto, private_key, chunk)
+        return
+
+    workers = workers or multiprocessing.cpu_count()
+    if max_in_flight is None:
+        max_in_flight = workers * 4
+    # sent with every chunk, as `ProcessPoolExecutor` only takes an initializer
+    # from Python 3.7. Each worker sets up once per batch.
+    setup: _Setup = (
+        os.urandom(16),
+        crypto.signing_public_key,
+        bytes(private_key),
+        crypto.json_backend,
+        crypto.validator,
+        crypto.limits,
+    )
+    executor = ProcessPoolExecutor(workers)
+    # chunks submitted but not yet yielded, in input order, bounded so memory
+    # stays flat however long the input is
+    pending: Dict[Future, _Chunk] = {}
+    try:
+        for chunk in chunks:
+            pending[executor.submit(_decrypt_worker_chunk, setup, chunk)] = chunk
+            while len(pending) >= max_in_flight:
+                yield from _collect(crypto, pending, ordered)
+        while pending:
+            yield from _collect(crypto, pending, ordered)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+
+
+def _collect(
+    crypto: Crypto, pending: Dict[Future, _Chunk], ordered: bool
+) -> Iterator[DecryptManyResult]:
+    """
+    Waits for the next chunk in input order, or any chunk if unordered, and yields its results.
+    """
+    if ordered:
+        done = [next(iter(pending))]
+    else:
+        done = list(wait(pending, return_when=FIRST_COMPLETED).done)
+    for future in done:
+        chunk = pending.pop(future)
+        try:
+            results = future.result()
+        except BrokenProcessPool as e:
+            # a worker exited, eg. killed for running out of memory
+            raise DecryptWorkerException(
+                "A worker process exited while decrypting"
+            ) from e
+        except Exception as e:
+            results = [_failure(i, str(e)) for i, _ in chunk]
+        _record(crypto, results)
+        yield from results
+
+
+def _chunked(iterable: Iterable[DecryptParams], chunksize: int) -> Iterator[_Chunk]:
+    items = enumerate(iterable)
+    while True:
+        chunk = list(itertools.islice(items, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(
+    signing_public_key: str,
+    private_key: bytes,
+    json_backend: JsonBackend,
+    validator: Callable[[Any], bool],
+    limits: Limits,
+):
+    global _worker_crypto, _worker_private_key
+    _worker_crypto = Crypto(
+        signing_public_key,
+        json_backend=json_backend,
+        validator=validator,
+        limits=limits,
+    )
+    _worker_private_key = PrivateKey(private_key)
+
+
+def _decrypt_worker_chunk(setup: _Setup, chunk: _Chunk) -> List[DecryptManyResult]:
+    global _worker_batch
+    if _worker_batch != setup[0]:
+        _init_worker(*setup[1:])
+        _worker_batch = setup[0]
+    return _decrypt_chunk(_worker_crypto, _worker_private_key, chunk)  # type: ignore
+
+
+def _decrypt_chunk(
+    crypto: Crypto, private_key: PrivateKey, chunk: _Chunk
+) -> List[DecryptManyResult]:
+    results: List[DecryptManyResult] = []
+    for index, decrypt_params in chunk:
+        try:
+            result = crypto._decrypt_result(
+                DecryptionContext(private_key), decrypt_params
+            )
+        except Exception as e:
+            results.append(_failure(index, str(e) or type(e).__name__))
+            continue
+        if result.reason is None:
+            results.append(
+                {
+                    "index": index,
+                    "result": result.content,
+                    "error": None,
+                    "reason": None,
+                }
+            )
+        else:
+            results.append(
+                _failure(index, result.reason.description, result.reason.value)
+            )
+    return results
+
+
+def _failure(index: int, error: str, reason: Optional[str] = None) -> DecryptManyResult:
+    return {"index": index, "result": None, "error": error, "reason": reason}
+
+
+def _record(crypto: Crypto, results: List[DecryptManyResult]):
+    # outcomes are counted in the worker processes, so they are counted again
+    # here for the caller's instance
+    for result in results:
+        if result["reason"] is not None:
+            reason = DecryptFailureReason(result["reason"])
+            crypto.counters.record(reason)
+            if reason in _FAILURE_LIMITS:
+                crypto.limits.reject(_FAILURE_LIMITS[reason])
+        elif result["error"] is None:
+            crypto.counters.record(None)
@@ -0,0 +1,218 @@
+"""
+Caches of decrypted attachments, so that a webhook retried by FormSG does not
+download and decrypt its attachments again.
+
+Entries are keyed by :func:`attachment_cache_key`. Cached attachments are only
+returned after the submission itself has been decrypted with the form's secret key.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+from nacl.exceptions import CryptoError
+from nacl.secret import SecretBox
+from nacl.utils import random
+
+logger = logging.getLogger(__name__)
+
+
+def attachment_cache_key(submission_id: str, url: str) -> str:
+    """
+    Returns the cache key of an attachment of a submission.
+    The query string is left out, as presigned download URLs are signed anew for each retry.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    return f"{submission_id}:{parsed.netloc}{parsed.path}"
+
+
+class DecryptCache(ABC):
+    """
+    A cache of decrypted attachments. Implement this to keep them elsewhere.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        :rtype: the cached content, or None if it is missing or expired
+        """
+
+    @abstractmethod
+    def set(self, key: str, content: bytes):
+        """
+        Caches the content of the attachment, replacing any already cached.
+        """
+
+
+class MemoryDecryptCache(DecryptCache):
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 3600):
+        """
+        An in-process LRU cache.
+        :param max_bytes: Maximum total size of the cached content. The least recently used entries are evicted first.
+        :param ttl: Seconds after which an entry expires
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._lock = threading.Lock()
+        # key -> (expiry, content), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, content: bytes):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, content)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        _, content = self._entries.pop(key)
+        self.size -= len(content)
+
+
+class DiskDecryptCache(DecryptCache):
+    def __init__(
+        self,
+        directory: str,
+        secret: Optional[bytes] = None,
+        max_bytes: int = 1024 * 1024 * 1024,
+        ttl: float = 3600,
+    ):
+        """
+        A cache of files in a directory, which may be shared by the processes on a host.
+        Each entry is encrypted with `secret`, and its file is named by a keyed hash of its key,
+        so neither the attachments nor the submission IDs are readable at rest.
+        :param directory: Directory to keep the entries in. It is created if missing.
+        :param secret: 32-byte key to encrypt entries with. Processes sharing the directory must use the same one. Defaults to a random key, so that entries are only readable by this instance.
+        :param max_bytes: Maximum total size of the files. The oldest are evicted first.
+        :param ttl: Seconds after which an entry expires
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        secret = secret or random(SecretBox.KEY_SIZE)
+        self._box = SecretBox(secret)
+        self._name_key = hashlib.sha256(b"formsg-cache-name:" + secret).digest()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # an estimate, which is corrected by each eviction
+        self.size = sum(size for _, size, _ in self._files())
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                modified = os.fstat(f.fileno()).st_mtime
+                if modified + self.ttl <= time.time():
+                    data = None
+                else:
+                    data = f.read()
+        except FileNotFoundError:
+            return None
+        if data is not None:
+            try:
+                return self._box.decrypt(data)
+            except CryptoError:
+                logger.warning(f"Discarding unreadable cache entry {path}")
+        self._unlink(path)
+        return None
+
+    def set(self, key: str, content: bytes):
+        data = self._box.encrypt(content)
+        if len(data) > self.max_bytes:
+            return
+        # written to a temporary file first, so that readers never see part of an entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            self._unlink(temp_path)
+            raise
+        with self._lock:
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        now = time.time()
+        files = sorted(self._files(), key=lambda file: file[2])
+        self.size = sum(size for _, size, _ in files)
+        for path, size, modified in files:
+            if self.size <= self.max_bytes and modified + self.ttl > now:
+                break
+            self._unlink(path)
+            self.size -= size
+
+    def _files(self) -> Sequence[Tuple[str, int, float]]:
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".entry"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _path(self, key: str) -> str:
+        name = hashlib.blake2b(
+            key.encode("utf-8"), key=self._name_key, digest_size=32
+        ).hexdigest()
+        return os.path.join(self.directory, name + ".entry")
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+class TieredDecryptCache(DecryptCache):
+    def __init__(self, *tiers: DecryptCache):
+        """
+        Looks entries up in each tier in turn, eg. memory and then disk.
+        Entries found in a later tier are copied into the earlier ones.
+        """
+        self.tiers = tiers
+
+    def get(self, key: str) -> Optional[bytes]:
+        for i, tier in enumerate(self.tiers):
+            content = tier.get(key)
+            if content is not None:
+                for earlier in self.tiers[:i]:
+                    earlier.set(key, content)
+                return content
+        return None
+
+    def set(self, key: str, content: bytes):
+        for tier in self.tiers:
+            tier.set(key, content)
@@ -0,0 +1,170 @@
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from formsg.sdk import FormSdk
+
+
+def _export(args: argparse.Namespace) -> int:
+    from formsg.export import Exporter
+
+    secret_key = args.secret_key or os.environ.get("FORMSG_SECRET_KEY")
+    if not secret_key:
+        print(
+            "A form secret key must be given with --secret-key or FORMSG_SECRET_KEY",
+            file=sys.stderr,
+        )
+        return 2
+
+    sdk = FormSdk(args.mode)
+    exporter = Exporter(
+        sdk.crypto,
+        secret_key,
+        args.output,
+        output_format=args.format,
+        uri=args.uri,
+        attachments_dir=args.attachments_dir,
+        workers=args.workers,
+        checkpoint=args.checkpoint,
+    )
+    stats = exporter.run(args.inputs)
+    print(stats.summary(), file=sys.stderr)
+    return 0
+
+
+def _loadtest(args: argparse.Namespace) -> int:
+    from formsg.loadtest import LoadGenerator, seeded_form
+    from formsg.testing import AttachmentServer
+
+    if args.requests is None and args.duration is None:
+        args.duration = 10.0
+    form = seeded_form(args.seed, args.fields)
+    # the receiver must be configured with these keys, instead of FormSG's
+    print(f"form secret key: {form.secret_key}", file=sys.stderr)
+    print(f"signing public key: {form.signing_public_key}", file=sys.stderr)
+
+    with AttachmentServer(args.attachment_host, args.attachment_port) as server:
+        generator = LoadGenerator(
+            args.url,
+            form,
+            rate=args.rate,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            pool_size=args.pool_size,
+            verified=args.verified,
+            attachment_sizes=[args.attachment_size] * args.attachments,
+            server=server,
+        )
+        result = generator.run(args.requests, args.duration)
+    print(result.summary())
+    return 0 if result.ok == result.count else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m formsg")
+    parser.add_argument(
+        "--mode",
+        choices=["STAGING", "PRODUCTION"],
+        default="PRODUCTION",
+        help="determines whether to use staging or production public signing keys",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    export = subparsers.add_parser(
+        "export", help="decrypt stored webhooks to NDJSON or CSV"
+    )
+    export.add_argument(
+        "inputs", nargs="+", help="NDJSON files, or directories of them"
+    )
+    export.add_argument("-o", "--output", required=True, help="file to write to")
+    export.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    export.add_argument(
+        "--secret-key", help="form secret key, defaults to $FORMSG_SECRET_KEY"
+    )
+    export.add_argument(
+        "--uri",
+        help="verify webhook signatures against this URI, skipping records that fail",
+    )
+    export.add_argument(
+        "--attachments-dir", help="download and decrypt attachments into this directory"
+    )
+    export.add_argument("--workers", type=int, help="number of workers")
+    export.add_argument(
+        "--checkpoint", help="checkpoint file, to resume an interrupted export"
+    )
+    export.set_defaults(func=_export)
+
+    loadtest = subparsers.add_parser(
+        "loadtest",
+        help="POST signed, encrypted webhooks to a receiver and report its latency",
+    )
+    loadtest.add_argument("url", help="URL of the webhook receiver")
+    loadtest.add_argument(
+        "--rate",
+        type=float,
+        help="requests per second; if not given, --concurrency requests are kept in flight",
+    )
+    loadtest.add_argument(
+        "--concurrency", type=int, default=8, help="maximum requests in flight"
+    )
+    loadtest.add_argument("--requests", type=int, help="number of requests to send")
+    loadtest.add_argument(
+        "--duration",
+        type=float,
+        help="seconds to send requests for, defaults to 10 if --requests is not given",
+    )
+    loadtest.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the form keys and submissions, to reproduce a run",
+    )
+    loadtest.add_argument(
+        "--fields", type=int, default=20, help="number of fields per submission"
+    )
+    loadtest.add_argument(
+        "--verified", action="store_true", help="include verified content"
+    )
+    loadtest.add_argument(
+        "--attachments",
+        type=int,
+        default=0,
+        help="number of attachments per submission",
+    )
+    loadtest.add_argument(
+        "--attachment-size",
+        type=int,
+        default=65536,
+        help="size of each attachment in bytes",
+    )
+    loadtest.add_argument(
+        "--attachment-host",
+        default="127.0.0.1",
+        help="address to serve attachments on",
+    )
+    loadtest.add_argument(
+        "--attachment-port", type=int, default=0, help="port to serve attachments on"
+    )
+    loadtest.add_argument(
+        "--pool-size",
+        type=int,
+        default=100,
+        help="number of distinct submissions to encrypt up front",
+    )
+    loadtest.add_argument(
+        "--timeout", type=float, default=10.0, help="timeout of each request in seconds"
+    )
+    loadtest.set_defaults(func=_loadtest)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 2
+    return args.func(args)
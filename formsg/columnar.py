@@ -0,0 +1,508 @@
+import csv
+import datetime
+import json
+import math
+from abc import ABC, abstractmethod
+from array import array
+from typing import IO, Any, Dict, Iterable, List, Optional, Type
+
+from formsg.schemas.crypto import DecryptedContent, FieldType, FormField
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# FormSG formats date answers as eg. "22 Mar 2020"
+DATE_FORMAT = "%d %b %Y"
+
+
+class Column(ABC):
+    """
+    The answers to one form field across a batch of submissions. The question
+    and field type are stored once, and answers in a typed array where possible.
+    """
+
+    def __init__(self, field_id: str, question: str, field_type: FieldType):
+        self.field_id = field_id
+        self.question = question
+        self.field_type = field_type
+        # 1 where the submission has a valid answer to this field
+        self.valid = bytearray()
+        # number of answers that could not be coerced to the column's type
+        self.errors = 0
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+    @abstractmethod
+    def append(self, field: FormField):
+        """
+        Appends the answer of the given field as a new row.
+        """
+
+    @abstractmethod
+    def append_missing(self):
+        """
+        Appends a row without an answer.
+        """
+
+    def truncate(self, length: int):
+        """
+        Drops the answers of every row from `length` on.
+        """
+        del self.valid[length:]
+
+    @abstractmethod
+    def value(self, row: int) -> Any:
+        """
+        Returns the answer of the given row, or None if it is missing.
+        """
+
+    @abstractmethod
+    def to_numpy(self) -> Any:
+        """
+        Returns the answers as a numpy array.
+        """
+
+    def to_pandas(self) -> Any:
+        import pandas
+
+        return pandas.Series([self.value(i) for i in range(len(self))], dtype=object)
+
+
+class StringColumn(Column):
+    def __init__(self, field_id: str, question: str, field_type: FieldType):
+        super().__init__(field_id, question, field_type)
+        self.values: List[Optional[str]] = []
+        # repeated answers, eg. of a dropdown, share one string
+        self._interned: Dict[str, str] = {}
+
+    def append(self, field: FormField):
+        answer = field.get("answer")
+        if not isinstance(answer, str):
+            self.append_missing()
+            return
+        self.values.append(self._interned.setdefault(answer, answer))
+        self.valid.append(1)
+
+    def append_missing(self):
+        self.values.append(None)
+        self.valid.append(0)
+
+    def truncate(self, length: int):
+        super().truncate(length)
+        del self.values[length:]
+
+    def value(self, row: int) -> Optional[str]:
+        return self.values[row]
+
+    def to_numpy(self) -> Any:
+        import numpy
+
+        return numpy.array(self.values, dtype=object)
+
+
+class NumberColumn(Column):
+    def __init__(self, field_id: str, question: str, field_type: FieldType):
+        super().__init__(field_id, question, field_type)
+        self.values = array("d")
+
+    def append(self, field: FormField):
+        answer = field.get("answer")
+        if not answer:
+            self.append_missing()
+            return
+        if not isinstance(answer, str):
+            self.errors += 1
+            self.append_missing()
+            return
+        try:
+            self.values.append(float(answer))
+            self.valid.append(1)
+        except ValueError:
+            self.errors += 1
+            self.append_missing()
+
+    def append_missing(self):
+        self.values.append(math.nan)
+        self.valid.append(0)
+
+    def truncate(self, length: int):
+        super().truncate(length)
+        del self.values[length:]
+
+    def value(self, row: int) -> Optional[float]:
+        return self.values[row] if self.valid[row] else None
+
+    def to_numpy(self) -> Any:
+        import numpy
+
+        return numpy.ma.masked_array(
+            numpy.array(self.values, dtype=numpy.float64),
+            mask=numpy.array(self.valid, dtype=numpy.uint8) == 0,
+        )
+
+    def to_pandas(self) -> Any:
+        import numpy
+        import pandas
+
+        return pandas.Series(self.to_numpy().filled(numpy.nan))
+
+
+class DateColumn(Column):
+    """
+    Dates stored as days since 1970-01-01.
+    """
+
+    def __init__(self, field_id: str, question: str, field_type: FieldType):
+        super().__init__(field_id, question, field_type)
+        self.values = array("q")
+        self._parsed: Dict[str, int] = {}
+
+    def append(self, field: FormField):
+        answer = field.get("answer")
+        if not answer:
+            self.append_missing()
+            return
+        if not isinstance(answer, str):
+            self.errors += 1
+            self.append_missing()
+            return
+        days = self._parsed.get(answer)
+        if days is None:
+            try:
+                parsed = datetime.datetime.strptime(answer, DATE_FORMAT)
+            except ValueError:
+                self.errors += 1
+                self.append_missing()
+                return
+            days = self._parsed[answer] = parsed.toordinal() - _EPOCH_ORDINAL
+        self.values.append(days)
+        self.valid.append(1)
+
+    def append_missing(self):
+        self.values.append(0)
+        self.valid.append(0)
+
+    def truncate(self, length: int):
+        super().truncate(length)
+        del self.values[length:]
+
+    def value(self, row: int) -> Optional[datetime.date]:
+        if not self.valid[row]:
+            return None
+        return datetime.date.fromordinal(self.values[row] + _EPOCH_ORDINAL)
+
+    def to_numpy(self) -> Any:
+        import numpy
+
+        return numpy.ma.masked_array(
+            numpy.array(self.values, dtype=numpy.int64).astype("datetime64[D]"),
+            mask=numpy.array(self.valid, dtype=numpy.uint8) == 0,
+        )
+
+    def to_pandas(self) -> Any:
+        import numpy
+        import pandas
+
+        return pandas.Series(self.to_numpy().filled(numpy.datetime64("NaT")))
+
+
+class YesNoColumn(Column):
+    """
+    Yes/No answers stored as 1 and 0.
+    """
+
+    def __init__(self, field_id: str, question: str, field_type: FieldType):
+        super().__init__(field_id, question, field_type)
+        self.values = array("b")
+
+    def append(self, field: FormField):
+        answer = field.get("answer")
+        if answer == "Yes" or answer == "No":
+            self.values.append(1 if answer == "Yes" else 0)
+            self.valid.append(1)
+            return
+        if answer:
+            self.errors += 1
+        self.append_missing()
+
+    def append_missing(self):
+        self.values.append(0)
+        self.valid.append(0)
+
+    def truncate(self, length: int):
+        super().truncate(length)
+        del self.values[length:]
+
+    def value(self, row: int) -> Optional[bool]:
+        return bool(self.values[row]) if self.valid[row] else None
+
+    def to_numpy(self) -> Any:
+        import numpy
+
+        return numpy.ma.masked_array(
+            numpy.array(self.values, dtype=numpy.int8).astype(bool),
+            mask=numpy.array(self.valid, dtype=numpy.uint8) == 0,
+        )
+
+    def to_pandas(self) -> Any:
+        import pandas
+
+        return pandas.Series([self.value(i) for i in range(len(self))], dtype="boolean")
+
+
+class ListColumn(Column):
+    """
+    `answerArray` answers, eg. of checkboxes, stored as one flat list of values,
+    with the answers of row i at `values[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, field_id: str, question: str, field_type: FieldType):
+        super().__init__(field_id, question, field_type)
+        self.offsets = array("q", [0])
+        self.values: List[str] = []
+        self._interned: Dict[str, str] = {}
+
+    def append(self, field: FormField):
+        answer = field.get("answerArray")
+        if not isinstance(answer, list) or not all(
+            isinstance(value, str) for value in answer
+        ):
+            if answer is not None:
+                self.errors += 1
+            self.append_missing()
+            return
+        for value in answer:
+            self.values.append(self._interned.setdefault(value, value))  # type: ignore
+        self.offsets.append(len(self.values))
+        self.valid.append(1)
+
+    def append_missing(self):
+        self.offsets.append(len(self.values))
+        self.valid.append(0)
+
+    def truncate(self, length: int):
+        super().truncate(length)
+        del self.values[self.offsets[length] :]
+        del self.offsets[length + 1 :]
+
+    def value(self, row: int) -> Optional[List[str]]:
+        if not self.valid[row]:
+            return None
+        return self.values[self.offsets[row] : self.offsets[row + 1]]
+
+    def to_numpy(self) -> Any:
+        import numpy
+
+        return {
+            "offsets": numpy.array(self.offsets, dtype=numpy.int64),
+            "values": numpy.array(self.values, dtype=object),
+        }
+
+
+class TableColumn(Column):
+    """
+    Table answers, stored as one flat list of cells. The rows of submission i
+    are `row_offsets[i]:row_offsets[i + 1]`, and the cells of row j are
+    `values[cell_offsets[j]:cell_offsets[j + 1]]`.
+    """
+
+    def __init__(self, field_id: str, question: str, field_type: FieldType):
+        super().__init__(field_id, question, field_type)
+        self.row_offsets = array("q", [0])
+        self.cell_offsets = array("q", [0])
+        self.values: List[str] = []
+
+    def append(self, field: FormField):
+        answer = field.get("answerArray")
+        if not isinstance(answer, list) or not all(
+            isinstance(row, list) and all(isinstance(cell, str) for cell in row)
+            for row in answer
+        ):
+            if answer is not None:
+                self.errors += 1
+            self.append_missing()
+            return
+        for row in answer:
+            self.values.extend(row)
+            self.cell_offsets.append(len(self.values))
+        self.row_offsets.append(len(self.cell_offsets) - 1)
+        self.valid.append(1)
+
+    def append_missing(self):
+        self.row_offsets.append(len(self.cell_offsets) - 1)
+        self.valid.append(0)
+
+    def truncate(self, length: int):
+        super().truncate(length)
+        rows = self.row_offsets[length]
+        del self.values[self.cell_offsets[rows] :]
+        del self.cell_offsets[rows + 1 :]
+        del self.row_offsets[length + 1 :]
+
+    def value(self, row: int) -> Optional[List[List[str]]]:
+        if not self.valid[row]:
+            return None
+        return [
+            self.values[self.cell_offsets[j] : self.cell_offsets[j + 1]]
+            for j in range(self.row_offsets[row], self.row_offsets[row + 1])
+        ]
+
+    def to_numpy(self) -> Any:
+        import numpy
+
+        return {
+            "row_offsets": numpy.array(self.row_offsets, dtype=numpy.int64),
+            "cell_offsets": numpy.array(self.cell_offsets, dtype=numpy.int64),
+            "values": numpy.array(self.values, dtype=object),
+        }
+
+
+COLUMN_TYPES: Dict[str, Type[Column]] = {
+    "number": NumberColumn,
+    "decimal": NumberColumn,
+    "rating": NumberColumn,
+    "date": DateColumn,
+    "yes_no": YesNoColumn,
+    "checkbox": ListColumn,
+    "table": TableColumn,
+}
+
+
+class ColumnarBatch(object):
+    """
+    Collects decrypted submissions into one typed column per form field, keyed by field `_id`.
+
+    Example::
+
+        batch = ColumnarBatch()
+        for decrypted in decrypted_submissions:
+            batch.add(decrypted)
+        batch.to_csv(open("responses.csv", "w", newline=""))
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, Column] = {}
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def add(self, decrypted: DecryptedContent):
+        """
+        Appends one decrypted submission as a new row.
+        :param decrypted: The result of `Crypto.decrypt`
+        """
+        self.add_responses(decrypted["responses"])
+
+    def add_responses(self, responses: Iterable[FormField]):
+        """
+        Appends one submission's responses as a new row. If a response cannot be
+        added, eg. as it has no `_id`, the row is added to no column and the error is raised.
+        """
+        seen = set()
+        added = []
+        try:
+            for field in responses:
+                if field.get("isHeader"):
+                    continue
+                field_id = field["_id"]
+                if field_id in seen:
+                    continue
+                column = self.columns.get(field_id)
+                if column is None:
+                    column = self._add_column(field)
+                    added.append(field_id)
+                column.append(field)
+                seen.add(field_id)
+            if len(seen) < len(self.columns):
+                for field_id, column in self.columns.items():
+                    if field_id not in seen:
+                        column.append_missing()
+        except Exception:
+            # every column keeps one answer per row
+            for field_id in added:
+                del self.columns[field_id]
+            for column in self.columns.values():
+                column.truncate(self.length)
+            raise
+        self.length += 1
+
+    def extend(self, decrypted: Iterable[DecryptedContent]):
+        for item in decrypted:
+            self.add(item)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """
+        Returns one row as a mapping of field ID to answer.
+        """
+        return {
+            field_id: column.value(index) for field_id, column in self.columns.items()
+        }
+
+    def headers(self) -> Dict[str, str]:
+        """
+        Returns a unique header for each field ID, from the question text.
+        """
+        headers: Dict[str, str] = {}
+        used = set()
+        for field_id, column in self.columns.items():
+            header = column.question
+            if header in used:
+                header = f"{header} ({field_id})"
+            used.add(header)
+            headers[field_id] = header
+        return headers
+
+    def to_csv(self, file: IO[str]):
+        """
+        Writes the batch as CSV, with one column per question. List and table answers are written as JSON.
+        """
+        headers = self.headers()
+        writer = csv.writer(file)
+        writer.writerow(headers.values())
+        columns = list(self.columns.values())
+        for i in range(self.length):
+            writer.writerow([_csv_value(column.value(i)) for column in columns])
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        Returns a mapping of field ID to a NumPy array of its answers. Requires `numpy`.
+        Numeric, date and yes/no columns are masked arrays with missing answers masked.
+        List and table columns are mappings of their offset and value arrays.
+        """
+        return {
+            field_id: column.to_numpy() for field_id, column in self.columns.items()
+        }
+
+    def to_pandas(self) -> Any:
+        """
+        Returns the batch as a `pandas.DataFrame` with one column per field ID. Requires `pandas`.
+        """
+        import pandas
+
+        return pandas.DataFrame(
+            {field_id: column.to_pandas() for field_id, column in self.columns.items()}
+        )
+
+    def _add_column(self, field: FormField) -> Column:
+        field_type = field["fieldType"]
+        column_type = COLUMN_TYPES.get(field_type, StringColumn)
+        column = column_type(field["_id"], field["question"], field_type)
+        for _ in range(self.length):
+            column.append_missing()
+        self.columns[field["_id"]] = column
+        return column
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return json.dumps(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
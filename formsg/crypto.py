@@ -1,177 +1,729 @@
 import base64
-import json
+import binascii
 import logging
-from typing import Union, cast
+import threading
+import time
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    TypeVar,
+    Union,
+)
 
-import requests
-from nacl.exceptions import CryptoError
-from nacl.public import Box, PrivateKey, PublicKey
+from nacl.exceptions import BadSignatureError
+from nacl.public import PrivateKey
 
-from formsg.exceptions import AttachmentDecryptionException, MissingPublicKeyException
+from formsg.attachments import AttachmentDownloader
+from formsg.cache import DecryptCache, attachment_cache_key
+from formsg.exceptions import (
+    AttachmentDecryptionException,
+    AttachmentDownloadException,
+    MissingPublicKeyException,
+    MissingSecretKeyException,
+    VerifiedContentException,
+)
+from formsg.instrumentation import Observer, Stage
+from formsg.keyring import FormKeyring
+from formsg.limits import Limit, Limits
+from formsg.result import (
+    LIMIT_FAILURES,
+    DecryptCounters,
+    DecryptFailureReason,
+    DecryptResult,
+)
 from formsg.schemas.crypto import (
     DecryptedContent,
+    DecryptedContentAndAttachmentFiles,
     DecryptedContentAndAttachments,
     DecryptedFile,
+    DecryptedFileHandle,
+    DecryptManyResult,
     DecryptParams,
+    EncryptedAttachmentRecords,
+    EncryptedFileContent,
+    Keypair,
 )
+from formsg.submission import Submission
 from formsg.util.crypto import (
+    DecryptionContext,
+    FormSecretKey,
     are_attachment_field_ids_valid,
     convert_encrypted_attachment_to_file_content,
-    decrypt_content,
+    encrypt_content,
+    encrypt_file_content,
+    generate_keypair,
+    load_verify_key,
+    parse_envelope,
+    sign_message,
     verify_signed_message,
 )
+from formsg.util.json_backend import JsonBackend, get_json_backend
+from formsg.util.projection import project_fields
+from formsg.util.stream import (
+    AttachmentSink,
+    EncryptedAttachmentReader,
+    discard_attachment_sinks,
+    open_attachment_sink,
+)
 from formsg.util.validate import determine_is_form_fields
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# the types an `encryptedContent` or `verifiedContent` envelope may be given as
+_ENVELOPE_TYPES = (str, bytes, bytearray, memoryview)
+
 
 class Crypto(object):
-    def __init__(self, signing_public_key: str):
+    def __init__(
+        self,
+        signing_public_key: str,
+        keyring: Optional[FormKeyring] = None,
+        downloader: Optional[AttachmentDownloader] = None,
+        json_backend: Union[str, JsonBackend, None] = None,
+        validator: Optional[Callable[[Any], bool]] = None,
+        observer: Optional[Observer] = None,
+        cache: Optional[DecryptCache] = None,
+        limits: Optional[Limits] = None,
+    ):
+        """
+        :param signing_public_key: The base-64 public key that verified content is signed with
+        :param keyring: Optional keyring holding the secret keys of many forms
+        :param downloader: Optional downloader for attachments. Defaults to an :class:`AttachmentDownloader` created on first use.
+        :param json_backend: The JSON backend to parse submissions with, or its name. Defaults to `orjson` if installed.
+        :param validator: Checks the shape of decrypted responses. Defaults to `determine_is_form_fields`. Pass `is_strict_form_fields` or a compiled :class:`FormSchema` to check each field against its type.
+        :param observer: Optional callable reporting the duration and size of each stage, see :mod:`formsg.instrumentation`
+        :param cache: Optional cache of decrypted attachments by submission ID and URL, so that retried webhooks are not downloaded and decrypted again. See :mod:`formsg.cache`.
+        :param limits: Limits on the size of submissions and attachments, checked before they are decoded. Defaults to :class:`Limits` with its default values.
+        """
         self.signing_public_key = signing_public_key
+        # parses decrypted submissions, verified content and attachment records
+        self.json_backend = get_json_backend(json_backend)
+        self.validator = validator or determine_is_form_fields
+        self.observer = observer
+        self.cache = cache
+        self.limits = limits or Limits()
+        self.keyring = keyring
+        self._downloader = downloader
+        self._signing_verify_key = (
+            load_verify_key(signing_public_key) if signing_public_key else None
+        )
+        # counts of successful and failed decryptions by failure reason
+        self.counters = DecryptCounters()
+
+    @property
+    def downloader(self) -> AttachmentDownloader:
+        if self._downloader is None:
+            self._downloader = AttachmentDownloader(
+                json_backend=self.json_backend, limits=self.limits
+            )
+        return self._downloader
 
     def decrypt(
-        self, form_secret_key: str, decrypt_params: DecryptParams
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        fields: Optional[Collection[str]] = None,
     ) -> Union[DecryptedContent, None]:
         """
         Decrypts an encrypted submission and returns it.
-        :param: form_secret_key The base-64 secret key of the form to decrypt with.
+        :param: form_secret_key The base-64 secret key of the form to decrypt with, or a `PrivateKey` from a :class:`FormKeyring`.
         :param: decrypt_params :class:`dict` The params containing encrypted content and information
         :param: decrypt_params.encryptedContent The encrypted content encoded with base-64.
         :param: decrypt_params.version The version of the payload. Used to determine the decryption process to decrypt the content with.
         :param: decrypt_params.verifiedContent Optional. The encrypted and signed verified content. If given, the signingPublicKey will be used to attempt to open the signed message.
+        :param: fields Optional IDs of the fields to return. Only these fields are parsed and validated, so the cost scales with the projection rather than the form.
         :returns: The decrypted content if successful. Else, null will be returned.
         :raises MissingPublicKeyException: if a public key is not provided when instantiating this class and is needed for verifying signed content.
         """
+        context = self._create_context(form_secret_key)
+        if not context:
+            return None
+        return self._decrypt(context, decrypt_params, fields)
+
+    def decrypt_result(
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        fields: Optional[Collection[str]] = None,
+    ) -> DecryptResult:
+        """
+        Decrypts an encrypted submission, reporting why it failed instead of returning None.
+        Expected failures are returned rather than raised, and each outcome is counted in `counters`.
+        Failures other than a wrong key are properties of the payload, so retrying them will not help.
+        :param: form_secret_key The base-64 secret key of the form to decrypt with, or a `PrivateKey` from a :class:`FormKeyring`.
+        :param: decrypt_params :class:`dict` The params containing encrypted content and information
+        :param: fields Optional IDs of the fields to return, see :meth:`decrypt`
+        :returns: A :class:`DecryptResult` with either the decrypted `content`, or the :class:`DecryptFailureReason` it failed.
+        :raises MissingPublicKeyException: if a public key is not provided when instantiating this class and is needed for verifying signed content.
+        """
+        context = self._create_context(form_secret_key)
+        if not context:
+            return self._failure(DecryptFailureReason.INVALID_SECRET_KEY)
+        return self._decrypt_result(context, decrypt_params, fields=fields)
+
+    def decrypt_submission(
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        fields: Optional[Collection[str]] = None,
+    ) -> Union[Submission, None]:
+        """
+        Decrypts an encrypted submission into a :class:`Submission`, which is a mapping like the result of
+        :meth:`decrypt`, with fields looked up by ID. Verified content is only decrypted and verified when
+        `verified` is first read, which raises :class:`VerifiedContentException` if it is invalid.
+        The submission is counted in `counters` once its responses are decrypted, so invalid verified content is not counted.
+        :param: form_secret_key The base-64 secret key of the form to decrypt with, or a `PrivateKey` from a :class:`FormKeyring`.
+        :param: decrypt_params :class:`dict` The params containing encrypted content and information
+        :param: fields Optional IDs of the fields to return, see :meth:`decrypt`
+        :returns: The decrypted submission if successful. Else, null will be returned.
+        """
+        context = self._create_context(form_secret_key)
+        if not context:
+            return None
+        result = self._decrypt_result(
+            context, decrypt_params, open_verified=False, fields=fields
+        )
+        if result.reason is not None:
+            logger.error(result.reason.description)
+            return None
+
+        def open_verified() -> Mapping[str, Any]:
+            verified = self._open_verified(context, decrypt_params)  # type: ignore
+            if verified is None:
+                raise VerifiedContentException(
+                    DecryptFailureReason.VERIFIED_SIGNATURE.description
+                )
+            return verified
+
+        return Submission(
+            result.content["responses"],  # type: ignore
+            open_verified if "verifiedContent" in decrypt_params else None,
+        )
+
+    def _decrypt(
+        self,
+        context: DecryptionContext,
+        decrypt_params: DecryptParams,
+        fields: Optional[Collection[str]] = None,
+    ) -> Union[DecryptedContent, None]:
+        result = self._decrypt_result(context, decrypt_params, fields=fields)
+        if result.reason is not None:
+            logger.error(result.reason.description)
+        return result.content
+
+    def _decrypt_result(
+        self,
+        context: DecryptionContext,
+        decrypt_params: DecryptParams,
+        open_verified: bool = True,
+        fields: Optional[Collection[str]] = None,
+    ) -> DecryptResult:
+        if not isinstance(decrypt_params, Mapping):
+            return self._failure(DecryptFailureReason.MALFORMED_ENVELOPE)
+        encrypted_content = decrypt_params.get("encryptedContent")
+        # checked before its size is, as anything else is not an envelope
+        if not isinstance(encrypted_content, _ENVELOPE_TYPES):
+            return self._failure(DecryptFailureReason.MALFORMED_ENVELOPE)
+        if not self.limits.allows_content(encrypted_content):
+            return self._failure(DecryptFailureReason.CONTENT_TOO_LARGE)
+        # each stage is only timed when an observer is set
+        observer = self.observer
+        if observer is not None:
+            started = time.perf_counter()
+        envelope = parse_envelope(encrypted_content)
+        if observer is not None:
+            now = time.perf_counter()
+            observer(Stage.BASE64_DECODE, now - started, len(encrypted_content))
+            started = now
+        if envelope is None:
+            return self._failure(DecryptFailureReason.MALFORMED_ENVELOPE)
+
+        decrypted_bytes = context.open(*envelope)
+        if observer is not None:
+            now = time.perf_counter()
+            observer(Stage.BOX_DECRYPT, now - started, len(envelope[2]))
+            started = now
+        if decrypted_bytes is None:
+            return self._failure(DecryptFailureReason.WRONG_KEY)
+        exceeded = self.limits.exceeded_by_plaintext(decrypted_bytes)
+        if exceeded is not None:
+            return self._failure(LIMIT_FAILURES[exceeded])
+        projected = None
+        if fields is not None:
+            fields = frozenset(fields)
         try:
-            if "encryptedContent" not in decrypt_params:
-                logger.error("`encryptedContent` not provided")
-                return None
+            # projected fields are parsed too, so fail in the same ways
+            if fields is not None:
+                projected = project_fields(decrypted_bytes, fields, self.json_backend)
+            if projected is None:
+                decrypted_object = self.json_backend.loads(decrypted_bytes)
+            else:
+                decrypted_object = projected
+        except ValueError:
+            return self._failure(DecryptFailureReason.BAD_JSON)
+        except RecursionError:
+            # nested deeper than the stack of `json`, when `max_depth` is not set
+            self.limits.reject(Limit.DEPTH)
+            return self._failure(DecryptFailureReason.TOO_DEEP)
+        finally:
+            if observer is not None:
+                now = time.perf_counter()
+                observer(Stage.JSON_PARSE, now - started, len(decrypted_bytes))
+                started = now
+        is_valid = self.validator(decrypted_object)
+        if observer is not None:
+            now = time.perf_counter()
+            observer(Stage.SCHEMA_VALIDATION, now - started, len(decrypted_bytes))
+            started = now
+        if not is_valid:
+            return self._failure(DecryptFailureReason.SCHEMA_VIOLATION)
+        if fields is not None and projected is None:
+            decrypted_object = [
+                field for field in decrypted_object if field["_id"] in fields
+            ]
 
-            decrypted_bytes = decrypt_content(
-                form_secret_key, decrypt_params["encryptedContent"]
-            )
-            if not decrypted_bytes:
-                raise Exception("Failed to decrypt content")
+        returned_object: DecryptedContent = {
+            "responses": decrypted_object,
+        }
 
-            decrypted_object = json.loads(decrypted_bytes.decode("utf-8"))
-            if not determine_is_form_fields(decrypted_object):
-                print("here")
-                raise Exception("Decrypted object does not fit expected shape")
+        if open_verified and "verifiedContent" in decrypt_params:
+            verified = self._open_verified(context, decrypt_params)
+            if verified is None:
+                return self._failure(DecryptFailureReason.VERIFIED_SIGNATURE)
+            returned_object["verified"] = verified
 
-            returned_object: DecryptedContent = {
-                "responses": decrypted_object,
-            }
+        self.counters.record(None)
+        return DecryptResult(returned_object)
 
-            if "verifiedContent" in decrypt_params:
-                decrypted_verified_object = self._decrypt_verified_content(
-                    form_secret_key, decrypt_params
-                )
-                returned_object["verified"] = decrypted_verified_object
+    def _failure(self, reason: DecryptFailureReason) -> DecryptResult:
+        self.counters.record(reason)
+        return DecryptResult(reason=reason)
 
-            return returned_object
-        except MissingPublicKeyException as e:
-            logger.error(e)
-            raise e
-        except:
-            return None
+    def decrypt_many(
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: Iterable[DecryptParams],
+        workers: Optional[int] = None,
+        chunksize: int = 64,
+        ordered: bool = True,
+        max_in_flight: Optional[int] = None,
+    ) -> Iterator[DecryptManyResult]:
+        """
+        Decrypts many encrypted submissions of one form on a pool of worker processes, for backfills.
+        Each worker decodes the keys once. The input is read lazily, and at most `max_in_flight` chunks are
+        decrypted or waiting to be yielded at a time, so memory stays flat for arbitrarily long inputs.
+        :param form_secret_key Secret key as a base-64 string, or a `PrivateKey` from a :class:`FormKeyring`
+        :param decrypt_params An iterable of params, each containing encrypted content and information
+        :param workers Number of worker processes. Defaults to the number of CPUs. 0 decrypts in this process.
+        :param chunksize Number of submissions sent to a worker at a time
+        :param ordered If true, results are yielded in input order. Else, they are yielded as they complete.
+        :param max_in_flight Maximum number of chunks in flight. Defaults to 4 per worker.
+        :returns an iterator of results, each with the `index` of the submission in the input, and either its decrypted `result` or an `error`. A failed submission does not stop the batch.
+        raises DecryptWorkerException while iterating if a worker process dies, as its chunk would never complete
+        """
+        # imported here as formsg.batch depends on this module
+        from formsg.batch import decrypt_many
+
+        return decrypt_many(
+            self,
+            form_secret_key,
+            decrypt_params,
+            workers,
+            chunksize,
+            ordered,
+            max_in_flight,
+        )
+
+    def encrypt(
+        self,
+        msg: Any,
+        form_public_key: str,
+        signing_secret_key: Optional[str] = None,
+    ) -> str:
+        """
+        Encrypts a message for a form, in the `submissionPublicKey;nonce:ciphertext` format of `encryptedContent`.
+        A new submission key pair is generated for every message, as FormSG does.
+        :param msg: The message to encrypt, eg. a list of form fields. Serialized as JSON unless already bytes.
+        :param form_public_key: The base-64 public key of the form
+        :param signing_secret_key: Optional base-64 Ed25519 secret key to sign the message with before encrypting it, as FormSG does for `verifiedContent`
+        :returns the encrypted message
+        """
+        plaintext = msg if isinstance(msg, bytes) else self.json_backend.dumps(msg)
+        if signing_secret_key:
+            plaintext = sign_message(plaintext, signing_secret_key)
+        return encrypt_content(form_public_key, plaintext)
+
+    def encrypt_file(self, binary: bytes, form_public_key: str) -> EncryptedFileContent:
+        """
+        Encrypts a file for a form. The result can be decrypted with `decrypt_file`, or converted with
+        `convert_file_content_to_encrypted_attachment` to the record served at an attachment download URL.
+        :param binary: The file to encrypt
+        :param form_public_key: The base-64 public key of the form
+        :returns the submission public key and nonce in base-64, and the encrypted file
+        """
+        return encrypt_file_content(form_public_key, binary)
+
+    @staticmethod
+    def generate() -> Keypair:
+        """
+        Generates a new form key pair, with the keys in base-64.
+        """
+        return generate_keypair()
+
+    @staticmethod
+    def valid(public_key: str, secret_key: str) -> bool:
+        """
+        Checks that a form public key and secret key belong to the same key pair.
+        :param public_key: The base-64 public key of the form
+        :param secret_key: The base-64 secret key of the form
+        """
+        try:
+            private_key = PrivateKey(base64.b64decode(secret_key))
+            return bytes(private_key.public_key) == base64.b64decode(public_key)
+        except (binascii.Error, TypeError, ValueError):
+            return False
 
     def decrypt_file(
-        self, form_secret_key: str, encrypted_file_content
+        self, form_secret_key: FormSecretKey, encrypted_file_content
     ) -> Union[bytes, None]:
         """
         Decrypt the given encrypted file content.
-        :param form_secret_key Secret key as a base-64 string
+        :param form_secret_key Secret key as a base-64 string, or a `PrivateKey` from a :class:`FormKeyring`
         :param encrypted_file_content Object returned from encryptFile function
         :param encrypted_file_content.submissionPublicKey The submission public key as a base-64 string
         :param encrypted_file_content.nonce The nonce as a base-64 string
         :param encrypted_file_content.blob The encrypted file as a Blob object
 
         """
-        box = Box(
-            PrivateKey(base64.b64decode(form_secret_key)),
-            PublicKey(
-                base64.b64decode(encrypted_file_content["submission_public_key"])
-            ),
-        )
-        try:
-            decrypted = box.decrypt(
-                encrypted_file_content["binary"],
-                base64.b64decode(encrypted_file_content["nonce"]),
-            )
-            return decrypted
-        except CryptoError:
-            logger.error("Error decrypting file")
-            return None
+        return DecryptionContext(form_secret_key).decrypt_file(encrypted_file_content)
 
     def decrypt_attachments(
-        self, form_secret_key: str, decrypt_params: DecryptParams
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        timeout: Optional[float] = None,
+        fields: Optional[Collection[str]] = None,
     ) -> Union[DecryptedContentAndAttachments, None]:
         """
         Decrypts an encrypted submission, and also download and decrypt any attachments alongside it.
-        :param form_secret_key Secret key as a base-64 string
+        Attachments are downloaded concurrently by the :class:`AttachmentDownloader` of this instance.
+        :param form_secret_key Secret key as a base-64 string, or a `PrivateKey` from a :class:`FormKeyring`
         :param decrypt_params The params containing encrypted content and information.
+        :param timeout Optional time limit in seconds for downloading all attachments. Defaults to the downloader's `submission_timeout`.
+        :param fields Optional IDs of the fields to return, see :meth:`decrypt`. Only the attachments of these fields are downloaded.
         :rtype object: An object containing the decrypted submission, including attachments (if any). Or else returns null if a decryption error decrypting any part of the submission.
         :raises MissingPublicKeyException if a public key is not provided when instantiating this class and is needed for verifying signed content.
         """
+        cache = self.cache
+        submission_id = decrypt_params.get("submissionId")
+
+        def download_and_decrypt(
+            context: DecryptionContext,
+            field_id: str,
+            filename: str,
+            url: str,
+            deadline: Optional[float],
+        ) -> DecryptedFile:
+            if cache is not None and submission_id:
+                key = attachment_cache_key(submission_id, url)
+                cached = cache.get(key)
+                if cached is not None:
+                    return {"filename": filename, "content": cached}
+            observer = self.observer
+            if observer is not None:
+                started = time.perf_counter()
+            data = self.downloader.fetch(url, deadline)
+            encrypted_file = convert_encrypted_attachment_to_file_content(data)
+            if observer is not None:
+                now = time.perf_counter()
+                observer(
+                    Stage.ATTACHMENT_DOWNLOAD,
+                    now - started,
+                    len(encrypted_file["binary"]),
+                )
+                started = now
+            decrypted_file = context.decrypt_file(encrypted_file)
+            if observer is not None:
+                observer(
+                    Stage.ATTACHMENT_DECRYPT,
+                    time.perf_counter() - started,
+                    len(encrypted_file["binary"]),
+                )
+            if not decrypted_file:
+                raise AttachmentDecryptionException()
+            if cache is not None and submission_id:
+                cache.set(key, decrypted_file)
+            return {"filename": filename, "content": decrypted_file}
+
+        return self._decrypt_attachments(  # type: ignore
+            form_secret_key, decrypt_params, timeout, download_and_decrypt, fields
+        )
+
+    def decrypt_attachments_to(
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        sink: AttachmentSink,
+        timeout: Optional[float] = None,
+        fields: Optional[Collection[str]] = None,
+    ) -> Union[DecryptedContentAndAttachmentFiles, None]:
+        """
+        Decrypts an encrypted submission, and streams its attachments to files instead of holding them in memory.
+        Each attachment is decoded into a single buffer as it downloads, decrypted in place and written to its file,
+        so peak memory per attachment is about one copy of the file.
+        :param form_secret_key Secret key as a base-64 string, or a `PrivateKey` from a :class:`FormKeyring`
+        :param decrypt_params The params containing encrypted content and information.
+        :param sink A directory to write each attachment to as a temporary file, or a callable taking the field ID and filename and returning a writable file.
+        :param timeout Optional time limit in seconds for downloading all attachments. Defaults to the downloader's `submission_timeout`.
+        :param fields Optional IDs of the fields to return, see :meth:`decrypt`. Only the attachments of these fields are downloaded.
+        :rtype object: An object containing the decrypted submission and an open file for each attachment, positioned at the start. Or else returns null if a decryption error decrypting any part of the submission.
+        :raises MissingPublicKeyException if a public key is not provided when instantiating this class and is needed for verifying signed content.
+        """
+        # the files opened so far, which are discarded if any attachment fails
+        opened: List[BinaryIO] = []
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def open_sink(field_id: str, filename: str) -> BinaryIO:
+            file = open_attachment_sink(sink, field_id, filename)
+            with lock:
+                if not failed.is_set():
+                    opened.append(file)
+                    return file
+            # another attachment failed while this one was downloading
+            discard_attachment_sinks(sink, [file])
+            raise AttachmentDownloadException("Submission attachments failed")
+
+        def discard():
+            with lock:
+                failed.set()
+                files = opened[:]
+                del opened[:]
+            discard_attachment_sinks(sink, files)
+
+        def stream_and_decrypt(
+            context: DecryptionContext,
+            field_id: str,
+            filename: str,
+            url: str,
+            deadline: Optional[float],
+        ) -> DecryptedFileHandle:
+            observer = self.observer
+            if observer is not None:
+                started = time.perf_counter()
+            content_length, chunks = self.downloader.fetch_stream(url, deadline)
+            reader = EncryptedAttachmentReader(content_length)
+            for chunk in chunks:
+                reader.feed(chunk)
+            encrypted_file = reader.close()
+            if observer is not None:
+                now = time.perf_counter()
+                observer(Stage.ATTACHMENT_DOWNLOAD, now - started, reader.length)
+                started = now
+
+            file = open_sink(field_id, filename)
+            size = context.decrypt_file_to(encrypted_file, file)
+            if observer is not None:
+                observer(
+                    Stage.ATTACHMENT_DECRYPT,
+                    time.perf_counter() - started,
+                    reader.length,
+                )
+            if size is None:
+                raise AttachmentDecryptionException()
+            file.flush()
+            file.seek(0)
+            return {"filename": filename, "file": file, "size": size}
+
+        try:
+            result = self._decrypt_attachments(
+                form_secret_key, decrypt_params, timeout, stream_and_decrypt, fields
+            )
+        except BaseException:
+            discard()
+            raise
+        if result is None:
+            discard()
+        return result  # type: ignore
 
+    def _decrypt_attachments(
+        self,
+        form_secret_key: FormSecretKey,
+        decrypt_params: DecryptParams,
+        timeout: Optional[float],
+        decrypt_attachment: Callable[
+            [DecryptionContext, str, str, str, Optional[float]], T
+        ],
+        fields: Optional[Collection[str]] = None,
+    ) -> Union[Mapping[str, Any], None]:
         if "attachmentDownloadUrls" not in decrypt_params:
             logger.error("`attachmentDownloadUrls` param not passed")
             return None
 
-        attachment_records = decrypt_params.get("attachmentDownloadUrls", {})
-        decrypted_content = self.decrypt(form_secret_key, decrypt_params)
+        attachment_records = self._project_attachments(
+            decrypt_params.get("attachmentDownloadUrls", {}), fields  # type: ignore
+        )
+        # one context for the whole submission, so that each shared key is
+        # computed once across the content, verified content and attachments
+        context = self._create_context(form_secret_key)
+        if not context:
+            return None
+        decrypted_content = self._decrypt(context, decrypt_params, fields)
         if not decrypted_content:
             return None
-        returned_object: DecryptedContentAndAttachments = {
-            "content": decrypted_content,
-            "attachments": {},
+
+        filenames = self._attachment_filenames(
+            decrypted_content, attachment_records  # type: ignore
+        )
+        if filenames is None:
+            return None
+
+        deadline = self.downloader.deadline(timeout)
+        try:
+            # runs on the downloader's worker pool, so each file is decrypted as
+            # soon as its own download completes
+            decrypted_records = self.downloader.map(
+                lambda field_id, url: decrypt_attachment(
+                    context, field_id, filenames[field_id], url, deadline  # type: ignore
+                ),
+                attachment_records,  # type: ignore
+                deadline,
+            )
+        except AttachmentDecryptionException:
+            raise
+        except Exception as e:
+            logger.error(e)
+            return None
+        return {"content": decrypted_content, "attachments": decrypted_records}
+
+    @staticmethod
+    def _project_attachments(
+        attachment_records: EncryptedAttachmentRecords,
+        fields: Optional[Collection[str]],
+    ) -> EncryptedAttachmentRecords:
+        if fields is None or not attachment_records:
+            return attachment_records
+        return {
+            field_id: url
+            for field_id, url in attachment_records.items()
+            if field_id in fields
         }
 
-        decrypted_records = {}
+    @staticmethod
+    def _attachment_filenames(
+        decrypted_content: DecryptedContent,
+        attachment_records: EncryptedAttachmentRecords,
+    ) -> Union[Dict[str, str], None]:
+        """
+        Maps the field ID of each attachment to its filename, or returns None if
+        the download URLs do not all belong to attachment fields.
+        """
         filenames = {}
         for response in decrypted_content["responses"]:
             if response["fieldType"] == "attachment" and response["answer"]:
                 filenames[response["_id"]] = response["answer"]
 
-        field_ids = attachment_records.keys()  # type: ignore
-        if not are_attachment_field_ids_valid(list(field_ids), filenames):
+        if not are_attachment_field_ids_valid(list(attachment_records), filenames):
             return None
+        return filenames
+
+    def decrypt_from_header(
+        self, header: str, decrypt_params: DecryptParams
+    ) -> Union[DecryptedContent, None]:
+        """
+        Decrypts an encrypted submission with the key that the keyring holds for the form the webhook was sent for.
+        :param header: X-FormSG-Signature header of the webhook
+        :param decrypt_params: The params containing encrypted content and information
+        :returns: The decrypted content if successful. Else, null will be returned.
+        :raises MissingSecretKeyException: if no keyring was provided, or the keyring holds no key for the form
+        """
+        return self.decrypt(self._private_key_for_header(header), decrypt_params)
+
+    def decrypt_attachments_from_header(
+        self,
+        header: str,
+        decrypt_params: DecryptParams,
+        timeout: Optional[float] = None,
+    ) -> Union[DecryptedContentAndAttachments, None]:
+        """
+        Decrypts an encrypted submission and its attachments with the key that the keyring holds for the form the webhook was sent for.
+        :param header: X-FormSG-Signature header of the webhook
+        :param decrypt_params: The params containing encrypted content and information
+        :param timeout: Optional time limit in seconds for downloading all attachments
+        :raises MissingSecretKeyException: if no keyring was provided, or the keyring holds no key for the form
+        """
+        return self.decrypt_attachments(
+            self._private_key_for_header(header), decrypt_params, timeout
+        )
+
+    def _private_key_for_header(self, header: str) -> PrivateKey:
+        if not self.keyring:
+            raise MissingSecretKeyException(
+                "A keyring must be provided when instantiating the Crypto class in order to pick the form secret key from the webhook header"
+            )
+        return self.keyring.private_key_for_header(header)
 
-        # possible improvement: make this parallel (eg. with grequests, request_futures)
+    def _create_context(
+        self, form_secret_key: FormSecretKey
+    ) -> Union[DecryptionContext, None]:
         try:
-            for field_id in field_ids:
-                resp = requests.get(attachment_records[field_id])  # type: ignore
-                data = resp.json()
-                encrypted_file = convert_encrypted_attachment_to_file_content(data)
-                decrypted_file = self.decrypt_file(form_secret_key, encrypted_file)
-                if not decrypted_file:
-                    raise AttachmentDecryptionException()
-                decrypted_record: DecryptedFile = {
-                    "filename": filenames[field_id],
-                    "content": decrypted_file,
-                }
-                decrypted_records[field_id] = decrypted_record
-        except AttachmentDecryptionException:
-            raise
+            return DecryptionContext(form_secret_key)
         except Exception as e:
             logger.error(e)
             return None
-        returned_object["attachments"] = decrypted_records
-        return returned_object
+
+    def _open_verified(
+        self, context: DecryptionContext, decrypt_params: DecryptParams
+    ) -> Optional[Mapping[str, Any]]:
+        observer = self.observer
+        if observer is None:
+            return self._decrypt_verified_content(context, decrypt_params)
+        started = time.perf_counter()
+        verified = self._decrypt_verified_content(context, decrypt_params)
+        observer(
+            Stage.VERIFIED_CONTENT_OPEN,
+            time.perf_counter() - started,
+            _envelope_size(decrypt_params["verifiedContent"]),  # type: ignore
+        )
+        return verified
 
     def _decrypt_verified_content(
-        self, form_secret_key: str, decrypt_params: DecryptParams
-    ):
-        if not self.signing_public_key:
+        self, context: DecryptionContext, decrypt_params: DecryptParams
+    ) -> Optional[Mapping[str, Any]]:
+        if not self._signing_verify_key:
             raise MissingPublicKeyException(
                 "Public signing key must be provided when instantiating the Crypto class in order to verify verified content"
             )
-        decrypted_verified_content = decrypt_content(
-            form_secret_key, decrypt_params["verifiedContent"]  # type: ignore
-        )
-        if not decrypted_verified_content:
-            raise Exception("Failed to decrypt verified content")
+        verified_content = decrypt_params["verifiedContent"]  # type: ignore
+        if not isinstance(
+            verified_content, _ENVELOPE_TYPES
+        ) or not self.limits.allows_content(verified_content):
+            return None
+        envelope = parse_envelope(verified_content)
+        if envelope is None:
+            return None
+        decrypted_verified_content = context.open(*envelope)
+        if decrypted_verified_content is None:
+            return None
+        try:
+            return verify_signed_message(
+                decrypted_verified_content,
+                self._signing_verify_key,
+                self.json_backend,
+            )
+        except (BadSignatureError, ValueError):
+            return None
 
-        return verify_signed_message(
-            decrypted_verified_content, self.signing_public_key
-        )
+
+def _envelope_size(envelope: Any) -> Optional[int]:
+    return len(envelope) if isinstance(envelope, _ENVELOPE_TYPES) else None
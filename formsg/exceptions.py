@@ -2,13 +2,45 @@ class WebhookAuthenticateException(Exception):
     pass
 
 
+class WebhookReplayException(WebhookAuthenticateException):
+    pass
+
+
 class AttachmentDecryptionException(Exception):
     pass
 
 
+class AttachmentDownloadException(Exception):
+    pass
+
+
 class MissingPublicKeyException(Exception):
     pass
 
 
 class MissingSecretKeyException(Exception):
     pass
+
+
+class VerifiedContentException(Exception):
+    pass
+
+
+class MissingTransactionExpiryException(Exception):
+    pass
+
+
+class LimitExceededException(Exception):
+    pass
+
+
+class HeaderTooLongException(LimitExceededException, WebhookAuthenticateException):
+    pass
+
+
+class AttachmentTooLargeException(LimitExceededException, AttachmentDownloadException):
+    pass
+
+
+class DecryptWorkerException(Exception):
+    pass
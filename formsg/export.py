@@ -0,0 +1,373 @@
+import csv
+import glob
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    IO,
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from formsg.crypto import Crypto
+from formsg.schemas.crypto import DecryptedContent, DecryptParams, FormField
+from formsg.util.parser import parse_signature_header
+from formsg.util.webhook import is_signature_valid
+
+logger = logging.getLogger(__name__)
+
+METADATA_COLUMNS = ["submissionId", "formId", "created"]
+
+# number of records between checkpoints
+CHECKPOINT_INTERVAL = 1000
+
+
+class ExportStats(object):
+    def __init__(self):
+        self.records = 0
+        self.exported = 0
+        self.failed = 0
+        self.unauthenticated = 0
+        self.bytes_read = 0
+        self.attachment_bytes = 0
+        # columns left out of a CSV export, as they were not in its header
+        self.dropped_columns: List[str] = []
+        self.started = time.monotonic()
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        megabytes = (self.bytes_read + self.attachment_bytes) / 1e6
+        summary = (
+            f"exported={self.exported} failed={self.failed} "
+            f"unauthenticated={self.unauthenticated} in {elapsed:.2f}s "
+            f"({self.exported / elapsed:.1f} submissions/s, {megabytes / elapsed:.2f} MB/s)"
+        )
+        if self.dropped_columns:
+            summary += f"\ncolumns not in the CSV header were left out: {', '.join(self.dropped_columns)}"
+        return summary
+
+
+class _Record(object):
+    __slots__ = ("number", "data", "header")
+
+    def __init__(self, number: int, data: Dict[str, Any], header: Optional[str]):
+        self.number = number
+        self.data = data
+        self.header = header
+
+
+def iter_input_files(paths: Iterable[str]) -> Iterator[str]:
+    """
+    Expands directories into the NDJSON files they contain, in a stable order.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, "*.ndjson"))
+            found += glob.glob(os.path.join(path, "*.jsonl"))
+            yield from sorted(found)
+        else:
+            yield path
+
+
+def _iter_records(
+    paths: Iterable[str], skip: int, stats: ExportStats
+) -> Iterator[_Record]:
+    """
+    Reads stored webhooks, one JSON object per line. A line is either the webhook
+    body, `{"data": {...}}`, or `{"headers": {"X-FormSG-Signature": ...}, "body": {"data": {...}}}`.
+    """
+    number = 0
+    for path in iter_input_files(paths):
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                number += 1
+                if number <= skip:
+                    continue
+                stats.records += 1
+                stats.bytes_read += len(line)
+                try:
+                    record = json.loads(line)
+                    body = record.get("body", record)
+                    data = body.get("data", body)
+                    headers = {
+                        k.lower(): v for k, v in record.get("headers", {}).items()
+                    }
+                    yield _Record(number, data, headers.get("x-formsg-signature"))
+                except (ValueError, AttributeError):
+                    logger.error(f"Skipping malformed record {number} in {path}")
+                    yield _Record(number, {}, None)
+
+
+def flatten(responses: List[FormField], columns: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Flattens decrypted responses into one value per question.
+    :param responses: The decrypted responses
+    :param columns: Mapping of field ID to column name, extended with any new fields
+    """
+    row = {}
+    for field in responses:
+        if field.get("isHeader") or field.get("fieldType") == "section":
+            continue
+        field_id = field["_id"]
+        if field_id not in columns:
+            name = field["question"]
+            if name in columns.values() or name in METADATA_COLUMNS:
+                name = f"{name} ({field_id})"
+            columns[field_id] = name
+        value: Any = field.get("answer")
+        if value is None:
+            value = field.get("answerArray")
+        row[columns[field_id]] = value
+    return row
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, list):
+        if not all(isinstance(v, str) for v in value):
+            return json.dumps(value)
+        return "; ".join(value)
+    return value
+
+
+class Exporter(object):
+    def __init__(
+        self,
+        crypto: Crypto,
+        form_secret_key: str,
+        output: str,
+        output_format: str = "ndjson",
+        uri: Optional[str] = None,
+        attachments_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        checkpoint: Optional[str] = None,
+    ):
+        """
+        Decrypts stored webhooks to a flattened NDJSON or CSV file.
+        :param crypto: The Crypto instance to decrypt with
+        :param form_secret_key: The base-64 secret key of the form
+        :param output: Path of the file to write to
+        :param output_format: ndjson or csv
+        :param uri: If given, webhook signatures are verified against this URI and unsigned or forged records are skipped
+        :param attachments_dir: If given, attachments are downloaded into a directory per submission here
+        :param workers: Number of worker processes, or threads when downloading attachments
+        :param checkpoint: Path of a checkpoint file, used to resume an interrupted export
+        """
+        if output_format not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported format {output_format}")
+        self.crypto = crypto
+        self.form_secret_key = form_secret_key
+        self.output = output
+        self.output_format = output_format
+        self.uri = uri
+        self.attachments_dir = attachments_dir
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.columns: Dict[str, str] = {}
+        self.fieldnames: Optional[List[str]] = None
+        self._header: Set[str] = set()
+        self.stats = ExportStats()
+
+    def run(self, paths: Iterable[str]) -> ExportStats:
+        state = self._load_checkpoint()
+        if state and not os.path.exists(self.output):
+            logger.warning(
+                f"{self.output} does not exist, so the export starts over instead of resuming from {self.checkpoint}"
+            )
+            state = {}
+        self.columns = state.get("columns", {})
+        self.fieldnames = state.get("fieldnames")
+        skip = state.get("records", 0)
+
+        mode = "r+" if state else "w"
+        with open(self.output, mode, newline="", encoding="utf-8") as out:
+            # drop anything written after the last checkpoint
+            out.seek(state.get("output_size", 0))
+            out.truncate()
+            writer = None
+            for record, result in self._decrypt(_iter_records(paths, skip, self.stats)):
+                if result is not None:
+                    row = self._row(record, result)
+                    if self.output_format == "ndjson":
+                        out.write(json.dumps(row) + "\n")
+                    else:
+                        if writer is None:
+                            writer = self._csv_writer(out)
+                        self._check_columns(record, row)
+                        writer.writerow({k: _csv_value(v) for k, v in row.items()})
+                    self.stats.exported += 1
+                # every record is yielded in order, including those dropped, so
+                # all of those up to this one have been written out
+                if (record.number - skip) % CHECKPOINT_INTERVAL == 0:
+                    self._save_checkpoint(out, record.number)
+            self._save_checkpoint(out, skip + self.stats.records)
+        return self.stats
+
+    def _decrypt(
+        self, records: Iterator[_Record]
+    ) -> Iterator[Tuple[_Record, Optional[DecryptedContent]]]:
+        """
+        Yields every record in input order with its decrypted content, or None if
+        it was malformed, unauthenticated or failed to decrypt.
+        """
+        # records read ahead, and whether each was sent to be decrypted
+        pending: Deque[Tuple[_Record, bool]] = deque()
+
+        def authenticated() -> Iterator[DecryptParams]:
+            for record in records:
+                if not record.data:
+                    self.stats.failed += 1
+                    pending.append((record, False))
+                    continue
+                if not self._is_authentic(record):
+                    self.stats.unauthenticated += 1
+                    pending.append((record, False))
+                    continue
+                pending.append((record, True))
+                yield record.data  # type: ignore
+
+        if self.attachments_dir:
+            results: Iterator[Optional[DecryptedContent]] = self._decrypt_attachments(
+                authenticated()
+            )
+        else:
+            results = (
+                item["result"]
+                for item in self.crypto.decrypt_many(
+                    self.form_secret_key, authenticated(), workers=self.workers
+                )
+            )
+        for result in results:
+            while not pending[0][1]:
+                yield pending.popleft()[0], None
+            if result is None:
+                self.stats.failed += 1
+            yield pending.popleft()[0], result
+        while pending:
+            yield pending.popleft()[0], None
+
+    def _decrypt_attachments(
+        self, params: Iterator[DecryptParams]
+    ) -> Iterator[Optional[DecryptedContent]]:
+        def decrypt(
+            decrypt_params: DecryptParams,
+        ) -> Tuple[Optional[DecryptedContent], int]:
+            submission_dir = os.path.join(
+                self.attachments_dir,  # type: ignore
+                str(decrypt_params.get("submissionId", "unknown")),
+            )
+            os.makedirs(submission_dir, exist_ok=True)
+            if not decrypt_params.get("attachmentDownloadUrls"):
+                return self.crypto.decrypt(self.form_secret_key, decrypt_params), 0
+            result = self.crypto.decrypt_attachments_to(
+                self.form_secret_key,
+                decrypt_params,
+                lambda field_id, filename: open(
+                    # filenames come from the submitter, so path components are dropped
+                    os.path.join(
+                        submission_dir, f"{field_id}-{os.path.basename(filename)}"
+                    ),
+                    "w+b",
+                ),
+            )
+            if result is None:
+                return None, 0
+            size = 0
+            for attachment in result["attachments"].values():
+                size += attachment["size"]
+                attachment["file"].close()
+            return result["content"], size
+
+        def collect(future: Future) -> Optional[DecryptedContent]:
+            # counted here rather than in `decrypt`, so that only this thread updates the stats
+            content, size = future.result()
+            self.stats.attachment_bytes += size
+            return content
+
+        # a bounded window of submissions in flight, yielded in input order
+        workers = self.workers or 8
+        with ThreadPoolExecutor(workers) as executor:
+            window: Deque[Future] = deque()
+            for decrypt_params in params:
+                window.append(executor.submit(decrypt, decrypt_params))
+                if len(window) >= workers * 2:
+                    yield collect(window.popleft())
+            while window:
+                yield collect(window.popleft())
+
+    def _is_authentic(self, record: _Record) -> bool:
+        if self.uri is None:
+            return True
+        if not record.header:
+            return False
+        try:
+            # stored webhooks are older than the replay window, so only the
+            # signature is checked and not the epoch
+            return is_signature_valid(
+                self.uri,
+                parse_signature_header(record.header),
+                self.crypto.signing_public_key,
+            )
+        except Exception:
+            return False
+
+    def _row(self, record: _Record, result: DecryptedContent) -> Dict[str, Any]:
+        row = {column: record.data.get(column) for column in METADATA_COLUMNS}
+        row.update(flatten(result["responses"], self.columns))
+        return row
+
+    def _csv_writer(self, out: IO[str]) -> csv.DictWriter:
+        # CSV columns are fixed by the first exported submission; fields added
+        # to the form afterwards are left out
+        header_written = self.fieldnames is not None
+        if self.fieldnames is None:
+            self.fieldnames = METADATA_COLUMNS + list(self.columns.values())
+        self._header = set(self.fieldnames)
+        writer = csv.DictWriter(out, fieldnames=self.fieldnames, extrasaction="ignore")
+        if not header_written:
+            writer.writeheader()
+        return writer
+
+    def _check_columns(self, record: _Record, row: Dict[str, Any]):
+        # the header cannot be extended once rows follow it, so columns first seen
+        # afterwards are left out, and reported once each
+        for column in row:
+            if column not in self._header and column not in self.stats.dropped_columns:
+                logger.warning(
+                    f"Column {column!r} first seen in record {record.number} is not in the CSV header "
+                    "and is left out; export as NDJSON to keep it"
+                )
+                self.stats.dropped_columns.append(column)
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return {}
+        with open(self.checkpoint) as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, out: IO[str], records: int):
+        if not self.checkpoint:
+            return
+        out.flush()
+        os.fsync(out.fileno())
+        state = {
+            "records": records,
+            "output_size": out.tell(),
+            "columns": self.columns,
+            "fieldnames": self.fieldnames,
+        }
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint)
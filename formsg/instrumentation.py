@@ -0,0 +1,113 @@
+"""
+Timing of each stage of authenticating and decrypting a submission.
+
+An observer is any callable taking `(stage, duration, size)`, where `stage` is one
+of the :class:`Stage` names, `duration` is in seconds and `size` is the number of
+bytes processed, or None if not applicable. Pass it as `observer` to
+:class:`FormSdk`. When no observer is set, stages are not timed at all.
+
+Example::
+
+    def observe(stage, duration, size):
+        print(stage, duration, size)
+
+    sdk = FormSdk("PRODUCTION", observer=observe)
+"""
+
+import logging
+from typing import Any, Callable, Optional
+
+Observer = Callable[[str, float, Optional[int]], None]
+
+
+class Stage(object):
+    HEADER_PARSE = "header_parse"
+    SIGNATURE_VERIFY = "signature_verify"
+    BASE64_DECODE = "base64_decode"
+    BOX_DECRYPT = "box_decrypt"
+    JSON_PARSE = "json_parse"
+    SCHEMA_VALIDATION = "schema_validation"
+    VERIFIED_CONTENT_OPEN = "verified_content_open"
+    ATTACHMENT_DOWNLOAD = "attachment_download"
+    ATTACHMENT_DECRYPT = "attachment_decrypt"
+    # time a webhook waited in a :class:`formsg.spool.Spool` before a worker claimed it
+    SPOOL_WAIT = "spool_wait"
+    # time a spool worker took to decrypt and handle a webhook
+    SPOOL_PROCESS = "spool_process"
+
+    ALL = (
+        HEADER_PARSE,
+        SIGNATURE_VERIFY,
+        BASE64_DECODE,
+        BOX_DECRYPT,
+        JSON_PARSE,
+        SCHEMA_VALIDATION,
+        VERIFIED_CONTENT_OPEN,
+        ATTACHMENT_DOWNLOAD,
+        ATTACHMENT_DECRYPT,
+        SPOOL_WAIT,
+        SPOOL_PROCESS,
+    )
+
+
+class LoggingObserver(object):
+    def __init__(
+        self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG
+    ):
+        """
+        Writes a log line per stage, eg. `formsg stage=box_decrypt duration_ms=0.052 size=2048`.
+        :param logger: The logger to write to. Defaults to the `formsg.instrumentation` logger.
+        :param level: The level to log at
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, stage: str, duration: float, size: Optional[int]):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level,
+                "formsg stage=%s duration_ms=%.3f size=%s",
+                stage,
+                duration * 1000,
+                "-" if size is None else size,
+            )
+
+
+class PrometheusObserver(object):
+    def __init__(
+        self,
+        registry: Any = None,
+        namespace: str = "formsg",
+        buckets: Optional[tuple] = None,
+    ):
+        """
+        Records the duration and size of each stage in histograms labelled by stage,
+        `formsg_stage_duration_seconds` and `formsg_stage_size_bytes`. Requires `prometheus_client`.
+        :param registry: The `CollectorRegistry` to register the histograms with. Defaults to the global registry.
+        :param namespace: Prefix of the metric names
+        :param buckets: Optional buckets of the duration histogram, in seconds
+        """
+        from prometheus_client import REGISTRY, Histogram
+
+        duration_kwargs = {"buckets": buckets} if buckets else {}
+        self.durations = Histogram(
+            "stage_duration_seconds",
+            "Duration of each stage of authenticating and decrypting submissions",
+            ["stage"],
+            namespace=namespace,
+            registry=registry or REGISTRY,
+            **duration_kwargs,
+        )
+        self.sizes = Histogram(
+            "stage_size_bytes",
+            "Number of bytes processed by each stage of decrypting submissions",
+            ["stage"],
+            namespace=namespace,
+            registry=registry or REGISTRY,
+            buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+        )
+
+    def __call__(self, stage: str, duration: float, size: Optional[int]):
+        self.durations.labels(stage).observe(duration)
+        if size is not None:
+            self.sizes.labels(stage).observe(size)
@@ -0,0 +1,142 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Mapping, Optional, Tuple
+
+from formsg.exceptions import MissingSecretKeyException
+from formsg.util.parser import parse_signature_header
+
+if TYPE_CHECKING:
+    from nacl.public import PrivateKey
+
+logger = logging.getLogger(__name__)
+
+# (mtime in ns, size) of the keys file the current keys were loaded from
+_FileSignature = Tuple[int, int]
+
+
+class _KeyringState(object):
+    """
+    An immutable snapshot of the keyring's secrets, swapped in as a whole when
+    the keys file is reloaded so that readers never see a partial reload.
+    """
+
+    def __init__(
+        self, secrets: Mapping[str, str], file_signature: Optional[_FileSignature]
+    ):
+        self.secrets = dict(secrets)
+        self.file_signature = file_signature
+        self.private_keys: "OrderedDict[str, PrivateKey]" = OrderedDict()
+
+
+class FormKeyring(object):
+    def __init__(
+        self,
+        keys: Optional[Mapping[str, str]] = None,
+        path: Optional[str] = None,
+        max_cached_keys: int = 256,
+        reload_interval: float = 1.0,
+    ):
+        """
+        Holds the secret keys of many forms, keyed by form ID.
+        :param keys: Mapping of form ID to the base-64 secret key of the form
+        :param path: Optional path to a JSON file mapping form ID to secret key. If given, the file is reloaded whenever it changes.
+        :param max_cached_keys: Maximum number of decoded private keys to keep
+        :param reload_interval: Minimum number of seconds between checks of the keys file for changes
+        """
+        if keys is None and path is None:
+            raise TypeError("Either keys or path must be provided to FormKeyring")
+        self.path = path
+        self.max_cached_keys = max_cached_keys
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._last_checked = 0.0
+        self._state = _KeyringState(keys or {}, None)
+        if path is not None:
+            self.reload_if_changed(force=True)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "FormKeyring":
+        return cls(path=path, **kwargs)
+
+    def __contains__(self, form_id: str) -> bool:
+        self._maybe_reload()
+        return form_id in self._state.secrets
+
+    def __len__(self) -> int:
+        self._maybe_reload()
+        return len(self._state.secrets)
+
+    def private_key(self, form_id: str) -> "PrivateKey":
+        """
+        Returns the decoded private key of the given form.
+        :param form_id: The form ID
+        :raises MissingSecretKeyException: if the keyring holds no key for the form
+        """
+        self._maybe_reload()
+        state = self._state
+        with self._lock:
+            private_key = state.private_keys.get(form_id)
+            if private_key is not None:
+                state.private_keys.move_to_end(form_id)
+                return private_key
+
+        if form_id not in state.secrets:
+            raise MissingSecretKeyException(f"No secret key for form_id={form_id}")
+        from nacl.public import PrivateKey
+
+        private_key = PrivateKey(base64.b64decode(state.secrets[form_id]))
+
+        with self._lock:
+            state.private_keys[form_id] = private_key
+            while len(state.private_keys) > self.max_cached_keys:
+                state.private_keys.popitem(last=False)
+        return private_key
+
+    def private_key_for_header(self, header: str) -> "PrivateKey":
+        """
+        Returns the decoded private key of the form that a webhook was sent for.
+        :param header: X-FormSG-Signature header
+        :raises MissingSecretKeyException: if the keyring holds no key for the form
+        """
+        return self.private_key(parse_signature_header(header)["f"])
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """
+        Reloads the keys file if it has changed since it was last loaded.
+        The new keys replace the old ones in a single step. If the file cannot be
+        read or parsed, the previously loaded keys are kept.
+        :param force: Reload even if the file appears unchanged
+        :rtype: :class:`bool` true if the keys were reloaded
+        """
+        if self.path is None:
+            return False
+        self._last_checked = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+            file_signature = (stat.st_mtime_ns, stat.st_size)
+            if not force and file_signature == self._state.file_signature:
+                return False
+            with open(self.path) as f:
+                secrets = json.load(f)
+            if not isinstance(secrets, dict):
+                raise ValueError("keys file must contain a JSON object")
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load keys from {self.path}: {e}")
+            if force:
+                raise
+            return False
+
+        self._state = _KeyringState(secrets, file_signature)
+        return True
+
+    def _maybe_reload(self):
+        if (
+            self.path is not None
+            and time.monotonic() - self._last_checked >= self.reload_interval
+        ):
+            self.reload_if_changed()
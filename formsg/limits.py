@@ -0,0 +1,150 @@
+"""
+Limits on the size and shape of untrusted input, checked before it is decoded,
+decrypted or parsed, so that hostile payloads are shed cheaply.
+
+Pass a :class:`Limits` as `limits` to :class:`FormSdk`. Each rejection is counted
+by the name of the limit exceeded::
+
+    sdk = FormSdk("PRODUCTION", limits=Limits(max_field_count=500, max_depth=8))
+    sdk.limits.rejections()  # {"header_length": 0, "content_length": 3, ...}
+"""
+
+import threading
+from typing import Any, Dict, Optional, Sized
+
+# every field has an `_id`, and the quotes of a key cannot be escaped in JSON, so
+# the number of fields is at most the number of times the key occurs
+_FIELD_KEY = b'"_id"'
+
+# every byte except brackets and quotes, deleted when scanning for the depth
+_NOT_STRUCTURE = bytes(b for b in range(256) if b not in b'[]{}"')
+
+
+class Limit(object):
+    HEADER_LENGTH = "header_length"
+    CONTENT_LENGTH = "content_length"
+    ATTACHMENT_SIZE = "attachment_size"
+    FIELD_COUNT = "field_count"
+    DEPTH = "depth"
+
+    ALL = (HEADER_LENGTH, CONTENT_LENGTH, ATTACHMENT_SIZE, FIELD_COUNT, DEPTH)
+
+
+class Limits(object):
+    def __init__(
+        self,
+        max_header_length: Optional[int] = 1024,
+        max_content_length: Optional[int] = 10 * 1024 * 1024,
+        max_attachment_size: Optional[int] = 64 * 1024 * 1024,
+        max_field_count: Optional[int] = 10000,
+        max_depth: Optional[int] = None,
+    ):
+        """
+        Limits on webhooks, submissions and attachments. None disables a limit.
+        :param max_header_length: Maximum length of the `X-FormSG-Signature` header. FormSG's are under 200 characters.
+        :param max_content_length: Maximum length of `encryptedContent` and `verifiedContent`, in characters
+        :param max_attachment_size: Maximum size in bytes of a downloaded attachment record, which is the file encoded in base-64 within JSON
+        :param max_field_count: Maximum number of fields in a submission, bounded from the plaintext before it is parsed
+        :param max_depth: Maximum nesting of JSON arrays and objects in a submission, checked before it is parsed. FormSG's nest 4 deep. Off by default, as the check scans the whole plaintext, costing about half as much as parsing it with `json`.
+        """
+        self.max_header_length = max_header_length
+        self.max_content_length = max_content_length
+        self.max_attachment_size = max_attachment_size
+        self.max_field_count = max_field_count
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self.reset()
+
+    def allows_header(self, header: str) -> bool:
+        limit = self.max_header_length
+        if limit is None or len(header) <= limit:
+            return True
+        return self.reject(Limit.HEADER_LENGTH)
+
+    def allows_content(self, content: Sized) -> bool:
+        limit = self.max_content_length
+        if limit is None or len(content) <= limit:
+            return True
+        return self.reject(Limit.CONTENT_LENGTH)
+
+    def allows_attachment(self, size: int) -> bool:
+        limit = self.max_attachment_size
+        if limit is None or size <= limit:
+            return True
+        return self.reject(Limit.ATTACHMENT_SIZE)
+
+    def exceeded_by_plaintext(self, plaintext: bytes) -> Optional[str]:
+        """
+        Checks the field count and depth of a decrypted submission, before it is parsed.
+        :returns the :class:`Limit` exceeded, or None if it is within the limits
+        """
+        limit = self.max_field_count
+        # each field takes more bytes than the key alone, so short plaintexts need no count
+        if (
+            limit is not None
+            and len(plaintext) > limit * len(_FIELD_KEY)
+            and plaintext.count(_FIELD_KEY) > limit
+        ):
+            self.reject(Limit.FIELD_COUNT)
+            return Limit.FIELD_COUNT
+        if self.max_depth is not None and exceeds_depth(plaintext, self.max_depth):
+            self.reject(Limit.DEPTH)
+            return Limit.DEPTH
+        return None
+
+    def reject(self, limit: str) -> bool:
+        """
+        Counts a rejection by the given :class:`Limit`.
+        :returns false, for the checks to return
+        """
+        with self._lock:
+            self._counts[limit] += 1
+        return False
+
+    def rejections(self) -> Dict[str, int]:
+        """
+        Returns the number of rejections keyed by the name of each :class:`Limit`, eg. `content_length`.
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(Limit.ALL, 0)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # pickled without the counts, eg. for the workers of `Crypto.decrypt_many`
+        state = dict(self.__dict__)
+        del state["_lock"], state["_counts"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.reset()
+
+
+def exceeds_depth(data: bytes, max_depth: int) -> bool:
+    """
+    Checks whether JSON nests arrays and objects deeper than `max_depth`, without parsing it.
+    Unbalanced brackets are left for the parser to reject.
+    """
+    if b"\\" in data:
+        data = data.replace(b"\\\\", b"").replace(b'\\"', b"")
+    # removing adjacent quotes keeps every bracket on the same side of a string
+    # boundary, and leaves only the strings containing brackets
+    structure = data.translate(None, _NOT_STRUCTURE).replace(b'""', b"")
+    if b'"' in structure:
+        structure = b"".join(structure.split(b'"')[::2])
+    # each pass removes the innermost pairs of brackets
+    for _ in range(max_depth):
+        if not structure:
+            return False
+        reduced = (
+            structure.replace(b"[]", b"\0").replace(b"{}", b"\0").replace(b"\0", b"")
+        )
+        if len(reduced) == len(structure):
+            return False
+        structure = reduced
+    return bool(structure)
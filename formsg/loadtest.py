@@ -0,0 +1,219 @@
+"""
+A local FormSG stand-in that POSTs signed, encrypted webhooks to a receiver and
+measures how fast it answers.
+"""
+
+import hashlib
+import itertools
+import math
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import requests
+
+from formsg.testing import AttachmentServer, SyntheticForm
+from formsg.util.crypto import generate_keypair, generate_signing_keypair
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """
+    Returns the p-th percentile of sorted values, by the nearest-rank method.
+    """
+    if not sorted_values:
+        return math.nan
+    rank = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def seeded_form(seed: int, field_count: int) -> SyntheticForm:
+    """
+    Returns a synthetic form whose keys and answers are derived from the seed, so
+    that a load test can be rerun against a receiver configured with the same keys.
+    """
+
+    def key_seed(purpose: str) -> bytes:
+        return hashlib.sha256(f"formsg-loadtest:{purpose}:{seed}".encode()).digest()
+
+    return SyntheticForm(
+        field_count,
+        seed,
+        keypair=generate_keypair(key_seed("form")),
+        signing_keypair=generate_signing_keypair(key_seed("signing")),
+    )
+
+
+class LoadTestResult(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        # response status code, or the name of the exception for failed requests
+        self.statuses: Counter = Counter()
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    def record(self, status: str, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def ok(self) -> int:
+        return sum(n for status, n in self.statuses.items() if status.startswith("2"))
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.ok / max(self.elapsed, 1e-9)
+
+    def percentiles(self) -> Dict[str, float]:
+        """
+        Returns the p50, p90, p99 and maximum latency in ms.
+        """
+        latencies = sorted(self.latencies)
+        return {
+            "p50": percentile(latencies, 50) * 1000,
+            "p90": percentile(latencies, 90) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": (latencies[-1] if latencies else math.nan) * 1000,
+        }
+
+    def summary(self) -> str:
+        latency = " ".join(f"{k}={v:.1f}" for k, v in self.percentiles().items())
+        statuses = " ".join(f"{k}={v}" for k, v in sorted(self.statuses.items()))
+        return (
+            f"requests={self.count} ok={self.ok} errors={self.count - self.ok} "
+            f"in {self.elapsed:.2f}s ({self.throughput:.1f} ok/s)\n"
+            f"latency ms: {latency}\n"
+            f"status: {statuses}"
+        )
+
+
+class LoadGenerator(object):
+    def __init__(
+        self,
+        url: str,
+        form: SyntheticForm,
+        rate: Optional[float] = None,
+        concurrency: int = 8,
+        timeout: float = 10.0,
+        pool_size: int = 100,
+        verified: bool = False,
+        attachment_sizes: Sequence[int] = (),
+        server: Optional[AttachmentServer] = None,
+    ):
+        """
+        POSTs webhooks of a synthetic form to a receiver, signed with the form's signing key.
+        :param url: The receiver's URL, which the webhooks are signed for
+        :param form: The form to generate submissions of
+        :param rate: Requests per second. If given, requests are sent on a fixed schedule whether or not earlier ones have completed, and latency is measured from when each was due. Else, `concurrency` requests are kept in flight.
+        :param concurrency: Maximum number of requests in flight
+        :param timeout: Timeout of each request in seconds
+        :param pool_size: Number of distinct submissions to encrypt up front and cycle through. Each request gets its own submission ID.
+        :param verified: If true, submissions include verified content
+        :param attachment_sizes: Size in bytes of the attachments of each submission
+        :param server: Server to serve attachments from. Required if there are attachments.
+        """
+        self.url = url
+        self.form = form
+        self.rate = rate
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+        # encrypted up front, so that encryption does not compete with sending
+        self._pool = [
+            form.submission(verified, attachment_sizes, server)
+            for _ in range(pool_size)
+        ]
+
+    def run(
+        self, total: Optional[int] = None, duration: Optional[float] = None
+    ) -> LoadTestResult:
+        """
+        Sends webhooks until `total` have been sent or `duration` seconds have passed.
+        """
+        if total is None and duration is None:
+            raise TypeError("Either total or duration must be provided")
+        result = LoadTestResult()
+        deadline = None if duration is None else result.started + duration
+        if self.rate:
+            self._run_at_rate(result, total, deadline)
+        else:
+            self._run_closed(result, total, deadline)
+        result.finished = time.monotonic()
+        return result
+
+    def _run_at_rate(
+        self,
+        result: LoadTestResult,
+        total: Optional[int],
+        deadline: Optional[float],
+    ):
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            for i in itertools.count():
+                if total is not None and i >= total:
+                    break
+                scheduled = result.started + i / self.rate  # type: ignore
+                if deadline is not None and scheduled >= deadline:
+                    break
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._send, i, scheduled, result)
+
+    def _run_closed(
+        self,
+        result: LoadTestResult,
+        total: Optional[int],
+        deadline: Optional[float],
+    ):
+        counter = itertools.count()
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    i = next(counter)
+                if total is not None and i >= total:
+                    return
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                self._send(i, time.monotonic(), result)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _send(self, index: int, scheduled: float, result: LoadTestResult):
+        data: Dict[str, Any] = dict(self._pool[index % len(self._pool)])  # type: ignore
+        data["submissionId"] = f"{self.form.seed:08x}{index:016x}"
+        header = self.form.signature_header(self.url, data["submissionId"])
+        try:
+            response = self._session().post(
+                self.url,
+                json={"data": data},
+                headers={"X-FormSG-Signature": header},
+                timeout=self.timeout,
+            )
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        result.record(status, time.monotonic() - scheduled)
+
+    def _session(self) -> requests.Session:
+        # sessions are not thread-safe, so each sending thread keeps its own
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
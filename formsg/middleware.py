@@ -0,0 +1,324 @@
+"""
+WSGI and ASGI middleware that receive FormSG webhooks.
+
+Each request is rejected at the cheapest possible point:
+1. a missing, forged or expired `X-FormSG-Signature` header, before the body is read
+2. a body over `max_body_size`, or under WSGI one without a Content-Length, before it is read
+3. a body that is not JSON, or a submission that cannot be decrypted
+
+The JSON is parsed once and the submission decrypted once. The wrapped app is then
+called with the decrypted submission under the `formsg.submission` key of the WSGI
+environ or ASGI scope. Requests to other paths, and other methods, are passed through.
+
+Given a :class:`formsg.spool.Spool`, authenticated webhooks are instead written to the
+spool and answered with 202 without calling the app, to be decrypted later by a
+:class:`formsg.spool.SpoolWorker`.
+"""
+
+import asyncio
+import io
+import logging
+import urllib.parse
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from formsg.aio import AsyncFormSdk
+from formsg.exceptions import (
+    AttachmentDecryptionException,
+    MissingSecretKeyException,
+    WebhookAuthenticateException,
+)
+from formsg.schemas.crypto import DecryptedContent, DecryptedContentAndAttachments
+from formsg.schemas.webhook import WebhookSubmission
+from formsg.sdk import FormSdk
+from formsg.spool import Spool
+from formsg.util.crypto import FormSecretKey
+
+logger = logging.getLogger(__name__)
+
+SUBMISSION_KEY = "formsg.submission"
+
+# FormSG submissions are small, but attachments are downloaded separately
+DEFAULT_MAX_BODY_SIZE = 2 * 1024 * 1024
+
+# (status, message) of a response given without calling the app
+_Response = Tuple[int, str]
+
+_REASONS = {
+    202: "Accepted",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    411: "Length Required",
+    413: "Payload Too Large",
+}
+
+
+class _WebhookMiddleware(object):
+    def __init__(
+        self,
+        app: Any,
+        sdk: Union[FormSdk, AsyncFormSdk],
+        uri: str,
+        form_secret_key: Optional[FormSecretKey] = None,
+        path: Optional[str] = None,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+        attachments: bool = False,
+        spool: Optional[Spool] = None,
+    ):
+        """
+        :param app: The app to call with authenticated, decrypted submissions
+        :param sdk: The SDK to authenticate and decrypt with
+        :param uri: The full URI that FormSG posts webhooks to, which they are signed for
+        :param form_secret_key: The secret key of the form. If not given, the key is picked from the SDK's keyring by the form ID in the signature.
+        :param path: Path that webhooks are posted to. Defaults to the path of `uri`.
+        :param max_body_size: Maximum size of a webhook body in bytes
+        :param attachments: If true, attachments are also downloaded and decrypted
+        :param spool: Optional spool to write authenticated webhooks to, instead of decrypting them and calling the app
+        """
+        if spool is None and form_secret_key is None and sdk.keyring is None:
+            raise MissingSecretKeyException(
+                "Either form_secret_key or an SDK with a keyring must be provided"
+            )
+        self.app = app
+        self.sdk = sdk
+        self.uri = uri
+        self.form_secret_key = form_secret_key
+        self.path = path if path is not None else urllib.parse.urlparse(uri).path
+        self.max_body_size = max_body_size
+        self.attachments = attachments
+        self.spool = spool
+
+    def _authenticate(self, header: str) -> Optional[_Response]:
+        if not header:
+            return 401, "Missing X-FormSG-Signature header"
+        try:
+            self.sdk.webhooks.authenticate(header, self.uri)
+        except (WebhookAuthenticateException, KeyError, ValueError) as e:
+            logger.warning(f"Rejected webhook: {e}")
+            return 401, "Signature could not be verified"
+        return None
+
+    def _check_content_length(
+        self, content_length: Optional[str], required: bool = False
+    ) -> Optional[_Response]:
+        if content_length is None:
+            return (411, "Missing Content-Length") if required else None
+        try:
+            size = int(content_length)
+        except ValueError:
+            return 400, "Invalid Content-Length"
+        if size < 0:
+            return 400, "Invalid Content-Length"
+        if size > self.max_body_size:
+            return 413, "Body too large"
+        return None
+
+    def _form_secret_key(self, header: str) -> Optional[FormSecretKey]:
+        if self.form_secret_key is not None:
+            return self.form_secret_key
+        try:
+            return self.sdk.keyring.private_key_for_header(header)  # type: ignore
+        except MissingSecretKeyException as e:
+            logger.warning(e)
+            return None
+
+    def _parse(self, body: bytes) -> Optional[Any]:
+        try:
+            data = self.sdk.crypto.json_backend.loads(body)["data"]
+        except (ValueError, KeyError, TypeError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    @staticmethod
+    def _submission(data: Any, decrypted: Any, attachments: bool) -> WebhookSubmission:
+        submission: WebhookSubmission = {
+            "formId": data.get("formId"),
+            "submissionId": data.get("submissionId"),
+            "created": data.get("created"),
+            "content": decrypted["content"] if attachments else decrypted,
+        }
+        if attachments:
+            submission["attachments"] = decrypted["attachments"]
+        return submission
+
+
+class WebhookWSGIMiddleware(_WebhookMiddleware):
+    """
+    WSGI middleware that authenticates and decrypts FormSG webhooks.
+    The decrypted submission is at `environ["formsg.submission"]`.
+
+    Example::
+
+        app.wsgi_app = WebhookWSGIMiddleware(app.wsgi_app, sdk, "https://example.com/webhook", FORM_SECRET_KEY)
+    """
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        if (
+            environ.get("REQUEST_METHOD") != "POST"
+            or environ.get("PATH_INFO") != self.path
+        ):
+            return self.app(environ, start_response)
+
+        header = environ.get("HTTP_X_FORMSG_SIGNATURE", "")
+        content_length = environ.get("CONTENT_LENGTH") or None
+        rejection = self._authenticate(header) or self._check_content_length(
+            content_length, required=True
+        )
+        if rejection:
+            return _wsgi_respond(start_response, rejection)
+
+        # PEP 3333 forbids reading past the Content-Length, which was checked
+        # to be at most `max_body_size`
+        body = environ["wsgi.input"].read(int(content_length))  # type: ignore
+        if self.spool is not None:
+            self.spool.put(header, body)
+            return _wsgi_respond(start_response, (202, "Accepted"))
+        data = self._parse(body)
+        if data is None:
+            return _wsgi_respond(start_response, (400, "Body is not a webhook"))
+
+        form_secret_key = self._form_secret_key(header)
+        if form_secret_key is None:
+            return _wsgi_respond(start_response, (403, "Unknown form"))
+        decrypted: Union[DecryptedContent, DecryptedContentAndAttachments, None]
+        try:
+            if self.attachments:
+                decrypted = self.sdk.crypto.decrypt_attachments(form_secret_key, data)
+            else:
+                decrypted = self.sdk.crypto.decrypt(form_secret_key, data)
+        except AttachmentDecryptionException:
+            decrypted = None
+        if not decrypted:
+            return _wsgi_respond(
+                start_response, (400, "Submission could not be decrypted")
+            )
+
+        environ[SUBMISSION_KEY] = self._submission(data, decrypted, self.attachments)
+        # the body stays readable by the app
+        environ["wsgi.input"] = io.BytesIO(body)
+        environ["CONTENT_LENGTH"] = str(len(body))
+        return self.app(environ, start_response)
+
+
+def _wsgi_respond(start_response: Callable, response: _Response) -> List[bytes]:
+    status, message = response
+    body = message.encode("utf-8")
+    start_response(
+        f"{status} {_REASONS[status]}",
+        [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))],
+    )
+    return [body]
+
+
+class WebhookASGIMiddleware(_WebhookMiddleware):
+    """
+    ASGI middleware that authenticates and decrypts FormSG webhooks on an :class:`AsyncFormSdk`.
+    The decrypted submission is at `scope["formsg.submission"]`.
+
+    Example::
+
+        app = WebhookASGIMiddleware(app, AsyncFormSdk("PRODUCTION"), "https://example.com/webhook", FORM_SECRET_KEY)
+    """
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if (
+            scope["type"] != "http"
+            or scope.get("method") != "POST"
+            or scope.get("path") != self.path
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers: Dict[bytes, str] = {}
+        for name, value in scope.get("headers", []):
+            if name in (b"x-formsg-signature", b"content-length"):
+                headers[name] = value.decode("latin-1")
+        header = headers.get(b"x-formsg-signature", "")
+        rejection = self._authenticate(header) or self._check_content_length(
+            headers.get(b"content-length")
+        )
+        if rejection:
+            await _asgi_respond(send, rejection)
+            return
+
+        body = await self._read_body(receive)
+        if body is None:
+            await _asgi_respond(send, (413, "Body too large"))
+            return
+        if self.spool is not None:
+            # written with fsync, so off the event loop
+            await asyncio.get_event_loop().run_in_executor(
+                None, self.spool.put, header, body
+            )
+            await _asgi_respond(send, (202, "Accepted"))
+            return
+        data = self._parse(body)
+        if data is None:
+            await _asgi_respond(send, (400, "Body is not a webhook"))
+            return
+
+        form_secret_key = self._form_secret_key(header)
+        if form_secret_key is None:
+            await _asgi_respond(send, (403, "Unknown form"))
+            return
+        decrypted: Union[DecryptedContent, DecryptedContentAndAttachments, None]
+        try:
+            if self.attachments:
+                decrypted = await self.sdk.decrypt_attachments(form_secret_key, data)  # type: ignore
+            else:
+                decrypted = await self.sdk.decrypt(form_secret_key, data)  # type: ignore
+        except AttachmentDecryptionException:
+            decrypted = None
+        if not decrypted:
+            await _asgi_respond(send, (400, "Submission could not be decrypted"))
+            return
+
+        scope[SUBMISSION_KEY] = self._submission(data, decrypted, self.attachments)
+        await self.app(scope, _replay(body, receive), send)
+
+    async def _read_body(self, receive: Callable) -> Optional[bytes]:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_size:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+
+def _replay(body: bytes, receive: Callable) -> Callable:
+    # the body stays readable by the app, after which messages such as
+    # disconnects come from the server
+    sent = False
+
+    async def replay() -> dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+async def _asgi_respond(send: Callable, response: _Response):
+    status, message = response
+    body = message.encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"text/plain"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
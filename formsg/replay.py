@@ -0,0 +1,84 @@
+"""
+Caches of the webhooks already received, so that a webhook replayed within the
+window in which its signature is still recent can be rejected.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+
+class ReplayCache(ABC):
+    """
+    A set of webhook keys, each of which expires after a time to live.
+    Implement this to share the set across processes, eg. in Redis.
+    """
+
+    @abstractmethod
+    def add(self, key: str, ttl: float) -> bool:
+        """
+        Adds the key, unless it is already present. This must be atomic, so that of
+        concurrent calls with the same key only one returns true.
+        :param key: The key of the webhook
+        :param ttl: Seconds after which the key may be forgotten
+        :rtype: :class:`bool` true if the key was added, false if it was already present
+        """
+
+
+class MemoryReplayCache(ReplayCache):
+    def __init__(self, max_entries: int = 100000):
+        """
+        An in-process replay cache. Only replays received by the same process are rejected.
+        :param max_entries: Maximum number of keys held. Beyond this, the keys closest to expiring are forgotten first.
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> expiry, ordered by expiry as long as the ttl does not vary much
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        expiry = self._entries.get(key)
+        return expiry is not None and expiry > time.monotonic()
+
+    def add(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expiry = self._entries.get(key)
+            if expiry is not None and expiry > now:
+                return False
+            self._entries[key] = now + ttl
+            self._entries.move_to_end(key)
+            self._evict(now)
+        return True
+
+    def _evict(self, now: float):
+        entries = self._entries
+        while entries:
+            key, expiry = next(iter(entries.items()))
+            if expiry > now and len(entries) <= self.max_entries:
+                return
+            del entries[key]
+
+
+class RedisReplayCache(ReplayCache):
+    def __init__(self, client: Any, prefix: str = "formsg:webhook:"):
+        """
+        A replay cache shared by all processes using the same Redis server.
+        :param client: A `redis.Redis` client, or any object with its `set(name, value, nx=, px=)` method
+        :param prefix: Prefix of the Redis keys
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def add(self, key: str, ttl: float) -> bool:
+        # SET NX only sets keys which are not present, and returns None if it did not
+        return bool(
+            self.client.set(
+                self.prefix + key, b"1", nx=True, px=max(int(ttl * 1000), 1)
+            )
+        )
@@ -0,0 +1,109 @@
+import threading
+from enum import Enum
+from typing import Dict, Optional
+
+from formsg.limits import Limit
+from formsg.schemas.crypto import DecryptedContent
+
+
+class DecryptFailureReason(Enum):
+    # the secret key of the form is not a valid base-64 key
+    INVALID_SECRET_KEY = "invalid_secret_key"
+    # `encryptedContent` is missing or is not a `publicKey;nonce:ciphertext` envelope
+    MALFORMED_ENVELOPE = "malformed_envelope"
+    # the box could not be opened, so the key is wrong or the ciphertext was tampered with
+    WRONG_KEY = "wrong_key"
+    # `encryptedContent` is longer than `Limits.max_content_length`, so it was not decoded
+    CONTENT_TOO_LARGE = "content_too_large"
+    # the plaintext has more fields than `Limits.max_field_count`, so it was not parsed
+    TOO_MANY_FIELDS = "too_many_fields"
+    # the plaintext nests deeper than `Limits.max_depth`, or than the JSON parser can
+    TOO_DEEP = "too_deep"
+    # the plaintext is not UTF-8 JSON
+    BAD_JSON = "bad_json"
+    # the plaintext is JSON, but not a list of form fields
+    SCHEMA_VIOLATION = "schema_violation"
+    # the verified content could not be opened, or its signature is invalid
+    VERIFIED_SIGNATURE = "verified_signature"
+
+    @property
+    def description(self) -> str:
+        return _DESCRIPTIONS[self]
+
+
+_DESCRIPTIONS = {
+    DecryptFailureReason.INVALID_SECRET_KEY: "Form secret key is invalid",
+    DecryptFailureReason.MALFORMED_ENVELOPE: "Encrypted content is missing or malformed",
+    DecryptFailureReason.WRONG_KEY: "Failed to decrypt content, is your form_secret_key correct, or are you on the correct mode (staging/production)?",
+    DecryptFailureReason.CONTENT_TOO_LARGE: "Encrypted content exceeds the maximum length",
+    DecryptFailureReason.TOO_MANY_FIELDS: "Decrypted content exceeds the maximum number of fields",
+    DecryptFailureReason.TOO_DEEP: "Decrypted content exceeds the maximum nesting depth",
+    DecryptFailureReason.BAD_JSON: "Decrypted content is not valid JSON",
+    DecryptFailureReason.SCHEMA_VIOLATION: "Decrypted object does not fit expected shape",
+    DecryptFailureReason.VERIFIED_SIGNATURE: "Failed to open or verify verified content",
+}
+
+# the failure reported when a submission exceeds each :class:`Limit`
+LIMIT_FAILURES = {
+    Limit.CONTENT_LENGTH: DecryptFailureReason.CONTENT_TOO_LARGE,
+    Limit.FIELD_COUNT: DecryptFailureReason.TOO_MANY_FIELDS,
+    Limit.DEPTH: DecryptFailureReason.TOO_DEEP,
+}
+
+
+class DecryptResult(object):
+    """
+    The outcome of :meth:`Crypto.decrypt_result`: either the decrypted `content`, or the `reason` it failed.
+    A result is truthy if decryption succeeded.
+    """
+
+    __slots__ = ("content", "reason")
+
+    def __init__(
+        self,
+        content: Optional[DecryptedContent] = None,
+        reason: Optional[DecryptFailureReason] = None,
+    ):
+        self.content = content
+        self.reason = reason
+
+    @property
+    def ok(self) -> bool:
+        return self.reason is None
+
+    def __bool__(self) -> bool:
+        return self.reason is None
+
+    def __repr__(self) -> str:
+        if self.reason is None:
+            return "DecryptResult(ok)"
+        return f"DecryptResult({self.reason.value})"
+
+
+class DecryptCounters(object):
+    """
+    Thread-safe counts of successful decryptions and of failures by reason, for exporting as metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self.reset()
+
+    def record(self, reason: Optional[DecryptFailureReason]):
+        key = "ok" if reason is None else reason.value
+        with self._lock:
+            self._counts[key] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the counts keyed by `ok` and the value of each failure reason, eg. `wrong_key`.
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts = {"ok": 0}
+            for reason in DecryptFailureReason:
+                self._counts[reason.value] = 0
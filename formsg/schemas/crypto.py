@@ -1,6 +1,10 @@
-from typing import Any, List, Mapping, Optional, Union
+import sys
+from typing import Any, BinaryIO, List, Mapping, Optional, Union
 
-from typing_extensions import Literal, NotRequired, TypedDict
+if sys.version_info >= (3, 11):
+    from typing import Literal, NotRequired, TypedDict
+else:
+    from typing_extensions import Literal, NotRequired, TypedDict
 
 FieldType = Union[
     Literal["section"],
@@ -46,14 +50,44 @@ DecryptedContentAndAttachments = TypedDict(
     {"content": DecryptedContent, "attachments": DecryptedAttachments},
 )
 
+DecryptedFileHandle = TypedDict(
+    "DecryptedFileHandle", {"filename": str, "file": BinaryIO, "size": int}
+)
+DecryptedAttachmentFiles = Mapping[str, DecryptedFileHandle]
+DecryptedContentAndAttachmentFiles = TypedDict(
+    "DecryptedContentAndAttachmentFiles",
+    {"content": DecryptedContent, "attachments": DecryptedAttachmentFiles},
+)
+
+# the outcome of one submission decrypted by `Crypto.decrypt_many`, where index
+# is its position in the input, and reason is the value of its `DecryptFailureReason`
+DecryptManyResult = TypedDict(
+    "DecryptManyResult",
+    {
+        "index": int,
+        "result": Optional[DecryptedContent],
+        "error": Optional[str],
+        "reason": Optional[str],
+    },
+)
+
 
 EncryptedAttachmentRecords = Mapping[str, str]
 
+# a key pair, with each key encoded in base-64
+Keypair = TypedDict("Keypair", {"publicKey": str, "secretKey": str})
+
 EncryptedFileContent = TypedDict(
     "EncryptedFileContent",
     {"submission_public_key": str, "nonce": str, "binary": bytes},
 )
 
+# an encrypted file whose ciphertext is a writable view, decrypted in place
+EncryptedFileBuffer = TypedDict(
+    "EncryptedFileBuffer",
+    {"submission_public_key": str, "nonce": str, "binary": memoryview},
+)
+
 
 DecryptParams = TypedDict(
     "DecryptParams",
@@ -62,5 +96,7 @@ DecryptParams = TypedDict(
         "version": str,
         "verifiedContent": Optional[str],
         "attachmentDownloadUrls": Optional[EncryptedAttachmentRecords],
+        "formId": NotRequired[str],
+        "submissionId": NotRequired[str],
     },
 )
@@ -1,4 +1,9 @@
-from typing_extensions import TypedDict
+import sys
+
+if sys.version_info >= (3, 11):
+    from typing import NotRequired, TypedDict
+else:
+    from typing_extensions import NotRequired, TypedDict
 
 VerificationAuthenticateOptions = TypedDict(
     "VerificationAuthenticateOptions",
@@ -7,10 +12,16 @@ VerificationAuthenticateOptions = TypedDict(
         "submissionCreatedAt": int,
         "fieldId": str,
         "answer": str,
-        "publicKey": str,
+        # defaults to the public key of the `Verification` instance
+        "publicKey": NotRequired[str],
     },
 )
 
+VerificationSignatureOptions = TypedDict(
+    "VerificationSignatureOptions",
+    {"transactionId": str, "formId": str, "fieldId": str, "answer": str},
+)
+
 VerificationSignatureSchema = TypedDict(
     "VerificationSignatureSchema", {"v": str, "t": int, "s": str, "f": str}
 )
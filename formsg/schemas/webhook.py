@@ -0,0 +1,22 @@
+import sys
+from typing import Optional
+
+if sys.version_info >= (3, 11):
+    from typing import NotRequired, TypedDict
+else:
+    from typing_extensions import NotRequired, TypedDict
+
+from formsg.schemas.crypto import DecryptedAttachments, DecryptedContent
+
+# an authenticated, decrypted webhook, as handed to apps by the middleware in
+# `formsg.middleware`
+WebhookSubmission = TypedDict(
+    "WebhookSubmission",
+    {
+        "formId": Optional[str],
+        "submissionId": Optional[str],
+        "created": Optional[str],
+        "content": DecryptedContent,
+        "attachments": NotRequired[DecryptedAttachments],
+    },
+)
@@ -1,14 +1,43 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
 
 from formsg.constants import PUBLIC_KEY_PRODUCTION, PUBLIC_KEY_STAGING
-from formsg.crypto import Crypto, DecryptParams
+from formsg.instrumentation import Observer
+from formsg.limits import Limits
+from formsg.replay import ReplayCache
+from formsg.schemas.crypto import DecryptParams  # noqa
+from formsg.verification import Verification
 from formsg.webhook import Webhook
 
+if TYPE_CHECKING:
+    from formsg.attachments import AttachmentDownloader
+    from formsg.cache import DecryptCache
+    from formsg.crypto import Crypto
+    from formsg.keyring import FormKeyring
+    from formsg.util.json_backend import JsonBackend
+
 
 class FormSdk(object):
     # TODO: type(mode) == Literal
-    def __init__(self, mode: str, webhook_secret_key: Optional[str] = None):
+    def __init__(
+        self,
+        mode: str,
+        webhook_secret_key: Optional[str] = None,
+        keyring: Optional["FormKeyring"] = None,
+        downloader: Optional["AttachmentDownloader"] = None,
+        json_backend: Union[str, "JsonBackend", None] = None,
+        validator: Optional[Callable[[Any], bool]] = None,
+        observer: Optional[Observer] = None,
+        replay_cache: Optional[ReplayCache] = None,
+        cache: Optional["DecryptCache"] = None,
+        verification_public_key: Optional[str] = None,
+        verification_secret_key: Optional[str] = None,
+        transaction_expiry: Optional[float] = None,
+        limits: Optional[Limits] = None,
+    ):
         self.mode = mode
+        self.keyring = keyring
+        # shared by the webhooks and crypto, so rejections are counted together
+        self.limits = limits or Limits()
         self.public_key: str
         if self.mode == "STAGING":
             self.public_key = PUBLIC_KEY_STAGING
@@ -17,5 +46,33 @@ class FormSdk(object):
         else:  # default to prod
             self.public_key = PUBLIC_KEY_PRODUCTION
 
-        self.crypto = Crypto(self.public_key)
-        self.webhooks = Webhook(self.public_key, webhook_secret_key)
+        # the crypto backend is created on first use, so that processes which only
+        # authenticate webhooks never import it
+        self._crypto: Optional["Crypto"] = None
+        self._crypto_args = (
+            keyring,
+            downloader,
+            json_backend,
+            validator,
+            observer,
+            cache,
+            self.limits,
+        )
+        self.webhooks = Webhook(
+            self.public_key, webhook_secret_key, observer, replay_cache, self.limits
+        )
+        self.verification = Verification(
+            verification_public_key, verification_secret_key, transaction_expiry
+        )
+
+    @property
+    def crypto(self) -> "Crypto":
+        if self._crypto is None:
+            from formsg.crypto import Crypto
+
+            self._crypto = Crypto(self.public_key, *self._crypto_args)
+        return self._crypto
+
+    @crypto.setter
+    def crypto(self, crypto: "Crypto"):
+        self._crypto = crypto
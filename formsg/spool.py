@@ -0,0 +1,454 @@
+"""
+A durable local queue of authenticated webhooks, so that a webhook handler can
+answer as soon as a webhook is written to disk, and workers decrypt it later.
+
+Webhooks are stored in SQLite, which may be shared by the processes on a host.
+Delivery is at least once: a webhook claimed by a worker is hidden for
+`visibility_timeout` seconds, and becomes visible again if the worker neither
+acknowledges nor releases it by then, eg. because it crashed. Webhooks that fail
+`max_attempts` times, or cannot ever succeed, are moved to a dead-letter area.
+
+Example::
+
+    spool = Spool("/var/lib/formsg/spool.db")
+    # in the webhook handler, after authenticating
+    spool.put(header, body)
+
+    # in a worker process
+    worker = SpoolWorker(spool, sdk.crypto, handle_submission, FORM_SECRET_KEY)
+    worker.start()
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, cast
+
+from formsg.crypto import Crypto
+from formsg.exceptions import AttachmentDecryptionException, MissingSecretKeyException
+from formsg.instrumentation import Stage
+from formsg.schemas.crypto import DecryptParams
+from formsg.schemas.webhook import WebhookSubmission
+from formsg.util.crypto import FormSecretKey
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhooks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    header TEXT NOT NULL,
+    body BLOB NOT NULL,
+    enqueued REAL NOT NULL,
+    visible_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS webhooks_visible ON webhooks (dead, visible_at);
+"""
+
+
+class SpoolMessage(object):
+    """
+    A webhook in a :class:`Spool`: its `X-FormSG-Signature` header and raw body.
+    """
+
+    __slots__ = ("id", "header", "body", "enqueued", "attempts", "error")
+
+    def __init__(
+        self,
+        id: int,
+        header: str,
+        body: bytes,
+        enqueued: float,
+        attempts: int,
+        error: Optional[str] = None,
+    ):
+        self.id = id
+        self.header = header
+        self.body = body
+        # wall clock time the webhook was spooled, in seconds
+        self.enqueued = enqueued
+        # number of times the webhook has been claimed, including this one
+        self.attempts = attempts
+        # why the last attempt failed
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"SpoolMessage(id={self.id}, attempts={self.attempts})"
+
+
+class Spool(object):
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = 300,
+        max_attempts: int = 5,
+        retry_delay: float = 5,
+    ):
+        """
+        :param path: Path of the SQLite database. It is created if missing.
+        :param visibility_timeout: Seconds a claimed webhook stays hidden from other workers. Set this above the time it takes to decrypt a submission with all its attachments.
+        :param max_attempts: Number of times a webhook is attempted before it is dead-lettered
+        :param retry_delay: Seconds before a failed webhook is retried, doubling with each attempt up to `visibility_timeout`
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # sqlite3 connections may not be shared between threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            # spooled webhooks survive a crash of the process or the host
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def put(self, header: str, body: bytes) -> int:
+        """
+        Durably appends an authenticated webhook.
+        :param header: The `X-FormSG-Signature` header of the webhook
+        :param body: The raw body of the webhook
+        :rtype: :class:`int` the ID of the spooled webhook
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO webhooks (header, body, enqueued, visible_at) VALUES (?, ?, ?, ?)",
+            (header, bytes(body), now, now),
+        )
+        return cursor.lastrowid  # type: ignore
+
+    def claim(self, limit: int = 1) -> List[SpoolMessage]:
+        """
+        Claims up to `limit` of the oldest visible webhooks, hiding them from other workers
+        for `visibility_timeout` seconds. Each must then be acknowledged or released.
+        Webhooks whose claims have timed out `max_attempts` times are dead-lettered instead.
+        """
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE webhooks SET dead = 1, error = ? "
+                "WHERE dead = 0 AND visible_at <= ? AND attempts >= ?",
+                ("visibility timeout expired too many times", now, self.max_attempts),
+            )
+            rows = connection.execute(
+                "SELECT id, header, body, enqueued, attempts FROM webhooks "
+                "WHERE dead = 0 AND visible_at <= ? ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE webhooks SET attempts = attempts + 1, visible_at = ? WHERE id = ?",
+                [(now + self.visibility_timeout, row[0]) for row in rows],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return [
+            SpoolMessage(id, header, body, enqueued, attempts + 1)
+            for id, header, body, enqueued, attempts in rows
+        ]
+
+    def ack(self, message: SpoolMessage):
+        """
+        Removes a webhook that has been handled.
+        """
+        self._connection().execute("DELETE FROM webhooks WHERE id = ?", (message.id,))
+
+    def release(self, message: SpoolMessage, error: str, retry: bool = True):
+        """
+        Returns a webhook whose attempt failed to the spool, to be retried after a delay.
+        :param error: Why the attempt failed
+        :param retry: If false, or the webhook has been attempted `max_attempts` times, it is dead-lettered
+        """
+        message.error = error
+        if not retry or message.attempts >= self.max_attempts:
+            self._connection().execute(
+                "UPDATE webhooks SET dead = 1, error = ? WHERE id = ?",
+                (error, message.id),
+            )
+            return
+        delay = min(
+            self.retry_delay * 2 ** (message.attempts - 1), self.visibility_timeout
+        )
+        self._connection().execute(
+            "UPDATE webhooks SET visible_at = ?, error = ? WHERE id = ?",
+            (time.time() + delay, error, message.id),
+        )
+
+    def depth(self) -> Dict[str, int]:
+        """
+        Returns the number of webhooks that are ready to be claimed, that are claimed
+        or waiting to be retried, and that are dead-lettered.
+        """
+        ready, in_flight, dead = (
+            self._connection()
+            .execute(
+                "SELECT "
+                "COALESCE(SUM(dead = 0 AND visible_at <= ?), 0), "
+                "COALESCE(SUM(dead = 0 AND visible_at > ?), 0), "
+                "COALESCE(SUM(dead = 1), 0) FROM webhooks",
+                (time.time(),) * 2,
+            )
+            .fetchone()
+        )
+        return {"ready": ready, "in_flight": in_flight, "dead": dead}
+
+    def dead_letters(self, limit: int = 100) -> List[SpoolMessage]:
+        """
+        Returns the oldest dead-lettered webhooks, with the `error` they failed with.
+        """
+        rows = self._connection().execute(
+            "SELECT id, header, body, enqueued, attempts, error FROM webhooks "
+            "WHERE dead = 1 ORDER BY id LIMIT ?",
+            (limit,),
+        )
+        return [SpoolMessage(*row) for row in rows]
+
+    def requeue(self, ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Moves dead-lettered webhooks back into the spool, with their attempts reset.
+        :param ids: IDs of the webhooks to requeue. Defaults to all of them.
+        :rtype: :class:`int` the number of webhooks requeued
+        """
+        return self._update_dead(
+            "UPDATE webhooks SET dead = 0, attempts = 0, visible_at = ? WHERE dead = 1",
+            (time.time(),),
+            ids,
+        )
+
+    def purge(self, ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Deletes dead-lettered webhooks.
+        :param ids: IDs of the webhooks to delete. Defaults to all of them.
+        :rtype: :class:`int` the number of webhooks deleted
+        """
+        return self._update_dead("DELETE FROM webhooks WHERE dead = 1", (), ids)
+
+    def _update_dead(self, sql: str, params: tuple, ids: Optional[Iterable[int]]):
+        connection = self._connection()
+        if ids is None:
+            return connection.execute(sql, params).rowcount
+        return sum(
+            connection.execute(sql + " AND id = ?", params + (id,)).rowcount
+            for id in ids
+        )
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class SpoolWorker(object):
+    def __init__(
+        self,
+        spool: Spool,
+        crypto: Crypto,
+        handler: Callable[[WebhookSubmission], None],
+        form_secret_key: Optional[FormSecretKey] = None,
+        attachments: bool = False,
+        concurrency: int = 4,
+        poll_interval: float = 0.5,
+    ):
+        """
+        Drains a spool, decrypting each webhook and passing it to `handler`.
+        Webhooks are acknowledged once the handler returns, so it should be idempotent.
+        :param spool: The spool to drain
+        :param crypto: The :class:`Crypto` to decrypt with. Its observer is also given the `spool_wait` and `spool_process` stages.
+        :param handler: Called with each decrypted submission. If it raises, the webhook is retried.
+        :param form_secret_key: The secret key of the form. If not given, the key is picked from the keyring of `crypto` by the form ID in the header.
+        :param attachments: If true, attachments are also downloaded and decrypted
+        :param concurrency: Number of worker threads started by :meth:`start`
+        :param poll_interval: Seconds to wait before claiming again when the spool is empty
+        """
+        self.spool = spool
+        self.crypto = crypto
+        self.handler = handler
+        self.form_secret_key = form_secret_key
+        self.attachments = attachments
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # counts of webhooks handled, retried and dead-lettered
+        self._counts: Counter = Counter()
+        self._started = time.monotonic()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def process(self, message: SpoolMessage) -> bool:
+        """
+        Decrypts and handles a claimed webhook, then acknowledges or releases it.
+        :rtype: :class:`bool` true if the webhook was handled
+        """
+        observer = self.crypto.observer
+        if observer is not None:
+            observer(
+                Stage.SPOOL_WAIT,
+                max(time.time() - message.enqueued, 0),
+                len(message.body),
+            )
+            started = time.perf_counter()
+        error, retry = self._process(message)
+        if observer is not None:
+            observer(
+                Stage.SPOOL_PROCESS, time.perf_counter() - started, len(message.body)
+            )
+        if error is None:
+            self.spool.ack(message)
+            self._count("handled")
+            return True
+
+        logger.warning(f"Spooled webhook {message.id} failed: {error}")
+        self.spool.release(message, error, retry)
+        dead = not retry or message.attempts >= self.spool.max_attempts
+        self._count("dead" if dead else "retried")
+        return False
+
+    def _process(self, message: SpoolMessage):
+        """
+        Returns None if the webhook was handled, else why it failed and whether to retry it.
+        """
+        try:
+            data = self.crypto.json_backend.loads(message.body)["data"]
+        except (ValueError, KeyError, TypeError):
+            data = None
+        if not isinstance(data, dict):
+            return "Body is not a webhook", False
+        # its fields are checked as it is decrypted
+        params = cast(DecryptParams, data)
+
+        form_secret_key = self.form_secret_key
+        if form_secret_key is None:
+            try:
+                form_secret_key = self._private_key_for_header(message.header)
+            except MissingSecretKeyException as e:
+                # the keyring may yet be reloaded with the key
+                return str(e), True
+
+        if self.attachments:
+            try:
+                decrypted = self.crypto.decrypt_attachments(form_secret_key, params)
+            except AttachmentDecryptionException:
+                return "Attachments could not be decrypted", False
+            if not decrypted:
+                # downloads fail transiently, so these are retried
+                return "Submission or attachments could not be decrypted", True
+            content, attachments = decrypted["content"], decrypted["attachments"]
+        else:
+            result = self.crypto.decrypt_result(form_secret_key, params)
+            if not result:
+                # eg. a wrong key while the keyring is being rotated, so these are retried
+                return result.reason.value, True  # type: ignore
+            content = result.content  # type: ignore
+
+        submission: WebhookSubmission = {
+            "formId": data.get("formId"),
+            "submissionId": data.get("submissionId"),
+            "created": data.get("created"),
+            "content": content,  # type: ignore
+        }
+        if self.attachments:
+            submission["attachments"] = attachments
+        try:
+            self.handler(submission)
+        except Exception as e:
+            logger.exception(e)
+            return f"Handler failed: {e!r}", True
+        return None, False
+
+    def _private_key_for_header(self, header: str):
+        if not self.crypto.keyring:
+            raise MissingSecretKeyException(
+                "Either form_secret_key or a Crypto with a keyring must be provided"
+            )
+        return self.crypto.keyring.private_key_for_header(header)
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        """
+        Processes visible webhooks on this thread until the spool has none left.
+        :param limit: Optional maximum number of webhooks to process
+        :rtype: :class:`int` the number of webhooks processed
+        """
+        processed = 0
+        while limit is None or processed < limit:
+            messages = self.spool.claim()
+            if not messages:
+                break
+            self.process(messages[0])
+            processed += 1
+        return processed
+
+    def start(self) -> "SpoolWorker":
+        """
+        Starts `concurrency` threads draining the spool until :meth:`stop` is called.
+        """
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stops the threads after the webhooks they are processing.
+        """
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                # one webhook at a time, so that a backlog does not hold off `stop`
+                processed = self.drain(1)
+            except Exception as e:
+                logger.exception(e)
+                processed = 0
+            if not processed:
+                self._stopping.wait(self.poll_interval)
+
+    def __enter__(self) -> "SpoolWorker":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the numbers of webhooks handled, retried and dead-lettered by this worker,
+        its throughput in webhooks handled per second, and the depth of the spool.
+        """
+        with self._lock:
+            counts = {key: self._counts[key] for key in ("handled", "retried", "dead")}
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        stats: Dict[str, float] = dict(counts)
+        stats["throughput"] = counts["handled"] / elapsed
+        stats.update({f"spool_{key}": n for key, n in self.spool.depth().items()})
+        return stats
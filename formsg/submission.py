@@ -0,0 +1,165 @@
+"""
+Decrypted submissions whose fields are looked up by ID, and whose verified content
+is only decrypted and verified when it is first read. See :meth:`Crypto.decrypt_submission`.
+"""
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from formsg.schemas.crypto import FieldType, FormField
+
+# (key in the decrypted JSON, attribute of `Field`)
+_FIELD_KEYS = (
+    ("_id", "id"),
+    ("question", "question"),
+    ("fieldType", "field_type"),
+    ("answer", "answer"),
+    ("answerArray", "answer_array"),
+    ("isHeader", "is_header"),
+    ("signature", "signature"),
+)
+_ATTRIBUTES = dict(_FIELD_KEYS)
+
+
+class Field(Mapping):
+    """
+    A field of a decrypted submission. Its values are attributes, eg. `field.answer`,
+    and it is also a read-only mapping with the keys of the decrypted JSON, eg. `field["answer"]`.
+    Attributes missing from the JSON are None.
+    """
+
+    __slots__ = ("_keys",) + tuple(attribute for _, attribute in _FIELD_KEYS)
+
+    # declared for type checkers; each slot is set from the JSON in `__init__`
+    id: str
+    question: str
+    field_type: FieldType
+    answer: Optional[str]
+    answer_array: Optional[Union[List[str], List[List[str]]]]
+    is_header: Optional[bool]
+    signature: Optional[str]
+
+    def __init__(self, response: FormField):
+        # only the keys of form fields are kept
+        self._keys: Tuple[str, ...] = tuple(k for k in response if k in _ATTRIBUTES)
+        for key, attribute in _FIELD_KEYS:
+            setattr(self, attribute, response.get(key))
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, _ATTRIBUTES[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"Field({dict(self)!r})"
+
+
+class Submission(Mapping):
+    """
+    A decrypted submission, which is a read-only mapping like the result of :meth:`Crypto.decrypt`:
+    `submission["responses"]` is the list of decrypted fields, and `submission["verified"]` is the
+    verified content, if there is any.
+
+    Fields are also looked up by ID with :meth:`field`, through an index built on first use.
+    Verified content is decrypted and its signature verified the first time it is read.
+    """
+
+    __slots__ = ("responses", "_index", "_fields", "_open_verified", "_verified")
+
+    def __init__(
+        self,
+        responses: List[FormField],
+        open_verified: Optional[Callable[[], Mapping[str, Any]]] = None,
+    ):
+        """
+        :param responses: The decrypted fields
+        :param open_verified: Decrypts and verifies the verified content, if there is any. It is called at most once successfully.
+        """
+        self.responses = responses
+        self._index: Optional[Dict[str, int]] = None
+        self._fields: Dict[str, Field] = {}
+        self._open_verified = open_verified
+        self._verified: Optional[Mapping[str, Any]] = None
+
+    @property
+    def verified(self) -> Optional[Mapping[str, Any]]:
+        """
+        The verified content, or None if the submission has none.
+        :raises VerifiedContentException: if the verified content cannot be decrypted or its signature is invalid
+        """
+        if self._verified is None and self._open_verified is not None:
+            self._verified = self._open_verified()
+            self._open_verified = None
+        return self._verified
+
+    def has_verified(self) -> bool:
+        return self._verified is not None or self._open_verified is not None
+
+    def field(self, field_id: str) -> Field:
+        """
+        Returns the field with the given ID.
+        :raises KeyError: if the submission has no such field
+        """
+        field = self._fields.get(field_id)
+        if field is None:
+            if self._index is None:
+                self._index = {
+                    response["_id"]: i for i, response in enumerate(self.responses)
+                }
+            field = self._fields[field_id] = Field(
+                self.responses[self._index[field_id]]
+            )
+        return field
+
+    def answer(self, field_id: str, default: Any = None) -> Any:
+        """
+        Returns the `answer` of the field with the given ID, or its `answerArray` for
+        checkbox and table fields, or `default` if the submission has no such field.
+        """
+        try:
+            field = self.field(field_id)
+        except KeyError:
+            return default
+        return field.answer_array if field.answer is None else field.answer
+
+    def fields(self) -> Iterator[Field]:
+        """
+        Iterates over the fields in order.
+        """
+        for response in self.responses:
+            yield self.field(response["_id"])
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "responses":
+            return self.responses
+        if key == "verified" and self.has_verified():
+            return self.verified
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield "responses"
+        if self.has_verified():
+            yield "verified"
+
+    def __len__(self) -> int:
+        return 2 if self.has_verified() else 1
+
+    def __repr__(self) -> str:
+        return (
+            f"Submission(fields={len(self.responses)}, verified={self.has_verified()})"
+        )
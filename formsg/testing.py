@@ -0,0 +1,339 @@
+"""
+Helpers for testing code that uses the SDK without reaching FormSG or S3.
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from formsg.aio import AsyncTransport
+from formsg.exceptions import AttachmentDownloadException
+from formsg.schemas.crypto import DecryptParams, FormField, Keypair
+from formsg.util.crypto import (
+    convert_file_content_to_encrypted_attachment,
+    encrypt_content,
+    encrypt_file_content,
+    generate_keypair,
+    generate_signing_keypair,
+    sign_message,
+)
+from formsg.webhook import Webhook
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class AttachmentServer(object):
+    """
+    A local HTTP stand-in for the attachment download URLs of a submission.
+
+    Example::
+
+        with AttachmentServer() as server:
+            url = server.add("/file", {"encryptedFile": ...}, delay=0.1)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        # path -> (body, delay in seconds, number of failures left)
+        self._routes: Dict[str, Tuple[bytes, float, int]] = {}
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self._server = _ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode("ascii")
+        return f"http://{host}:{port}"
+
+    def add(self, path: str, body: Any, delay: float = 0, failures: int = 0) -> str:
+        """
+        Serves a response at the given path.
+        :param path: The path to serve the response at
+        :param body: The response, as bytes or as an object to encode as JSON
+        :param delay: Seconds to wait before responding
+        :param failures: Number of requests to answer with a 503 before succeeding
+        :returns the full URL of the response
+        """
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        with self._lock:
+            self._routes[path] = (body, delay, failures)
+        return self.url + path
+
+    def start(self) -> "AttachmentServer":
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "AttachmentServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _respond(self, path: str) -> Tuple[int, bytes, float]:
+        with self._lock:
+            self.request_count += 1
+            if path not in self._routes:
+                return 404, b"", 0
+            body, delay, failures = self._routes[path]
+            if failures > 0:
+                self._routes[path] = (body, delay, failures - 1)
+                return 503, b"", 0
+        return 200, body, delay
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body, delay = server._respond(self.path)
+                if delay:
+                    time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up waiting, eg. after its deadline passed
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeTransport(AsyncTransport):
+    """
+    An in-process stand-in for the HTTP transport of :class:`AsyncFormSdk`.
+    Records the highest number of downloads in progress at once.
+    """
+
+    def __init__(self):
+        # url -> (body, delay in seconds)
+        self._responses: Dict[str, Tuple[bytes, float]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def add(self, url: str, body: Any, delay: float = 0):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self._responses[url] = (body, delay)
+
+    async def get(self, url: str, timeout: Optional[float] = None) -> bytes:
+        if url not in self._responses:
+            raise AttachmentDownloadException(f"No response for {url}")
+        body, delay = self._responses[url]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+        return body
+
+
+_GENERATED_FIELD_TYPES = [
+    "textfield",
+    "number",
+    "date",
+    "yes_no",
+    "dropdown",
+    "checkbox",
+    "textarea",
+    "email",
+    "table",
+    "decimal",
+]
+
+
+def generate_responses(field_count: int, seed: int = 0) -> List[FormField]:
+    """
+    Generates the decrypted responses of a submission with the given number of fields,
+    cycling through the common field types. The same seed always generates the same responses.
+    :param field_count: Number of fields
+    :param seed: Seed of the random answers
+    """
+    rng = random.Random(seed)
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf"]
+    responses: List[FormField] = []
+    for i in range(field_count):
+        field_type = _GENERATED_FIELD_TYPES[i % len(_GENERATED_FIELD_TYPES)]
+        field: Dict[str, Any] = {
+            "_id": f"{i:024x}",
+            "question": f"Question {i} ({field_type})",
+            "fieldType": field_type,
+        }
+        if field_type == "checkbox":
+            field["answerArray"] = rng.sample(words, 3)
+        elif field_type == "table":
+            field["answerArray"] = [
+                [rng.choice(words) for _ in range(3)] for _ in range(5)
+            ]
+        elif field_type == "number":
+            field["answer"] = str(rng.randint(0, 10000))
+        elif field_type == "decimal":
+            field["answer"] = f"{rng.uniform(0, 100):.2f}"
+        elif field_type == "date":
+            field["answer"] = f"{rng.randint(1, 28):02d} Mar 2020"
+        elif field_type == "yes_no":
+            field["answer"] = rng.choice(["Yes", "No"])
+        elif field_type == "email":
+            field["answer"] = f"{rng.choice(words)}@example.com"
+        elif field_type == "textarea":
+            field["answer"] = " ".join(rng.choice(words) for _ in range(40))
+        else:
+            field["answer"] = rng.choice(words)
+        responses.append(field)  # type: ignore
+    return responses
+
+
+class SyntheticForm(object):
+    """
+    Encrypts realistic synthetic submissions of a form with freshly generated keys,
+    for tests and benchmarks that run offline. One signing key pair signs both
+    webhooks and verified content, as FormSG does.
+
+    Example::
+
+        form = SyntheticForm(field_count=100)
+        crypto = Crypto(form.signing_public_key)
+        crypto.decrypt(form.secret_key, form.submission(verified=True))
+    """
+
+    def __init__(
+        self,
+        field_count: int = 20,
+        seed: int = 0,
+        form_id: str = "",
+        keypair: Optional[Keypair] = None,
+        signing_keypair: Optional[Keypair] = None,
+    ):
+        """
+        :param field_count: Number of fields in each submission, not counting attachments
+        :param seed: Seed of the generated answers
+        :param form_id: ID of the form, used in webhook signatures. Defaults to one derived from the seed.
+        :param keypair: Optional key pair of the form. Defaults to a new one.
+        :param signing_keypair: Optional key pair to sign webhooks and verified content with. Defaults to a new one.
+        """
+        self.field_count = field_count
+        self.seed = seed
+        self.form_id = form_id or f"{seed:024x}"
+        keypair = keypair or generate_keypair()
+        self.public_key = keypair["publicKey"]
+        self.secret_key = keypair["secretKey"]
+        signing_keypair = signing_keypair or generate_signing_keypair()
+        self.signing_public_key = signing_keypair["publicKey"]
+        self.signing_secret_key = signing_keypair["secretKey"]
+        self._webhook = Webhook(self.signing_public_key, self.signing_secret_key)
+        self._submission_count = 0
+
+    def encrypt(self, plaintext: bytes) -> str:
+        """
+        Encrypts content for the form, as a `submissionPublicKey;nonce:ciphertext` envelope.
+        """
+        return encrypt_content(self.public_key, plaintext)
+
+    def encrypt_attachment(self, content: bytes) -> Dict[str, Any]:
+        """
+        Encrypts a file for the form, as the record served at an attachment download URL.
+        """
+        return convert_file_content_to_encrypted_attachment(
+            encrypt_file_content(self.public_key, content)
+        )
+
+    def submission(
+        self,
+        verified: bool = False,
+        attachment_sizes: Sequence[int] = (),
+        server: Optional[AttachmentServer] = None,
+    ) -> DecryptParams:
+        """
+        Generates and encrypts a submission.
+        :param verified: If true, include `verifiedContent` signed with the signing key
+        :param attachment_sizes: Size in bytes of each attachment to add
+        :param server: Server to serve the encrypted attachments from. Required if there are attachments.
+        :returns the params of the submission, as in the body of its webhook
+        """
+        if attachment_sizes and server is None:
+            raise TypeError("A server must be provided to serve attachments from")
+        self._submission_count += 1
+        submission_id = f"{self.seed:012x}{self._submission_count:012x}"
+        # the same fields in every submission, with different answers
+        responses = generate_responses(
+            self.field_count, self.seed * 1000003 + self._submission_count
+        )
+        urls = {}
+        for i, size in enumerate(attachment_sizes):
+            field_id = f"{self.field_count + i:024x}"
+            responses.append(
+                {  # type: ignore
+                    "_id": field_id,
+                    "question": f"Attachment {i}",
+                    "fieldType": "attachment",
+                    "answer": f"attachment{i}.bin",
+                }
+            )
+            urls[field_id] = server.add(  # type: ignore
+                f"/{submission_id}/{field_id}",
+                self.encrypt_attachment(os.urandom(size)),
+            )
+
+        # serialized compactly, as `JSON.stringify` does in FormSG
+        plaintext = json.dumps(responses, separators=(",", ":"), ensure_ascii=False)
+        params: Dict[str, Any] = {
+            "formId": self.form_id,
+            "submissionId": submission_id,
+            "version": 1,
+            "created": "2020-03-22T00:00:00.000Z",
+            "encryptedContent": self.encrypt(plaintext.encode("utf-8")),
+        }
+        if verified:
+            verified_content = json.dumps(
+                {"uinFin": "S1234567D", "transactionId": submission_id},
+                separators=(",", ":"),
+            ).encode("utf-8")
+            params["verifiedContent"] = self.encrypt(
+                sign_message(verified_content, self.signing_secret_key)
+            )
+        if urls:
+            params["attachmentDownloadUrls"] = urls
+        return params  # type: ignore
+
+    def signature_header(
+        self, uri: str, submission_id: str, epoch: Optional[int] = None
+    ) -> str:
+        """
+        Signs a webhook for the given URI, as the `X-FormSG-Signature` header.
+        :param epoch: Time of the webhook in ms. Defaults to now.
+        """
+        webhook = self._webhook
+        params = {
+            "uri": uri,
+            "submissionId": submission_id,
+            "formId": self.form_id,
+            "epoch": epoch or int(time.time() * 1000),
+        }
+        return webhook.construct_header(
+            dict(params, signature=webhook.generate_signature(params))
+        )
@@ -1,50 +1,510 @@
 import base64
+import binascii
+import functools
 import json
 import logging
-from typing import Any, Dict, List, Mapping, Union
+import threading
+from typing import Any, BinaryIO, Dict, List, Mapping, Optional, Tuple, Union
 
-from nacl.exceptions import CryptoError
+from nacl.bindings import (
+    crypto_box,
+    crypto_box_BOXZEROBYTES,
+    crypto_box_keypair,
+    crypto_box_NONCEBYTES,
+    crypto_box_open_easy_afternm,
+    crypto_box_seed_keypair,
+    crypto_box_ZEROBYTES,
+    crypto_sign,
+    crypto_sign_BYTES,
+    crypto_sign_keypair,
+    crypto_sign_open,
+    crypto_sign_PUBLICKEYBYTES,
+    crypto_sign_seed_keypair,
+)
+from nacl.exceptions import BadSignatureError, CryptoError
 from nacl.public import Box, PrivateKey, PublicKey
 from nacl.signing import VerifyKey
+from nacl.utils import random
 
-from formsg.schemas.crypto import EncryptedFileContent
+from formsg.schemas.crypto import EncryptedFileBuffer, EncryptedFileContent, Keypair
+from formsg.util.json_backend import JsonBackend
+
+try:
+    # PyNaCl's private cffi module, to open boxes straight into a buffer. The
+    # public bindings, which return a copy of the plaintext, are used without it.
+    from nacl._sodium import ffi, lib  # type: ignore[import]
+except ImportError:  # pragma: no cover
+    ffi = lib = None
 
 logger = logging.getLogger(__name__)
 
+# a form secret key, either as a base-64 string or already decoded
+FormSecretKey = Union[str, PrivateKey]
+
+# an encrypted payload in any object supporting the buffer protocol, eg. `bytes`,
+# a `memoryview` of a message broker payload, or an mmap'd file
+Buffer = Union[bytes, bytearray, memoryview]
+
+_MACBYTES = crypto_box_ZEROBYTES - crypto_box_BOXZEROBYTES
+_NONCEBYTES = crypto_box_NONCEBYTES
+
+# FormSG encodes the submission public key and nonce in padded base-64, so the
+# separators of an envelope are always at the same offsets
+_KEY_END = 4 * ((PublicKey.SIZE + 2) // 3)
+_NONCE_END = _KEY_END + 1 + 4 * ((_NONCEBYTES + 2) // 3)
+_SEMICOLON, _COLON, _PAD = b";:="
 
-def verify_signed_message(msg: bytes, public_key: str) -> Dict[str, Any]:
+# plaintexts are decrypted into a buffer owned by each thread, which is only
+# kept for reuse up to this size
+_SCRATCH_LIMIT = 1024 * 1024
+_scratch = threading.local()
+
+
+@functools.lru_cache(maxsize=32)
+def load_verify_key(public_key: str) -> VerifyKey:
+    """
+    Returns the verify key for a base-64 signing public key. Keys are built once
+    per process and shared by every caller.
+    :param public_key: the base-64 signing public key
+    """
+    return VerifyKey(base64.b64decode(public_key))
+
+
+def verify_signed_message(
+    msg: bytes,
+    public_key: Union[str, VerifyKey],
+    json_backend: Optional[JsonBackend] = None,
+) -> Dict[str, Any]:
     """
     helper method to verify a signed message
     :param msg: message to verify
-    :param public_key: the public key to authenticate the signed message with
+    :param public_key: the public key to authenticate the signed message with, as a base-64 string or a `VerifyKey`
+    :param json_backend: the backend to parse the message with. Defaults to the stdlib `json`.
     :returns the signed message if successful, else an error will be thrown
     raises Exception if mesasage cannot be verified
     """
-    verify_key = VerifyKey(base64.b64decode(public_key))
+    verify_key = (
+        public_key if isinstance(public_key, VerifyKey) else load_verify_key(public_key)
+    )
     opened_message = verify_key.verify(msg)
     if not opened_message:
         raise Exception("Failed to open signed message with given public key")
-    return json.loads(opened_message.decode("utf-8"))
+    if json_backend is not None:
+        return json_backend.loads(opened_message)
+    return json.loads(opened_message)
 
 
-def decrypt_content(
-    form_private_key: str, encrypted_content: str
-) -> Union[bytes, None]:
-    try:
-        [submission_public_key, nonce_encrypted] = encrypted_content.split(";")
-        [nonce, encrypted] = list(
-            map(lambda x: base64.b64decode(x), nonce_encrypted.split(":"))
+class DecryptionContext(object):
+    """
+    Submission-scoped decryption state for a single form secret key.
+
+    The form secret key is decoded once, and the X25519 shared key for each
+    submission public key is computed once and reused for every payload
+    encrypted with that key pair (encrypted content, verified content and
+    attachments).
+    """
+
+    def __init__(self, form_private_key: FormSecretKey):
+        if isinstance(form_private_key, PrivateKey):
+            self.private_key = form_private_key
+        else:
+            self.private_key = PrivateKey(base64.b64decode(form_private_key))
+        self._boxes: Dict[bytes, Box] = {}
+
+    def box(self, submission_public_key: Union[str, bytes]) -> Box:
+        """
+        Returns the box for the given submission public key, performing the key
+        exchange only the first time the key is seen.
+        :param submission_public_key: the submission public key as a base-64 string, or already decoded
+        """
+        if isinstance(submission_public_key, str):
+            submission_public_key = base64.b64decode(submission_public_key)
+        box = self._boxes.get(submission_public_key)
+        if box is None:
+            box = Box(self.private_key, PublicKey(submission_public_key))
+            self._boxes[submission_public_key] = box
+        return box
+
+    def decrypt_content(
+        self, encrypted_content: Union[str, Buffer]
+    ) -> Union[bytes, None]:
+        """
+        Decrypts a `submissionPublicKey;nonce:ciphertext` envelope.
+        :param encrypted_content: the envelope, with each part encoded in base-64, as a string or a bytes-like object
+        :returns the decrypted bytes, or None if the envelope is malformed or the box could not be opened
+        """
+        envelope = parse_envelope(encrypted_content)
+        if envelope is None:
+            logger.error("Encrypted content is malformed")
+            return None
+        decrypted = self.open(*envelope)
+        if decrypted is None:
+            logger.error(
+                "Error decrypting, is your form_secret_key correct, or are you on the correct mode (staging/production)?"
+            )
+        return decrypted
+
+    def decrypt_into(
+        self, encrypted_content: Union[str, Buffer], out: bytearray
+    ) -> Optional[int]:
+        """
+        Decrypts a `submissionPublicKey;nonce:ciphertext` envelope into a buffer that can be
+        reused across calls, growing it if it is too small.
+        :param encrypted_content: the envelope, with each part encoded in base-64, as a string or a bytes-like object
+        :param out: the buffer to write the plaintext to. It cannot grow while a memoryview of it is held.
+        :returns the length of the plaintext at the start of `out`, or None if the envelope is malformed or the box could not be opened
+        """
+        envelope = parse_envelope(encrypted_content)
+        if envelope is None:
+            return None
+        submission_public_key, nonce, ciphertext = envelope
+        size = len(ciphertext) - _MACBYTES
+        if len(out) < size:
+            out.extend(bytes(size - len(out)))
+        return open_box_into(
+            self.box(submission_public_key).shared_key(), nonce, ciphertext, out
+        )
+
+    def open(
+        self, submission_public_key: Union[str, bytes], nonce: bytes, ciphertext: Buffer
+    ) -> Optional[bytes]:
+        """
+        Opens a box from the given submission public key, returning None instead of raising if it cannot be opened.
+        :param submission_public_key: the submission public key as a base-64 string, or already decoded
+        :param nonce: the nonce of the box
+        :param ciphertext: the ciphertext, including its MAC
+        """
+        return open_box(self.box(submission_public_key).shared_key(), nonce, ciphertext)
+
+    def decrypt_file(
+        self, encrypted_file_content: EncryptedFileContent
+    ) -> Optional[bytes]:
+        """
+        Decrypts an attachment converted with `convert_encrypted_attachment_to_file_content`.
+        :param encrypted_file_content: the submission public key, nonce and ciphertext of the file. The ciphertext may be any bytes-like object.
+        :returns the decrypted file, or None if the box could not be opened
+        """
+        decrypted = self.open(
+            encrypted_file_content["submission_public_key"],
+            base64.b64decode(encrypted_file_content["nonce"]),
+            encrypted_file_content["binary"],
         )
-        private_key = PrivateKey(base64.b64decode(form_private_key))
-        public_key = PublicKey(base64.b64decode(submission_public_key))
-        box = Box(private_key, public_key)
-        decrypted = box.decrypt(encrypted, nonce)
+        if decrypted is None:
+            logger.error("Error decrypting file")
         return decrypted
-    except CryptoError:
-        logger.error(
-            "Error decrypting, is your form_secret_key correct, or are you on the correct mode (staging/production)?"
+
+    def decrypt_file_to(
+        self, encrypted_file: EncryptedFileBuffer, file: BinaryIO
+    ) -> Optional[int]:
+        """
+        Decrypts an attachment read by `EncryptedAttachmentReader` in place, and writes the plaintext to a file.
+        :param encrypted_file: the submission public key, nonce and a writable view of the ciphertext
+        :param file: the file to write the decrypted attachment to
+        :returns the size of the decrypted file, or None if the box could not be opened
+        """
+        box = self.box(encrypted_file["submission_public_key"])
+        try:
+            size = open_box_in_place(
+                box.shared_key(),
+                base64.b64decode(encrypted_file["nonce"]),
+                encrypted_file["binary"],
+            )
+        except CryptoError:
+            logger.error("Error decrypting file")
+            return None
+        file.write(encrypted_file["binary"][:size])
+        return size
+
+
+def parse_envelope(
+    encrypted_content: Union[str, Buffer],
+) -> Optional[Tuple[bytes, bytes, bytes]]:
+    """
+    Splits and decodes a `submissionPublicKey;nonce:ciphertext` envelope. Bytes-like
+    envelopes are decoded straight from slices of a memoryview, without copying them
+    into strings first.
+    :param encrypted_content: the envelope, with each part encoded in base-64, as a string or a bytes-like object
+    :returns the decoded submission public key, nonce and ciphertext, or None if the envelope is malformed
+    """
+    if isinstance(encrypted_content, str):
+        try:
+            encrypted_content = encrypted_content.encode("ascii")
+        except UnicodeEncodeError:
+            return None
+    try:
+        view = memoryview(encrypted_content).cast("B")
+    except TypeError:
+        return None
+    envelope = None
+    if (
+        len(view) > _NONCE_END + 1
+        and view[_KEY_END] == _SEMICOLON
+        and view[_NONCE_END] == _COLON
+    ):
+        encrypted = view[_NONCE_END + 1 :]
+        try:
+            envelope = (
+                binascii.a2b_base64(view[:_KEY_END]),
+                binascii.a2b_base64(view[_KEY_END + 1 : _NONCE_END]),
+                binascii.a2b_base64(encrypted),
+            )
+        except binascii.Error:
+            pass
+        # characters outside the base-64 alphabet are skipped when decoding, so an
+        # envelope is only canonical if nothing was skipped
+        if envelope is not None and (
+            len(encrypted) % 4
+            or len(envelope[2])
+            != len(encrypted) // 4 * 3
+            - (encrypted[-1] == _PAD)
+            - (encrypted[-2] == _PAD)
+        ):
+            envelope = None
+    if envelope is None:
+        envelope = _parse_envelope_slow(bytes(view))
+        if envelope is None:
+            return None
+    public_key, nonce, ciphertext = envelope
+    if (
+        len(public_key) != PublicKey.SIZE
+        or len(nonce) != _NONCEBYTES
+        or len(ciphertext) < _MACBYTES
+    ):
+        return None
+    return envelope
+
+
+def _parse_envelope_slow(data: bytes) -> Optional[Tuple[bytes, bytes, bytes]]:
+    # envelopes not laid out as FormSG serializes them, eg. with unpadded base-64
+    submission_public_key, _, nonce_encrypted = data.partition(b";")
+    nonce, _, encrypted = nonce_encrypted.partition(b":")
+    if not encrypted or b";" in nonce_encrypted or b":" in encrypted:
+        return None
+    try:
+        return (
+            base64.b64decode(submission_public_key),
+            base64.b64decode(nonce),
+            base64.b64decode(encrypted),
         )
+    except binascii.Error:
+        return None
+
+
+def parse_encrypted_content(
+    encrypted_content: str,
+) -> Optional[Tuple[str, bytes, bytes]]:
+    """
+    Splits a `submissionPublicKey;nonce:ciphertext` envelope.
+    :param encrypted_content: the envelope, with each part encoded in base-64
+    :returns the submission public key, still in base-64, and the decoded nonce and ciphertext, or None if the envelope is malformed
+    """
+    if not isinstance(encrypted_content, str):
+        return None
+    envelope = parse_envelope(encrypted_content)
+    if envelope is None:
+        return None
+    return encrypted_content.partition(";")[0], envelope[1], envelope[2]
+
+
+def open_box_into(
+    shared_key: bytes,
+    nonce: bytes,
+    ciphertext: Buffer,
+    out: Union[bytearray, memoryview],
+) -> Optional[int]:
+    """
+    Opens a box with a precomputed shared key, writing the plaintext to the start of
+    a buffer owned by the caller, so that the buffer can be reused across calls.
+    :param shared_key: the shared key of the box
+    :param nonce: the nonce of the box
+    :param ciphertext: the ciphertext, including its MAC
+    :param out: a writable buffer at least as long as the plaintext. It may be the ciphertext itself, to open the box in place.
+    :returns the length of the plaintext, or None if the box could not be opened
+    """
+    size = len(ciphertext) - _MACBYTES
+    if size < 0 or len(nonce) != _NONCEBYTES:
+        return None
+    if len(out) < size:
+        raise ValueError("Output buffer is shorter than the plaintext")
+    if lib is None:
+        try:
+            plaintext = crypto_box_open_easy_afternm(
+                bytes(ciphertext), nonce, shared_key
+            )
+        except CryptoError:
+            return None
+        out[:size] = plaintext
+        return size
+    if lib.crypto_box_open_easy_afternm(
+        ffi.from_buffer(out, require_writable=True),
+        ffi.from_buffer(ciphertext),
+        len(ciphertext),
+        nonce,
+        shared_key,
+    ):
+        return None
+    return size
+
+
+def open_box(shared_key: bytes, nonce: bytes, ciphertext: Buffer) -> Optional[bytes]:
+    """
+    Opens a box with a precomputed shared key.
+    :param shared_key: the shared key of the box
+    :param nonce: the nonce of the box
+    :param ciphertext: the ciphertext, including its MAC
+    :returns the plaintext, or None if the box could not be opened
+    """
+    size = len(ciphertext) - _MACBYTES
+    if size < 0:
         return None
+    out = getattr(_scratch, "buffer", None)
+    if out is None or len(out) < size:
+        out = bytearray(size)
+        if size <= _SCRATCH_LIMIT:
+            _scratch.buffer = out
+    if open_box_into(shared_key, nonce, ciphertext, out) is None:
+        return None
+    with memoryview(out) as view:
+        return bytes(view[:size])
+
+
+def open_box_in_place(shared_key: bytes, nonce: bytes, buffer: memoryview) -> int:
+    """
+    Opens a box with a precomputed shared key, writing the plaintext over the
+    start of the ciphertext instead of allocating a new buffer.
+    :param shared_key: the shared key of the box
+    :param nonce: the nonce of the box
+    :param buffer: a writable view of the ciphertext
+    :returns the length of the plaintext at the start of the buffer
+    raises CryptoError if the box cannot be opened
+    """
+    if buffer.readonly:
+        raise TypeError("buffer must be writable to be decrypted in place")
+    size = open_box_into(shared_key, nonce, buffer, buffer)
+    if size is None:
+        raise CryptoError("An error occurred trying to decrypt the message")
+    return size
+
+
+def generate_keypair(seed: Optional[bytes] = None) -> Keypair:
+    """
+    Generates a form key pair, as accepted by `encrypt_content` and `Crypto.decrypt`.
+    :param seed: Optional 32-byte seed, to always generate the same key pair
+    """
+    if seed is None:
+        public_key, secret_key = crypto_box_keypair()
+    else:
+        public_key, secret_key = crypto_box_seed_keypair(seed)
+    return {"publicKey": _b64(public_key), "secretKey": _b64(secret_key)}
+
+
+def generate_signing_keypair(seed: Optional[bytes] = None) -> Keypair:
+    """
+    Generates an Ed25519 key pair, for signing webhooks and verified content.
+    The secret key is 64 bytes, as used by `Webhook` and `sign_message`.
+    :param seed: Optional 32-byte seed, to always generate the same key pair
+    """
+    if seed is None:
+        public_key, secret_key = crypto_sign_keypair()
+    else:
+        public_key, secret_key = crypto_sign_seed_keypair(seed)
+    return {"publicKey": _b64(public_key), "secretKey": _b64(secret_key)}
+
+
+@functools.lru_cache(maxsize=32)
+def _decode_key(key: str) -> bytes:
+    return base64.b64decode(key)
+
+
+def sign_message(msg: bytes, signing_secret_key: str) -> bytes:
+    """
+    Signs a message, returning the signature followed by the message, as opened by `verify_signed_message`.
+    :param msg: the message to sign
+    :param signing_secret_key: the 64-byte Ed25519 secret key in base-64
+    """
+    return crypto_sign(msg, _decode_key(signing_secret_key))
+
+
+def verify_detached(message: bytes, signature: bytes, public_key: bytes) -> bool:
+    """
+    Verifies a detached Ed25519 signature with a raw public key, without building a
+    `VerifyKey` as `VerifyKey.verify` does.
+    :param message: the signed message
+    :param signature: the 64-byte signature
+    :param public_key: the 32-byte Ed25519 public key
+    """
+    if (
+        len(signature) != crypto_sign_BYTES
+        or len(public_key) != crypto_sign_PUBLICKEYBYTES
+    ):
+        return False
+    try:
+        crypto_sign_open(signature + message, public_key)
+    except BadSignatureError:
+        return False
+    return True
+
+
+def _seal(form_public_key: bytes, plaintext: bytes) -> Tuple[bytes, bytes, bytes]:
+    # a fresh submission key pair and nonce for every payload, as FormSG does
+    submission_public_key, submission_secret_key = crypto_box_keypair()
+    nonce = random(crypto_box_NONCEBYTES)
+    ciphertext = crypto_box(plaintext, nonce, form_public_key, submission_secret_key)
+    return submission_public_key, nonce, ciphertext
+
+
+def encrypt_content(form_public_key: str, plaintext: bytes) -> str:
+    """
+    Encrypts content for a form as a `submissionPublicKey;nonce:ciphertext` envelope, the inverse of `decrypt_content`.
+    :param form_public_key: the public key of the form in base-64
+    :param plaintext: the content to encrypt
+    """
+    submission_public_key, nonce, ciphertext = _seal(
+        _decode_key(form_public_key), plaintext
+    )
+    return f"{_b64(submission_public_key)};{_b64(nonce)}:{_b64(ciphertext)}"
+
+
+def encrypt_file_content(form_public_key: str, binary: bytes) -> EncryptedFileContent:
+    """
+    Encrypts a file for a form, the inverse of `DecryptionContext.decrypt_file`.
+    :param form_public_key: the public key of the form in base-64
+    :param binary: the file to encrypt
+    """
+    submission_public_key, nonce, ciphertext = _seal(
+        _decode_key(form_public_key), binary
+    )
+    return {
+        "submission_public_key": _b64(submission_public_key),
+        "nonce": _b64(nonce),
+        "binary": ciphertext,
+    }
+
+
+def convert_file_content_to_encrypted_attachment(
+    encrypted_file_content: EncryptedFileContent,
+) -> Dict[str, Any]:
+    """
+    Converts an encrypted file to the record served at an attachment download URL,
+    the inverse of `convert_encrypted_attachment_to_file_content`.
+    """
+    return {
+        "encryptedFile": {
+            "submissionPublicKey": encrypted_file_content["submission_public_key"],
+            "nonce": encrypted_file_content["nonce"],
+            "binary": _b64(encrypted_file_content["binary"]),
+        }
+    }
+
+
+def _b64(b: bytes) -> str:
+    return base64.b64encode(b).decode("utf-8")
+
+
+def decrypt_content(
+    form_private_key: str, encrypted_content: Union[str, Buffer]
+) -> Union[bytes, None]:
+    return DecryptionContext(form_private_key).decrypt_content(encrypted_content)
 
 
 def retrieve_attachment_filenames(decrypted_content: Mapping[str, Any]) -> bool:
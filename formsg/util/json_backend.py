@@ -0,0 +1,70 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    # None marks orjson as missing; its functions are only called once
+    # `OrjsonBackend` has checked that it is installed
+    orjson = None  # type: ignore[assignment]
+
+
+class JsonBackend(object):
+    """
+    Parses the JSON of decrypted submissions, verified content and attachment records.
+    Parsing is done straight from bytes, without first decoding them to a `str`.
+    """
+
+    name = "json"
+
+    def loads(self, data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """
+        :raises ValueError: if the data is not valid UTF-8 JSON
+        """
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        """
+        Serializes to compact UTF-8 JSON.
+        """
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+
+
+class OrjsonBackend(JsonBackend):
+    """
+    Parses JSON with `orjson`. Requires `orjson` to be installed.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson must be installed to use OrjsonBackend")
+
+    def loads(self, data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        # orjson.JSONDecodeError is a ValueError
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+
+JSON_BACKENDS = {"json": JsonBackend, "orjson": OrjsonBackend}
+
+
+def get_json_backend(backend: Union[str, JsonBackend, None] = None) -> JsonBackend:
+    """
+    Returns the JSON backend to use.
+    :param backend: A backend, the name of one (`json` or `orjson`), or None for `orjson` if it is installed and else `json`
+    """
+    if isinstance(backend, JsonBackend):
+        return backend
+    if backend is None:
+        return OrjsonBackend() if orjson is not None else JsonBackend()
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend {backend}")
+    return JSON_BACKENDS[backend]()
@@ -0,0 +1,45 @@
+from typing import Any, Collection, List, Optional
+
+from formsg.util.json_backend import JsonBackend
+
+# FormSG serializes each field with `JSON.stringify`, compactly and with `_id` first
+_FIELD_START = b'{"_id":'
+_NEXT_FIELD = b',{"_id":'
+
+
+def project_fields(
+    plaintext: bytes, field_ids: Collection[str], json_backend: JsonBackend
+) -> Optional[List[Any]]:
+    """
+    Parses only the fields with the given IDs out of the decrypted JSON array of a
+    submission, in the order they appear. Each field is found by searching the bytes
+    for its `{"_id":"<id>"` prefix, and only its own bytes are parsed.
+    :returns: the fields, or None if the plaintext is not laid out as FormSG lays it out,
+        in which case it should be parsed in full
+    """
+    if not plaintext.lstrip().startswith(b"[" + _FIELD_START + b'"'):
+        return None
+    starts = []
+    for field_id in field_ids:
+        needle = _FIELD_START + json_backend.dumps(field_id)
+        start = plaintext.find(needle)
+        while start != -1:
+            starts.append(start)
+            start = plaintext.find(needle, start + 1)
+    starts.sort()
+
+    fields = []
+    for start in starts:
+        # quotes in strings are escaped, so the prefix of the next field can only
+        # appear in the plaintext where that field starts
+        end = plaintext.find(_NEXT_FIELD, start + 1)
+        if end == -1:
+            end = plaintext.rfind(b"]")
+        try:
+            field = json_backend.loads(plaintext[start:end])
+        except ValueError:
+            return None
+        if not isinstance(field, dict) or field.get("_id") not in field_ids:
+            return None
+        fields.append(field)
+    return fields
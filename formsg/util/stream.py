@@ -0,0 +1,128 @@
+import binascii
+import json
+import os
+import re
+import tempfile
+from typing import BinaryIO, Callable, Iterable, Optional, Union
+
+from formsg.schemas.crypto import EncryptedFileBuffer
+
+# where to write decrypted attachments: a directory to create temporary files
+# in, or a callable returning a writable file for (field ID, filename)
+AttachmentSink = Union[str, Callable[[str, str], BinaryIO]]
+
+_BINARY_KEY = re.compile(rb'"binary"\s*:\s*"')
+
+_HEAD, _BINARY, _TAIL = range(3)
+
+
+class EncryptedAttachmentReader(object):
+    """
+    Incrementally parses an encrypted attachment record,
+    `{"encryptedFile": {"submissionPublicKey": ..., "nonce": ..., "binary": ...}}`,
+    as its body arrives. The base-64 `binary` is decoded straight into a buffer
+    preallocated from the size of the body, so the ciphertext is only held once.
+    """
+
+    def __init__(self, content_length: Optional[int] = None, max_head: int = 65536):
+        """
+        :param content_length: The size of the body in bytes, if known, used to preallocate the buffer
+        :param max_head: Maximum number of bytes allowed before the `binary` value
+        """
+        self.buffer = bytearray(content_length * 3 // 4 if content_length else 0)
+        self.length = 0
+        self.max_head = max_head
+        self._state = _HEAD
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._pending = b""
+
+    def feed(self, chunk: bytes):
+        if self._state == _HEAD:
+            self._head += chunk
+            match = _BINARY_KEY.search(self._head)
+            if not match:
+                if len(self._head) > self.max_head:
+                    raise ValueError("`binary` not found in encrypted attachment")
+                return
+            chunk = bytes(self._head[match.end() :])
+            del self._head[match.end() :]
+            self._state = _BINARY
+
+        if self._state == _BINARY:
+            end = chunk.find(b'"')
+            if end == -1:
+                self._decode(chunk)
+                return
+            self._decode(chunk[:end])
+            self._state = _TAIL
+            chunk = chunk[end:]
+
+        self._tail += chunk
+
+    def close(self) -> EncryptedFileBuffer:
+        """
+        :returns the parsed record, with `binary` as a view over the decoded ciphertext
+        :raises ValueError: if the body was incomplete or malformed
+        """
+        if self._state != _TAIL or self._pending:
+            raise ValueError("Encrypted attachment is incomplete")
+        # the head ends with the opening quote of `binary` and the tail starts
+        # with its closing quote, so together they are the record without it
+        record = json.loads((self._head + self._tail).decode("utf-8"))
+        return {
+            "submission_public_key": record["encryptedFile"]["submissionPublicKey"],
+            "nonce": record["encryptedFile"]["nonce"],
+            "binary": memoryview(self.buffer)[: self.length],
+        }
+
+    def _decode(self, data: bytes):
+        data = self._pending + data
+        escape = b""
+        if data.endswith(b"\\"):
+            # an escape sequence split across two chunks
+            data, escape = data[:-1], b"\\"
+        if b"\\" in data:
+            data = data.replace(b"\\/", b"/")
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:] + escape
+        if not usable:
+            return
+        decoded = binascii.a2b_base64(data[:usable])
+        end = self.length + len(decoded)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(end - len(self.buffer)))
+        self.buffer[self.length : end] = decoded
+        self.length = end
+
+
+def open_attachment_sink(
+    sink: AttachmentSink, field_id: str, filename: str
+) -> BinaryIO:
+    """
+    Opens the file that a decrypted attachment is written to.
+    :param sink: A directory to create a temporary file in, or a callable returning a writable file
+    :param field_id: The ID of the attachment field
+    :param filename: The name of the attachment
+    """
+    if callable(sink):
+        return sink(field_id, filename)
+    _, extension = os.path.splitext(filename)
+    return tempfile.NamedTemporaryFile(  # type: ignore
+        mode="w+b", dir=sink, prefix=f"{field_id}-", suffix=extension, delete=False
+    )
+
+
+def discard_attachment_sinks(sink: AttachmentSink, files: Iterable[BinaryIO]):
+    """
+    Closes the files opened by :func:`open_attachment_sink`, deleting them if they are temporary files.
+    :param sink: The sink the files were opened from
+    :param files: The files to discard
+    """
+    for file in files:
+        file.close()
+        if not callable(sink):
+            try:
+                os.unlink(file.name)
+            except OSError:
+                pass
@@ -1,4 +1,7 @@
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+# validates the answer of a single field
+FieldRule = Callable[[Mapping[str, Any]], bool]
 
 
 def _filter_form_fields(field: Dict[str, Any]) -> bool:
@@ -15,8 +18,155 @@ def _filter_form_fields(field: Dict[str, Any]) -> bool:
 
 
 def determine_is_form_fields(tbd: Any) -> bool:
+    """
+    Checks in a single pass, stopping at the first invalid field, that every field has an ID, type, question and answer.
+    """
+    if not isinstance(tbd, list):
+        return False
+    for field in tbd:
+        if not isinstance(field, dict) or not _filter_form_fields(field):
+            return False
+    return True
+
+
+def _is_string_list(value: Any) -> bool:
+    if not isinstance(value, list):
+        return False
+    for item in value:
+        if not isinstance(item, str):
+            return False
+    return True
+
+
+def _has_answer(field: Mapping[str, Any]) -> bool:
+    return isinstance(field.get("answer"), str)
+
+
+def _is_section(field: Mapping[str, Any]) -> bool:
+    return field.get("isHeader") is not None or isinstance(field.get("answer"), str)
+
+
+def _is_checkbox(field: Mapping[str, Any]) -> bool:
+    return _is_string_list(field.get("answerArray"))
+
+
+def _is_table(field: Mapping[str, Any]) -> bool:
+    rows = field.get("answerArray")
+    if not isinstance(rows, list):
+        return False
+    for row in rows:
+        if not _is_string_list(row):
+            return False
+    return True
+
+
+def _is_yes_no(field: Mapping[str, Any]) -> bool:
+    return field.get("answer") in ("Yes", "No", "")
+
+
+# the expected shape of the answer of each field type in
+# `formsg.schemas.crypto.FieldType`. Other field types are checked for a
+# string answer or a list of strings.
+FIELD_RULES: Dict[str, FieldRule] = {
+    "section": _is_section,
+    "radiobutton": _has_answer,
+    "dropdown": _has_answer,
+    "checkbox": _is_checkbox,
+    "nric": _has_answer,
+    "email": _has_answer,
+    "table": _is_table,
+    "number": _has_answer,
+    "rating": _has_answer,
+    "yes_no": _is_yes_no,
+    "decimal": _has_answer,
+    "textfield": _has_answer,
+    "textarea": _has_answer,
+    "attachment": _has_answer,
+    "date": _has_answer,
+    "mobile": _has_answer,
+    "homeno": _has_answer,
+}
+
+
+def _is_unknown_type(field: Mapping[str, Any]) -> bool:
+    return _has_answer(field) or _is_checkbox(field)
+
+
+def _has_field_metadata(field: Any) -> bool:
+    return (
+        isinstance(field, dict)
+        and isinstance(field.get("_id"), str)
+        and isinstance(field.get("question"), str)
+        and isinstance(field.get("fieldType"), str)
+    )
+
+
+def is_strict_form_fields(tbd: Any) -> bool:
+    """
+    Checks in a single pass, stopping at the first invalid field, that every field
+    has a string ID, type and question, and an answer of the shape its type expects,
+    eg. a list of rows of strings for a `table`.
+    """
     if not isinstance(tbd, list):
         return False
+    for field in tbd:
+        if not _has_field_metadata(field):
+            return False
+        if not FIELD_RULES.get(field["fieldType"], _is_unknown_type)(field):
+            return False
+    return True
+
+
+class FormSchema(object):
+    """
+    A strict validator compiled once from the known fields of a form, so that each
+    submission is checked against a precomputed index of field ID to rule. A submission
+    with a field that is not in the form, or whose type has changed, is rejected.
+
+    Example::
+
+        schema = FormSchema.compile(crypto.decrypt(key, params)["responses"])
+        crypto = Crypto(public_key, validator=schema)
+    """
+
+    def __init__(self, rules: Mapping[str, FieldRule], field_types: Mapping[str, str]):
+        self._rules = dict(rules)
+        self._field_types = dict(field_types)
+
+    @classmethod
+    def compile(cls, fields: Iterable[Mapping[str, Any]]) -> "FormSchema":
+        """
+        :param fields: The fields of the form, each with at least an `_id` and `fieldType`, eg. the responses of a submission
+        """
+        rules = {}
+        field_types = {}
+        for field in fields:
+            field_type = field["fieldType"]
+            rules[field["_id"]] = FIELD_RULES.get(field_type, _is_unknown_type)
+            field_types[field["_id"]] = field_type
+        return cls(rules, field_types)
+
+    def __contains__(self, field_id: str) -> bool:
+        return field_id in self._rules
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __call__(self, tbd: Any) -> bool:
+        return self.validate(tbd)
 
-    filtered = list(filter(lambda internal: _filter_form_fields(internal), tbd))
-    return len(filtered) == len(tbd)
+    def validate(self, tbd: Any) -> bool:
+        if not isinstance(tbd, list):
+            return False
+        rules = self._rules
+        field_types = self._field_types
+        for field in tbd:
+            if not _has_field_metadata(field):
+                return False
+            field_id = field["_id"]
+            rule: Optional[FieldRule] = rules.get(field_id)
+            if rule is None or field["fieldType"] != field_types[field_id]:
+                return False
+            if not rule(field):
+                return False
+        return True
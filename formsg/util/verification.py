@@ -0,0 +1,111 @@
+import base64
+import binascii
+import logging
+import time
+from typing import Any, Optional
+
+from formsg.util.parser import parse_verification_signature
+
+logger = logging.getLogger(__name__)
+
+
+def format_to_base_string(
+    transaction_id: str, form_id: str, field_id: str, answer: Any, signature_time: int
+) -> str:
+    """
+    Formats the string signed for a verified field, as FormSG does.
+    """
+    return f"{transaction_id}.{form_id}.{field_id}.{answer}.{signature_time}"
+
+
+def format_to_signature_string(
+    transaction_id: str, form_id: str, signature_time: int, signature: str
+) -> str:
+    """
+    Formats the `signature` of a verified field, as parsed by `parse_verification_signature`.
+    """
+    return f"f={form_id},v={transaction_id},t={signature_time},s={signature}"
+
+
+def is_signature_time_valid(
+    signature_time: int, submission_created_at: int, transaction_expiry: float
+) -> bool:
+    """
+    :param signature_time: when the field was verified, in ms
+    :param submission_created_at: when the submission was created, in ms
+    :param transaction_expiry: how long a verification stays valid, in seconds
+    :rtype :class:`bool` if the field was verified before the submission was created, and not too long before
+    """
+    difference = submission_created_at - signature_time
+    return 0 < difference < transaction_expiry * 1000
+
+
+def verify_field_signature(
+    signature_string: str,
+    submission_created_at: int,
+    field_id: str,
+    answer: Any,
+    public_key: bytes,
+    transaction_expiry: float,
+) -> bool:
+    """
+    Verifies the `signature` of a verified field.
+    :param signature_string: the `signature` of the field
+    :param submission_created_at: when the submission was created, in ms
+    :param field_id: the ID of the field
+    :param answer: the answer of the field
+    :param public_key: the 32-byte verification public key
+    :param transaction_expiry: how long a verification stays valid, in seconds
+    :rtype :class:`bool` true if the signature is well-formed, recent and valid
+    """
+    # imported here so that PyNaCl is only loaded once a signature is verified
+    from formsg.util.crypto import verify_detached
+
+    try:
+        parsed_signature = parse_verification_signature(signature_string)
+        transaction_id, signature_time, form_id, signature = (
+            parsed_signature["v"],
+            parsed_signature["t"],
+            parsed_signature["f"],
+            base64.b64decode(parsed_signature["s"]),
+        )
+    except (KeyError, ValueError, binascii.Error):
+        logger.info(f'Signature is malformed for signatureString="{signature_string}"')
+        return False
+    if not is_signature_time_valid(
+        signature_time, submission_created_at, transaction_expiry
+    ):
+        logger.info(
+            f'Signature was expired for signatureString="{signature_string}" signatureDate="{signature_time}" submissionCreatedAt="{submission_created_at}"'
+        )
+        return False
+    base_string = format_to_base_string(
+        transaction_id, form_id, field_id, answer, signature_time
+    )
+    return verify_detached(base_string.encode("utf-8"), signature, public_key)
+
+
+def sign_field(
+    transaction_id: str,
+    form_id: str,
+    field_id: str,
+    answer: Any,
+    secret_key: str,
+    signature_time: Optional[int] = None,
+) -> str:
+    """
+    Signs a verified field, as FormSG does, returning its `signature`.
+    :param secret_key: the 64-byte Ed25519 verification secret key in base-64
+    :param signature_time: when the field was verified, in ms. Defaults to now.
+    """
+    from formsg.util.webhook import sign
+
+    if signature_time is None:
+        signature_time = int(time.time() * 1000)
+    base_string = format_to_base_string(
+        transaction_id, form_id, field_id, answer, signature_time
+    )
+    signature = sign(base_string, secret_key).decode("utf-8")
+    return format_to_signature_string(
+        transaction_id, form_id, signature_time, signature
+    )
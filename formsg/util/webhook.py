@@ -1,16 +1,25 @@
 import base64
 import logging
+import sys
 import time
-import urllib
+import urllib.parse
+from typing import TYPE_CHECKING, Union
 
-from nacl.bindings.crypto_sign import crypto_sign, crypto_sign_BYTES
-from nacl.signing import VerifyKey
-from typing_extensions import TypedDict
+if sys.version_info >= (3, 11):
+    from typing import TypedDict
+else:
+    from typing_extensions import TypedDict
 
 from formsg.exceptions import WebhookAuthenticateException
 
+if TYPE_CHECKING:
+    from nacl.signing import VerifyKey
+
 logger = logging.getLogger(__name__)
 
+# how long a webhook signature stays recent, in ms
+EPOCH_EXPIRY = 300000
+
 SignatureHeader = TypedDict(
     "SignatureHeader",
     {"v1": str, "t": int, "s": str, "f": str},
@@ -18,13 +27,14 @@ SignatureHeader = TypedDict(
 
 
 def is_signature_valid(
-    uri: str, signature_header: SignatureHeader, public_key: str
+    uri: str, signature_header: SignatureHeader, public_key: Union[str, "VerifyKey"]
 ) -> bool:
     """
     Helper function to construct the basestring and verify the signature of an
     incoming request
     :param: uri incoming request to verify
     :param: signatureHeader the X-FormSG-Signature header to verify against
+    :param: public_key the public key to verify with, as a base-64 string or a `VerifyKey`
     :rtype: :class:`bool` true if verification succeeds, false otherwise
     raises {WebhookAuthenticateError} if given signature header is malformed.
     """
@@ -39,20 +49,23 @@ def is_signature_valid(
 
     parsed_url = urllib.parse.urlparse(uri).geturl()
     base_string = f"{parsed_url}.{submission_id}.{form_id}.{epoch}"
-    v_key = VerifyKey(base64.b64decode(public_key))
+    if isinstance(public_key, str):
+        from formsg.util.crypto import load_verify_key
+
+        public_key = load_verify_key(public_key)
     try:
-        _verify(v_key, base_string, signature)
+        _verify(public_key, base_string, signature)
         return True
     except Exception as e:
         logger.error(e)
         return False
 
 
-def _verify(verify_key: VerifyKey, uri: str, signature: str) -> bytes:
+def _verify(verify_key: "VerifyKey", uri: str, signature: str) -> bytes:
     return verify_key.verify(uri.encode("utf-8"), base64.b64decode(signature))
 
 
-def has_epoch_expired(epoch: int, expiry: int = 300000) -> bool:
+def has_epoch_expired(epoch: int, expiry: int = EPOCH_EXPIRY) -> bool:
     """
     :param epoch: time in ms
     :param expiry: time in ms
@@ -70,5 +83,7 @@ def has_epoch_expired(epoch: int, expiry: int = 300000) -> bool:
 
 
 def sign(base_string: str, secret_key: str) -> bytes:
+    from nacl.bindings.crypto_sign import crypto_sign, crypto_sign_BYTES
+
     combined = crypto_sign(base_string.encode("utf-8"), base64.b64decode(secret_key))
     return base64.b64encode(combined[:crypto_sign_BYTES])
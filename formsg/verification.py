@@ -0,0 +1,128 @@
+"""
+Verifies the signatures FormSG adds to verified email and mobile answers, which
+prove that the respondent verified the answer with a one-time password.
+"""
+
+from typing import Dict, Iterable, Mapping, Optional, Union
+
+from formsg.exceptions import (
+    MissingPublicKeyException,
+    MissingSecretKeyException,
+    MissingTransactionExpiryException,
+)
+from formsg.schemas.crypto import FormField
+from formsg.schemas.verification import (
+    VerificationAuthenticateOptions,
+    VerificationSignatureOptions,
+)
+from formsg.util.verification import sign_field, verify_field_signature
+
+
+class Verification(object):
+    def __init__(
+        self,
+        public_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        transaction_expiry: Optional[float] = None,
+    ):
+        """
+        :param public_key: The verification public key in base-64, used to authenticate verified fields
+        :param secret_key: The verification secret key in base-64, only needed to generate signatures
+        :param transaction_expiry: How long a verification stays valid before the submission is created, in seconds
+        """
+        self.public_key = public_key
+        self.secret_key = secret_key
+        self.transaction_expiry = transaction_expiry
+
+    def authenticate(self, options: VerificationAuthenticateOptions) -> bool:
+        """
+        Verifies the signature of a verified field.
+        :param options.signatureString The `signature` of the field
+        :param options.submissionCreatedAt When the submission was created, in ms
+        :param options.fieldId The ID of the field
+        :param options.answer The answer of the field
+        :param options.publicKey Optional public key to verify with instead of this instance's
+        :rtype: :class:`bool` true if the signature is recent and valid
+        :raises MissingPublicKeyException: if there is no public key to verify with
+        :raises MissingTransactionExpiryException: if no transaction expiry was given when instantiating this class
+        """
+        return verify_field_signature(
+            options["signatureString"],
+            options["submissionCreatedAt"],
+            options["fieldId"],
+            options["answer"],
+            self._public_key(options.get("publicKey")),
+            self._transaction_expiry(),
+        )
+
+    def authenticate_submission(
+        self,
+        submission: Union[Mapping[str, Iterable[FormField]], Iterable[FormField]],
+        submission_created_at: int,
+        public_key: Optional[str] = None,
+    ) -> Dict[str, bool]:
+        """
+        Verifies the signature of every signed field of a decrypted submission in one pass,
+        decoding the public key only once.
+        :param submission: The result of :meth:`Crypto.decrypt` or :meth:`Crypto.decrypt_submission`, or its `responses`
+        :param submission_created_at: When the submission was created, in ms
+        :param public_key: Optional public key to verify with instead of this instance's
+        :returns a mapping of the ID of each signed field to whether its signature is recent and valid
+        :raises MissingPublicKeyException: if there is no public key to verify with
+        :raises MissingTransactionExpiryException: if no transaction expiry was given when instantiating this class
+        """
+        responses = (
+            submission["responses"] if isinstance(submission, Mapping) else submission
+        )
+        key = self._public_key(public_key)
+        transaction_expiry = self._transaction_expiry()
+        return {
+            field["_id"]: verify_field_signature(
+                field["signature"],  # type: ignore
+                submission_created_at,
+                field["_id"],
+                field.get("answer"),
+                key,
+                transaction_expiry,
+            )
+            for field in responses
+            if field.get("signature")
+        }
+
+    def generate_signature(self, params: VerificationSignatureOptions) -> str:
+        """
+        Generates the `signature` of a verified field, as FormSG does when the field is verified.
+        :param params.transactionId ID of the verification transaction
+        :param params.formId ID of the form
+        :param params.fieldId ID of the field
+        :param params.answer The verified answer
+        :returns the signature string
+        :raises MissingSecretKeyException if a secret key is not provided when instantiating this class
+        """
+        if not self.secret_key:
+            raise MissingSecretKeyException()
+        return sign_field(
+            params["transactionId"],
+            params["formId"],
+            params["fieldId"],
+            params["answer"],
+            self.secret_key,
+        )
+
+    def _public_key(self, public_key: Optional[str]) -> bytes:
+        public_key = public_key or self.public_key
+        if not public_key:
+            raise MissingPublicKeyException(
+                "Public key must be provided when instantiating the Verification class, or passed in, in order to authenticate verified fields"
+            )
+        from formsg.util.crypto import load_verify_key
+
+        # decoded once per process, however many fields are verified
+        return bytes(load_verify_key(public_key))
+
+    def _transaction_expiry(self) -> float:
+        if self.transaction_expiry is None:
+            raise MissingTransactionExpiryException(
+                "Transaction expiry must be provided when instantiating the Verification class in order to authenticate verified fields"
+            )
+        return self.transaction_expiry
@@ -1,15 +1,47 @@
-import urllib
-from typing import Optional
+import time
+import urllib.parse
+from typing import TYPE_CHECKING, Optional
 
-from formsg.exceptions import MissingSecretKeyException, WebhookAuthenticateException
+from formsg.exceptions import (
+    HeaderTooLongException,
+    MissingSecretKeyException,
+    WebhookAuthenticateException,
+    WebhookReplayException,
+)
+from formsg.instrumentation import Observer, Stage
+from formsg.limits import Limits
+from formsg.replay import ReplayCache
 from formsg.util.parser import parse_signature_header
-from formsg.util.webhook import has_epoch_expired, is_signature_valid, sign
+from formsg.util.webhook import (
+    EPOCH_EXPIRY,
+    has_epoch_expired,
+    is_signature_valid,
+    sign,
+)
+
+if TYPE_CHECKING:
+    from nacl.signing import VerifyKey
 
 
 class Webhook(object):
-    def __init__(self, public_key: str, secret_key: Optional[str] = None):
+    def __init__(
+        self,
+        public_key: str,
+        secret_key: Optional[str] = None,
+        observer: Optional[Observer] = None,
+        replay_cache: Optional[ReplayCache] = None,
+        limits: Optional[Limits] = None,
+    ):
         self.public_key = public_key
         self.secret_key = secret_key
+        # reports the duration of parsing the header and verifying the signature
+        self.observer = observer
+        # if set, webhooks already received while their signature is recent are rejected
+        self.replay_cache = replay_cache
+        # headers longer than `max_header_length` are rejected before they are parsed
+        self.limits = limits or Limits()
+        # loaded on first use, so that PyNaCl is only imported once a webhook arrives
+        self._verify_key: Optional["VerifyKey"] = None
 
     def authenticate(self, header: str, uri: str) -> bool:
         """
@@ -18,8 +50,20 @@ class Webhook(object):
         :param uri: The endpoint that FormSG is POSTing to
         :rtype: :class:`bool` true if the header is verified
         :raises WebhookAuthenticateException: If the signature or uri cannot be verified
+        :raises WebhookReplayException: If the webhook has already been received, when there is a replay cache
+        :raises HeaderTooLongException: If the header is longer than `limits.max_header_length`
         """
+        if not self.limits.allows_header(header):
+            raise HeaderTooLongException(
+                f"Signature header of {len(header)} characters exceeds the maximum length for uri={uri}"
+            )
+        observer = self.observer
+        if observer is not None:
+            started = time.perf_counter()
         signature_header = parse_signature_header(header)
+        if observer is not None:
+            now = time.perf_counter()
+            observer(Stage.HEADER_PARSE, now - started, len(header))
         [signature, epoch, submission_id, form_id] = [
             signature_header["v1"],
             signature_header["t"],
@@ -27,18 +71,38 @@ class Webhook(object):
             signature_header["f"],
         ]
 
-        # verify signature authenticity
-        if not is_signature_valid(uri, signature_header, self.public_key):
+        # verify epoch recency, which is far cheaper than verifying the signature
+        if has_epoch_expired(epoch):
             raise WebhookAuthenticateException(
-                f"Signature could not be verified for uri={uri} submission_id={submission_id} form_id={form_id} epoch={epoch} signature={signature}"
+                f"Signature is not recent for uri={uri} submission_id={submission_id} form_id={form_id} epoch={epoch} signature={signature}"
             )
 
-        # verify epoch recency
-        if has_epoch_expired(epoch):
+        # verify signature authenticity
+        if observer is not None:
+            started = time.perf_counter()
+        if self._verify_key is None:
+            from formsg.util.crypto import load_verify_key
+
+            self._verify_key = load_verify_key(self.public_key)
+        is_valid = is_signature_valid(uri, signature_header, self._verify_key)
+        if observer is not None:
+            observer(Stage.SIGNATURE_VERIFY, time.perf_counter() - started, None)
+        if not is_valid:
             raise WebhookAuthenticateException(
-                "Signature is not recent for uri={uri} submission_id={submission_id} form_id={form_id} epoch={epoch} signature={signature}"
+                f"Signature could not be verified for uri={uri} submission_id={submission_id} form_id={form_id} epoch={epoch} signature={signature}"
             )
 
+        # only authentic webhooks are recorded, so forged ones cannot fill the cache.
+        # a key need only be kept until its epoch stops being recent
+        if self.replay_cache is not None:
+            ttl = (epoch + EPOCH_EXPIRY) / 1000 - time.time()
+            if not self.replay_cache.add(
+                f"{form_id}:{submission_id}:{signature}", max(ttl, 1.0)
+            ):
+                raise WebhookReplayException(
+                    f"Webhook has already been received for uri={uri} submission_id={submission_id} form_id={form_id} epoch={epoch}"
+                )
+
         return True
 
     def generate_signature(self, params) -> str:
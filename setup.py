@@ -25,9 +25,10 @@ setup(
     packages=["formsg", "formsg.util", "formsg.schemas"],
     include_package_data=True,
     install_requires=[
-        "PyNaCl>=1.5.0",
+        "PyNaCl>=1.5.0,<1.7",
         "requests>=2.27.0",
         "typing_extensions>=4.0.0; python_version < '3.11'",
     ],
-    entry_points={},
+    extras_require={"aio": ["aiohttp>=3.8.0"], "orjson": ["orjson>=3.6.0"]},
+    entry_points={"console_scripts": ["formsg=formsg.cli:main"]},
 )
@@ -0,0 +1,9 @@
+import pytest
+
+from formsg.testing import AttachmentServer
+
+
+@pytest.fixture
+def server():
+    with AttachmentServer() as server:
+        yield server
@@ -0,0 +1,191 @@
+"""
+Test data and helpers shared by the test modules. Shared fixtures are in `conftest.py`.
+"""
+
+import asyncio
+import base64
+import io
+import json
+import os
+import pathlib
+
+from nacl.public import Box, PrivateKey
+from nacl.utils import random
+
+from formsg.crypto import Crypto
+from formsg.sdk import FormSdk
+from formsg.testing import AttachmentServer, FakeTransport, SyntheticForm
+from formsg.webhook import Webhook
+
+# the signing key pair of the sample submission and webhooks
+PUBLIC_KEY = "KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM="
+SECRET_KEY = "/u+LP57Ib9y5Ytpud56FzuitSC9O6lJ4EOLOFHpsHlYpRjVdPfRqv5et5WOxLXD9zcSkOzagBJsXobd6+9pQkw=="
+
+
+def load_resource(path: str):
+    f = open(path).read()
+    return json.loads(f)
+
+
+cwd = pathlib.Path(__file__).parent.resolve()
+plain_text = load_resource(os.path.join(cwd, "resources/plaintext.json"))
+
+# `plain_text` encrypted for the form secret key H7B0nKJ+E7+naSkQApxGayz1y/lZe4thta4iPp1B+Ns=
+cipertext = "RqOjwNXwiVJqvdTrQeD/NiktpI8vzo6CXlBBNihmmwI=;+0cGJwOA42F7DmQO7Kr6tNn9YH/7poDe:2jpehB9uW+63G1EimxOs1tsfR54xxSVZQbFMQaCa8ovVoF/6isBCEl5WLmrE1CRa2c5L2G5rAgCUnhsxQ7jVa//XEKr/m9kGNMbPnVqH62RslAxh30Mzz2he/ssbMazLDBzgQwd8I+pHnrBHQW5BsLqclj7QAMX3fa10Zon0ih4irWQ1o9eYitFllitD+vIcwbBzJyigGvD/t14+2/5imZmJdmJTJXd1ySxDo1X6KjBmph4rzvWtZSUgF7rRfMtAmbyOj87i6CkkNNIN4Dtl3zEuSeLuU2IDF7IHDdAwpmgWM9ejFpwrMFfr8PRovCubuRxCDQ1hV6GOyh60SlKA3oHQMhRQ2yia2vr9yxzHgO+wVUfgoiXQn8tvXFwZmzZd/eWENC1QI+XvP1jt50RIhQ0kMbyhBiaAG9nYlhGO3UHtmGGBoOdW4l4DZaWKRItnw1qgb2oxCvxOIkWNoafq1qJbYJsldOy6a/I2lbwAPL7MzVfgHJDj11dLOBgHGZHia6ZaROXYEiFpkVP8APOO/tgV902nOOlt+w63QNIieCIoGphn9LvOTo6Y6HD8qH6sekEyXCds6jP4RVw5XIN9LGeOWlEKx/VR2rf8b9qzFcYRPzfH5M8I9rpuZkk72ANiTeLRM8C8zWFnitzDlh1B2M+jnjrg+jEYm0ugro7tvHYSmU4tKcGR3mPlDrROjtFf3eBO8+pZKzuQfdA/7kN5YekAzyNjLcixioycrDmjR+BbBKxVrwNlm0hmHLLdU1g42GYpmfUUythDnqwALAOtaZcuj1ObX50h6kmhIl4fAEcXdLKKpoASzafbHnIH0iNX1CefnflLxymDPjjTFqcGSpY1vZf2pxDxUNZPXsd3vbV4KbrYq9v/R5NJ+mW3lxm839aN0pNsMbMetyZTyX8tXofWERxKEZDDXRCoYS0Ijml5h0X58juM13hNtc48iuPyx8oBIy4WophJ+M4CJfsq1wfBK0q+a8P2Tj8odJRQbbFdCoQRRRKbFhk0nT/R3V23cRjMB/Z1DCFmo8ywhUfSlMhrs8f6f3myhmJpzP5MXPJgzRIAytYtUF34j+9fspaYtyQHg4j4f8OBIYrNOCgt6++1bmy0+aI3Y0DoBJ1eLfe9iHUt64cvPbPqmAxX8Jkb1kY+OVwjx7DTxFc5dCzkL/3VA1FAZe7IqfP0v/3fTT6oK7nuy951GUSU9sBynV8Z6zJecYUWbgFZ1u/K8ag6btR2IeRFz7dG+Ffkb8nsGTcNm0l54Q/XbudtfIPN2GTGp1PlgFZ5JERszVrQ8MIrMnHtPvnbtIlqdVzZ0KwR1YQnqtjCoNnI/TzniRZnydE/qJCc5ZwAQDJhl0XRmVes5sp4obxhreSdgGjoyybeFN70rb6uMvsuBlTS5Z6xg7q4eW0e8Xx0PlKYJi8eUsFtzQlN3iJzgFTeLGOlguK2GWnI/Myy5/nan2Np5+eZ2GZhdn6s/NYmiJGLlcbmcXRLOj53O1Z9Oornc+Hq5rz+eZKg4uYNbyFCbvJ9d/wNbRaQva9kETeEfGVosZXotnA2dxYRF4A24Qwjo+yNeRlbyQBf0V0BWY+rfJ+F2JMP4LZ5FNVhd5JI16z7PEgqvlGqm7zkfPmwlTjCzDFXYz749fz9hrzqOCALguEhmMYEsun8mK7IptW77qbKyx2jTu/2OC6pqdWhHB3PliKZXD5EgedpqzHcWQg/s9TloSXy9pE9PEs0j+el+j4yXyQcfrAjODWHSrUXNWSJc1rOM1ochIYJWYHn4pf2Jxuop90+c4DFYp5eih3k8BGy4Etp6L0N7PJ+ugSqZV8L0QYT2sLBwG2cS8FNUGJPoUkUn6R2Bg7bTQ=="
+
+# submissions with attachments are encrypted for this key by `encrypt`
+form_key = PrivateKey.generate()
+FORM_SECRET_KEY = base64.b64encode(bytes(form_key)).decode()
+
+
+def b64(b: bytes) -> str:
+    return base64.b64encode(b).decode()
+
+
+def encrypt(plaintext: bytes):
+    submission_key = PrivateKey.generate()
+    nonce = random(Box.NONCE_SIZE)
+    ciphertext = Box(submission_key, form_key.public_key).encrypt(plaintext, nonce)
+    return b64(bytes(submission_key.public_key)), b64(nonce), ciphertext.ciphertext
+
+
+def encrypted_attachment(content: bytes):
+    submission_public_key, nonce, binary = encrypt(content)
+    return {
+        "encryptedFile": {
+            "submissionPublicKey": submission_public_key,
+            "nonce": nonce,
+            "binary": b64(binary),
+        }
+    }
+
+
+def _attachment_submission(files, serve):
+    responses = []
+    urls = {}
+    for i, content in enumerate(files):
+        field_id = f"field{i}"
+        responses.append(
+            {
+                "_id": field_id,
+                "question": f"Attachment {i}",
+                "fieldType": "attachment",
+                "answer": f"file{i}.txt",
+            }
+        )
+        urls[field_id] = serve(field_id, encrypted_attachment(content))
+    submission_public_key, nonce, ciphertext = encrypt(json.dumps(responses).encode())
+    return {
+        "encryptedContent": f"{submission_public_key};{nonce}:{b64(ciphertext)}",
+        "version": 1,
+        "attachmentDownloadUrls": urls,
+    }
+
+
+def attachment_submission(
+    server: AttachmentServer, files, delay: float = 0, failures=0
+):
+    """
+    A submission with one attachment field per file, served by `server`.
+    """
+    return _attachment_submission(
+        files,
+        lambda field_id, record: server.add(f"/{field_id}", record, delay, failures),
+    )
+
+
+def fake_attachment_submission(transport: FakeTransport, files, delay: float = 0):
+    """
+    A submission with one attachment field per file, served by `transport`.
+    """
+
+    def serve(field_id, record):
+        url = f"https://attachments.test/{field_id}"
+        transport.add(url, record, delay)
+        return url
+
+    return _attachment_submission(files, serve)
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+# webhooks received by the middleware
+URI = "https://example.com/webhook"
+
+webhook_form = SyntheticForm(field_count=5)
+
+
+def make_sdk(cls=FormSdk, **kwargs):
+    sdk = cls("STAGING", **kwargs)
+    # sign and verify with the synthetic form's signing key
+    sdk.webhooks = Webhook(webhook_form.signing_public_key)
+    sdk.crypto = Crypto(webhook_form.signing_public_key)
+    return sdk
+
+
+def webhook(params=None, header=None):
+    params = params or webhook_form.submission()
+    body = json.dumps({"data": params}).encode()
+    if header is None:
+        header = webhook_form.signature_header(URI, params["submissionId"])
+    return header, body
+
+
+class App(object):
+    def __init__(self):
+        self.environ = None
+
+    def __call__(self, environ, start_response):
+        self.environ = environ
+        self.body = environ["wsgi.input"].read()
+        start_response("200 OK", [])
+        return [b"ok"]
+
+
+def call_wsgi(middleware, header, body, path="/webhook", method="POST", length=None):
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "CONTENT_LENGTH": str(len(body) if length is None else length),
+        "wsgi.input": io.BytesIO(body),
+    }
+    if header is not None:
+        environ["HTTP_X_FORMSG_SIGNATURE"] = header
+    statuses = []
+    response = middleware(environ, lambda status, headers: statuses.append(status))
+    return statuses[0], b"".join(response)
+
+
+def call_asgi(middleware, header, body, chunk_size=None, path="/webhook"):
+    headers = [(b"content-type", b"application/json")]
+    if header is not None:
+        headers.append((b"x-formsg-signature", header.encode()))
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    chunk_size = chunk_size or len(body) or 1
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    run(middleware(scope, receive, send))
+    return scope, sent
+
+
+async def asgi_app(scope, receive, send):
+    message = await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": message["body"]})
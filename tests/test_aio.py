@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from formsg.aio import AsyncFormSdk, AsyncTransport
+from formsg.exceptions import WebhookAuthenticateException
+from formsg.testing import FakeTransport
+from tests.helpers import (
+    FORM_SECRET_KEY,
+    attachment_submission,
+    encrypted_attachment,
+    fake_attachment_submission,
+    run,
+)
+
+
+def test_decrypt():
+    sdk = AsyncFormSdk("PRODUCTION", transport=FakeTransport())
+    params = fake_attachment_submission(sdk.transport, [])
+    result = run(sdk.decrypt(FORM_SECRET_KEY, params))
+    assert result == {"responses": []}
+
+
+def test_decrypt_attachments_concurrently():
+    transport = FakeTransport()
+    sdk = AsyncFormSdk("PRODUCTION", transport=transport, max_connections=4)
+    params = fake_attachment_submission(
+        transport, [b"a", b"b", b"c", b"d", b"e", b"f"], delay=0.01
+    )
+    result = run(sdk.decrypt_attachments(FORM_SECRET_KEY, params))
+    assert result["attachments"]["field5"] == {
+        "filename": "file5.txt",
+        "content": b"f",
+    }
+    assert transport.max_in_flight == 4
+
+
+def test_decrypt_attachments_timeout():
+    transport = FakeTransport()
+    sdk = AsyncFormSdk("PRODUCTION", transport=transport)
+    params = fake_attachment_submission(transport, [b"a"], delay=1)
+    assert run(sdk.decrypt_attachments(FORM_SECRET_KEY, params, timeout=0.05)) is None
+
+
+@pytest.mark.parametrize("transport", ["aiohttp", "requests"])
+def test_stalled_download_times_out(server, transport):
+    from formsg.aio import AiohttpTransport, RequestsTransport
+
+    url = server.add("/stalled", encrypted_attachment(b"a"), delay=1)
+    sdk = AsyncFormSdk(
+        "PRODUCTION",
+        transport=(AiohttpTransport if transport == "aiohttp" else RequestsTransport)(),
+        download_timeout=0.05,
+    )
+    params = fake_attachment_submission(FakeTransport(), [b"a"])
+    params["attachmentDownloadUrls"]["field0"] = url
+    started = time.monotonic()
+    assert run(sdk.decrypt_attachments(FORM_SECRET_KEY, params)) is None
+    assert time.monotonic() - started < 0.5
+    run(sdk.close())
+
+
+def test_authenticate_rejects_invalid_signature():
+    sdk = AsyncFormSdk("PRODUCTION", transport=FakeTransport())
+    header = "t=1583136171649,s=someSubmissionId,f=someFormId,v1=c2lnbmF0dXJl"
+    with pytest.raises(WebhookAuthenticateException):
+        run(sdk.authenticate(header, "https://some-endpoint.com/post"))
+
+
+def test_decrypt_attachments_over_http():
+    from formsg.testing import AttachmentServer
+
+    async def decrypt(params):
+        sdk = AsyncFormSdk("PRODUCTION")
+        try:
+            return await sdk.decrypt_attachments(FORM_SECRET_KEY, params)
+        finally:
+            await sdk.close()
+
+    with AttachmentServer() as server:
+        params = attachment_submission(server, [b"first", b"second"])
+        result = run(decrypt(params))
+    assert result["attachments"]["field1"]["content"] == b"second"
+
+
+def test_transport_must_implement_get():
+    class Incomplete(AsyncTransport):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_decrypt_attachments_derives_keys_off_the_event_loop():
+    transport = FakeTransport()
+    sdk = AsyncFormSdk("PRODUCTION", transport=transport)
+    params = fake_attachment_submission(transport, [b"a"])
+    create_context = sdk.crypto._create_context
+    threads = []
+
+    def record_thread(form_secret_key):
+        threads.append(threading.current_thread())
+        return create_context(form_secret_key)
+
+    sdk.crypto._create_context = record_thread
+    result = run(sdk.decrypt_attachments(FORM_SECRET_KEY, params))
+    assert result["attachments"]["field0"]["content"] == b"a"
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,139 @@
+import base64
+import io
+import json
+import time
+
+import pytest
+from nacl.utils import random
+
+from formsg.attachments import AttachmentDownloader
+from formsg.crypto import Crypto
+from formsg.exceptions import AttachmentDecryptionException, AttachmentDownloadException
+from formsg.util.stream import EncryptedAttachmentReader
+from tests.helpers import (
+    FORM_SECRET_KEY,
+    PUBLIC_KEY,
+    attachment_submission,
+    b64,
+    encrypted_attachment,
+)
+
+
+def test_decrypts_attachments(server):
+    crypto = Crypto(PUBLIC_KEY)
+    params = attachment_submission(server, [b"first", b"second"])
+    result = crypto.decrypt_attachments(FORM_SECRET_KEY, params)
+    assert result["attachments"] == {
+        "field0": {"filename": "file0.txt", "content": b"first"},
+        "field1": {"filename": "file1.txt", "content": b"second"},
+    }
+
+
+def test_downloads_attachments_concurrently(server):
+    crypto = Crypto(PUBLIC_KEY, downloader=AttachmentDownloader(max_workers=8))
+    params = attachment_submission(server, [b"x"] * 8, delay=0.2)
+    start = time.monotonic()
+    result = crypto.decrypt_attachments(FORM_SECRET_KEY, params)
+    assert len(result["attachments"]) == 8
+    assert time.monotonic() - start < 0.2 * 4
+
+
+def test_retries_failed_downloads(server):
+    crypto = Crypto(
+        PUBLIC_KEY, downloader=AttachmentDownloader(retries=2, backoff_factor=0)
+    )
+    params = attachment_submission(server, [b"x"], failures=2)
+    result = crypto.decrypt_attachments(FORM_SECRET_KEY, params)
+    assert result["attachments"]["field0"]["content"] == b"x"
+    assert server.request_count == 3
+
+
+def test_submission_deadline(server):
+    downloader = AttachmentDownloader()
+    params = attachment_submission(server, [b"x"], delay=0.5)
+    with pytest.raises(AttachmentDownloadException):
+        downloader.map(
+            lambda field_id, url: downloader.fetch(url),
+            params["attachmentDownloadUrls"],
+            downloader.deadline(0.1),
+        )
+    assert (
+        Crypto(PUBLIC_KEY).decrypt_attachments(FORM_SECRET_KEY, params, timeout=0.1)
+        is None
+    )
+
+
+def test_streams_attachments_to_directory(server, tmp_path):
+    crypto = Crypto(PUBLIC_KEY)
+    content = random(200_000)
+    params = attachment_submission(server, [content, b"second"])
+    result = crypto.decrypt_attachments_to(FORM_SECRET_KEY, params, str(tmp_path))
+    first = result["attachments"]["field0"]
+    assert first["filename"] == "file0.txt"
+    assert first["size"] == len(content)
+    assert first["file"].read() == content
+    assert first["file"].name.startswith(str(tmp_path))
+    assert result["attachments"]["field1"]["file"].read() == b"second"
+
+
+def test_streams_attachments_to_callable(server):
+    crypto = Crypto(PUBLIC_KEY, downloader=AttachmentDownloader(chunk_size=7))
+    params = attachment_submission(server, [b"first"])
+    result = crypto.decrypt_attachments_to(
+        FORM_SECRET_KEY, params, lambda field_id, filename: io.BytesIO()
+    )
+    assert result["attachments"]["field0"]["file"].getvalue() == b"first"
+
+
+def test_failed_stream_discards_files(server, tmp_path):
+    crypto = Crypto(PUBLIC_KEY, downloader=AttachmentDownloader(retries=0))
+    params = attachment_submission(server, [b"first", b"second"])
+    # the second attachment cannot be decrypted, and fails after the first is written
+    record = encrypted_attachment(b"second")
+    record["encryptedFile"]["binary"] = b64(random(len(b"second") + 16))
+    server.add("/field1", record, delay=0.2)
+    with pytest.raises(AttachmentDecryptionException):
+        crypto.decrypt_attachments_to(FORM_SECRET_KEY, params, str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+    server.add("/field1", record, failures=1)
+    assert crypto.decrypt_attachments_to(FORM_SECRET_KEY, params, str(tmp_path)) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_reader_handles_split_and_escaped_chunks():
+    record = encrypted_attachment(random(1000))
+    body = json.dumps(record).replace("/", "\\/").encode()
+    reader = EncryptedAttachmentReader(len(body))
+    for i in range(0, len(body), 5):
+        reader.feed(body[i : i + 5])
+    encrypted_file = reader.close()
+    assert bytes(encrypted_file["binary"]) == base64.b64decode(
+        record["encryptedFile"]["binary"]
+    )
+    assert encrypted_file["nonce"] == record["encryptedFile"]["nonce"]
+
+
+def test_reader_rejects_incomplete_body():
+    body = json.dumps(encrypted_attachment(b"x")).encode()
+    reader = EncryptedAttachmentReader()
+    reader.feed(body[:-20])
+    with pytest.raises(ValueError):
+        reader.close()
+
+
+def test_synthetic_form(server):
+    from formsg.testing import SyntheticForm
+    from formsg.webhook import Webhook
+
+    form = SyntheticForm(field_count=30)
+    crypto = Crypto(form.signing_public_key)
+    params = form.submission(verified=True, attachment_sizes=[10, 2000], server=server)
+    result = crypto.decrypt_attachments(form.secret_key, params)
+    assert len(result["content"]["responses"]) == 32
+    assert result["content"]["verified"]["transactionId"] == params["submissionId"]
+    assert [len(a["content"]) for a in result["attachments"].values()] == [10, 2000]
+
+    uri = "https://example.com/submissions"
+    header = form.signature_header(uri, params["submissionId"])
+    assert Webhook(form.signing_public_key).authenticate(header, uri)
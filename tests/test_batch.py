@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from formsg.crypto import Crypto
+from formsg.exceptions import DecryptWorkerException
+from tests.helpers import cipertext
+
+PUBLIC_KEY = "KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM="
+FORM_SECRET_KEY = "H7B0nKJ+E7+naSkQApxGayz1y/lZe4thta4iPp1B+Ns="
+
+
+def payloads(n: int):
+    for i in range(n):
+        if i % 3 == 2:
+            yield {"encryptedContent": "malformed", "version": 1}
+        else:
+            yield {"encryptedContent": cipertext, "version": 1}
+
+
+def test_decrypt_many_in_order():
+    results = list(
+        Crypto(PUBLIC_KEY).decrypt_many(
+            FORM_SECRET_KEY, payloads(20), workers=2, chunksize=3, max_in_flight=2
+        )
+    )
+    assert [r["index"] for r in results] == list(range(20))
+    for r in results:
+        if r["index"] % 3 == 2:
+            assert r["result"] is None and r["error"]
+        else:
+            assert r["error"] is None and r["result"]["responses"]
+
+
+def test_decrypt_many_as_completed():
+    results = Crypto(PUBLIC_KEY).decrypt_many(
+        FORM_SECRET_KEY, payloads(20), workers=2, chunksize=3, ordered=False
+    )
+    assert sorted(r["index"] for r in results) == list(range(20))
+
+
+def test_decrypt_many_in_process():
+    results = list(
+        Crypto(PUBLIC_KEY).decrypt_many(FORM_SECRET_KEY, payloads(4), workers=0)
+    )
+    assert [r["error"] is None for r in results] == [True, True, False, True]
+
+
+def test_decrypt_many_reports_reasons():
+    crypto = Crypto(PUBLIC_KEY)
+    results = list(crypto.decrypt_many(FORM_SECRET_KEY, payloads(6), workers=2))
+    assert [r["reason"] for r in results] == [None, None, "malformed_envelope"] * 2
+    counts = crypto.counters.snapshot()
+    assert counts["ok"] == 4 and counts["malformed_envelope"] == 2
+
+
+def exit_worker(content):
+    os._exit(1)
+
+
+def test_decrypt_many_checks_key_eagerly():
+    with pytest.raises(Exception):
+        Crypto(PUBLIC_KEY).decrypt_many("AAAA", payloads(1))
+
+
+def test_decrypt_many_raises_when_worker_dies():
+    crypto = Crypto(PUBLIC_KEY, validator=exit_worker)
+    with pytest.raises(DecryptWorkerException):
+        list(crypto.decrypt_many(FORM_SECRET_KEY, payloads(4), workers=2))
@@ -0,0 +1,129 @@
+import os
+import time
+
+import pytest
+
+from formsg.aio import AsyncFormSdk
+from formsg.cache import (
+    DecryptCache,
+    DiskDecryptCache,
+    MemoryDecryptCache,
+    TieredDecryptCache,
+    attachment_cache_key,
+)
+from formsg.crypto import Crypto
+from formsg.testing import FakeTransport, SyntheticForm
+from tests.helpers import FORM_SECRET_KEY, encrypted_attachment, run
+
+
+def test_cache_key_ignores_presigned_query():
+    assert attachment_cache_key(
+        "sub", "https://bucket.s3.amazonaws.com/a/b?X-Amz-Signature=1"
+    ) == attachment_cache_key(
+        "sub", "https://bucket.s3.amazonaws.com/a/b?X-Amz-Signature=2"
+    )
+    assert attachment_cache_key("sub", "https://x/a") != attachment_cache_key(
+        "other", "https://x/a"
+    )
+
+
+def test_memory_cache_evicts_least_recently_used(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("formsg.cache.time.monotonic", lambda: now[0])
+    cache = MemoryDecryptCache(max_bytes=10, ttl=60)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.set("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.size == 8
+
+    cache.set("big", b"x" * 11)
+    assert cache.get("big") is None
+
+    now[0] += 61
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_disk_cache_is_encrypted_and_bounded(tmp_path):
+    secret = os.urandom(32)
+    cache = DiskDecryptCache(str(tmp_path), secret, max_bytes=300, ttl=60)
+    cache.set("submission:a", b"a" * 100)
+    assert cache.get("submission:a") == b"a" * 100
+    assert cache.get("submission:missing") is None
+
+    [entry] = os.listdir(tmp_path)
+    assert "submission" not in entry
+    assert b"a" * 10 not in (tmp_path / entry).read_bytes()
+
+    # shared by another process with the same secret, but not with another
+    assert DiskDecryptCache(str(tmp_path), secret).get("submission:a")
+    assert DiskDecryptCache(str(tmp_path)).get("submission:a") is None
+
+    old = time.time() - 30
+    os.utime(tmp_path / entry, (old, old))
+    cache.set("submission:b", b"b" * 100)
+    cache.set("submission:c", b"c" * 100)
+    assert cache.get("submission:a") is None
+    assert cache.get("submission:c") == b"c" * 100
+    assert cache.size <= 300
+
+    expired = time.time() - 61
+    for name in os.listdir(tmp_path):
+        os.utime(tmp_path / name, (expired, expired))
+    assert cache.get("submission:c") is None
+
+
+def test_tiered_cache_promotes_hits(tmp_path):
+    memory = MemoryDecryptCache()
+    cache = TieredDecryptCache(memory, DiskDecryptCache(str(tmp_path)))
+    cache.set("key", b"content")
+    memory._entries.clear()
+    assert cache.get("key") == b"content"
+    assert memory.get("key") == b"content"
+
+
+def test_retried_submission_is_not_downloaded_again(server):
+    form = SyntheticForm(field_count=5)
+    crypto = Crypto(form.signing_public_key, cache=MemoryDecryptCache())
+    params = form.submission(attachment_sizes=[100, 200], server=server)
+
+    first = crypto.decrypt_attachments(form.secret_key, params)
+    count = server.request_count
+    retried = crypto.decrypt_attachments(form.secret_key, params)
+    assert server.request_count == count
+    assert retried == first
+
+    # cached attachments are only returned to holders of the form's key
+    other = SyntheticForm(field_count=5, seed=1)
+    assert crypto.decrypt_attachments(other.secret_key, params) is None
+
+
+def test_async_retried_submission_is_not_downloaded_again():
+    transport = FakeTransport()
+    transport.add("https://attachments.test/a?sig=1", encrypted_attachment(b"file"))
+    sdk = AsyncFormSdk("STAGING", transport=transport, cache=MemoryDecryptCache())
+    context = sdk.crypto._create_context(FORM_SECRET_KEY)
+
+    async def decrypt_twice():
+        first = await sdk._decrypt_record(
+            context, "https://attachments.test/a?sig=1", "submission"
+        )
+        # signed anew on retry, and not served by the transport
+        retried = await sdk._decrypt_record(
+            context, "https://attachments.test/a?sig=2", "submission"
+        )
+        return first, retried
+
+    assert run(decrypt_twice()) == (b"file", b"file")
+
+
+def test_cache_must_implement_get_and_set():
+    class Incomplete(DecryptCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
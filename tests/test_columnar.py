@@ -0,0 +1,149 @@
+import csv
+import datetime
+import io
+
+import pytest
+
+from formsg.columnar import Column, ColumnarBatch
+from tests.helpers import plain_text
+
+
+def field(field_id, field_type, answer=None, answer_array=None):
+    f = {"_id": field_id, "question": f"Question {field_id}", "fieldType": field_type}
+    if answer_array is not None:
+        f["answerArray"] = answer_array
+    else:
+        f["answer"] = answer
+    return f
+
+
+def make_batch():
+    batch = ColumnarBatch()
+    batch.add({"responses": plain_text})
+    batch.add(
+        {
+            "responses": [
+                field("num", "number", "12.5"),
+                field("table", "table", answer_array=[["a", "b"], ["c", "d"]]),
+            ]
+        }
+    )
+    batch.add({"responses": [field("num", "number", "not a number")]})
+    return batch
+
+
+def test_typed_columns():
+    batch = make_batch()
+    assert len(batch) == 3
+    assert batch.columns["5e7479a386eaf2002488a20f"].value(0) == 123.0
+    assert batch.row(0)["5e771c346b3c5100240368da"] == 0.123
+    number = batch.columns["num"]
+    assert [number.value(i) for i in range(3)] == [None, 12.5, None]
+    assert number.errors == 1
+
+
+def test_non_string_answers_are_null():
+    batch = ColumnarBatch()
+    for answer in ([1, 2], {"a": 1}, True, 12):
+        batch.add(
+            {
+                "responses": [
+                    field("num", "number", answer),
+                    field("date", "date", answer),
+                ]
+            }
+        )
+    for column in (batch.columns["num"], batch.columns["date"]):
+        assert [column.value(i) for i in range(4)] == [None] * 4
+        assert column.errors == 4
+
+
+def test_add_responses_is_all_or_nothing():
+    batch = ColumnarBatch()
+    batch.add_responses(
+        [
+            field("a", "checkbox", answer_array=[["x"]]),
+            field("b", "checkbox", answer_array=["y"]),
+            field("c", "table", answer_array=[[1, 2]]),
+        ]
+    )
+    assert batch.row(0) == {"a": None, "b": ["y"], "c": None}
+    assert batch.columns["a"].errors == batch.columns["c"].errors == 1
+
+    with pytest.raises(KeyError):
+        batch.add_responses(
+            [
+                field("a", "checkbox", answer_array=["x"]),
+                field("c", "table", answer_array=[["p", "q"]]),
+                field("d", "short_text", "new"),
+                {"question": "No ID", "fieldType": "short_text", "answer": "z"},
+            ]
+        )
+    assert len(batch) == 1 and "d" not in batch.columns
+    assert all(len(column) == 1 for column in batch.columns.values())
+
+    batch.add_responses([field("a", "checkbox", answer_array=["x", "z"])])
+    assert batch.row(1) == {"a": ["x", "z"], "b": None, "c": None}
+    assert batch.columns["a"].values == ["x", "z"]
+    assert batch.columns["c"].values == []
+
+
+def test_date_yes_no_and_lists():
+    batch = make_batch()
+    row = batch.row(0)
+    dates = [v for v in row.values() if isinstance(v, datetime.date)]
+    assert dates == [datetime.date(2020, 3, 22)]
+    assert True in row.values()
+    assert ["Option 2"] in row.values()
+    assert "5e7479c786eaf2002488a211" not in batch.columns  # headers are skipped
+
+
+def test_table_uses_offsets():
+    table = make_batch().columns["table"]
+    assert table.value(0) is None
+    assert table.value(1) == [["a", "b"], ["c", "d"]]
+    assert list(table.row_offsets) == [0, 0, 2, 2]
+    assert list(table.cell_offsets) == [0, 2, 4]
+    assert table.values == ["a", "b", "c", "d"]
+
+
+def test_to_csv():
+    out = io.StringIO()
+    make_batch().to_csv(out)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert len(rows) == 4
+    assert rows[0][0] == "Email"
+    assert rows[1][5] == "Long\nText"
+    assert "2020-03-22" in rows[1]
+    assert rows[2][-1] == '[["a", "b"], ["c", "d"]]'
+    assert rows[3] == [""] * len(rows[0])
+
+
+def test_to_numpy_and_pandas():
+    numpy = pytest.importorskip("numpy")
+    pandas = pytest.importorskip("pandas")
+    batch = make_batch()
+    arrays = batch.to_numpy()
+    assert arrays["num"].mask.tolist() == [True, False, True]
+    assert arrays["num"][1] == 12.5
+    assert arrays["table"]["row_offsets"].tolist() == [0, 0, 2, 2]
+
+    frame = batch.to_pandas()
+    assert frame.shape == (3, len(batch.columns))
+    assert numpy.isnan(frame["num"][0])
+    assert frame["5e771c666b3c5100240368df"].dtype == "boolean"
+    # the batch can keep growing after being exported
+    batch.add({"responses": [field("num", "number", "1")]})
+    assert len(batch.columns["num"]) == 4
+
+
+def test_column_must_implement_its_methods():
+    class Incomplete(Column):
+        def append(self, field):
+            pass
+
+        def append_missing(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete("id", "question", "textfield")
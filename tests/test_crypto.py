@@ -1,21 +1,10 @@
 # from typing_extensions import Literal
 # import pytest
-from formsg.crypto import Crypto
+import base64
 import json
-import os
-import pathlib
-
-PUBLIC_KEY = "KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM="
-SECRET_KEY = "/u+LP57Ib9y5Ytpud56FzuitSC9O6lJ4EOLOFHpsHlYpRjVdPfRqv5et5WOxLXD9zcSkOzagBJsXobd6+9pQkw=="
-
 
-def load_resource(path: str):
-    f = open(path).read()
-    return json.loads(f)
-
-
-cwd = pathlib.Path(__file__).parent.resolve()
-plain_text = load_resource(os.path.join(cwd, "resources/plaintext.json"))
+from formsg.crypto import Crypto
+from tests.helpers import PUBLIC_KEY, SECRET_KEY, cipertext, plain_text
 
 
 def test_failed_decryption():
@@ -23,9 +12,6 @@ def test_failed_decryption():
     assert crypto.decrypt(SECRET_KEY, "") == None
 
 
-cipertext = "RqOjwNXwiVJqvdTrQeD/NiktpI8vzo6CXlBBNihmmwI=;+0cGJwOA42F7DmQO7Kr6tNn9YH/7poDe:2jpehB9uW+63G1EimxOs1tsfR54xxSVZQbFMQaCa8ovVoF/6isBCEl5WLmrE1CRa2c5L2G5rAgCUnhsxQ7jVa//XEKr/m9kGNMbPnVqH62RslAxh30Mzz2he/ssbMazLDBzgQwd8I+pHnrBHQW5BsLqclj7QAMX3fa10Zon0ih4irWQ1o9eYitFllitD+vIcwbBzJyigGvD/t14+2/5imZmJdmJTJXd1ySxDo1X6KjBmph4rzvWtZSUgF7rRfMtAmbyOj87i6CkkNNIN4Dtl3zEuSeLuU2IDF7IHDdAwpmgWM9ejFpwrMFfr8PRovCubuRxCDQ1hV6GOyh60SlKA3oHQMhRQ2yia2vr9yxzHgO+wVUfgoiXQn8tvXFwZmzZd/eWENC1QI+XvP1jt50RIhQ0kMbyhBiaAG9nYlhGO3UHtmGGBoOdW4l4DZaWKRItnw1qgb2oxCvxOIkWNoafq1qJbYJsldOy6a/I2lbwAPL7MzVfgHJDj11dLOBgHGZHia6ZaROXYEiFpkVP8APOO/tgV902nOOlt+w63QNIieCIoGphn9LvOTo6Y6HD8qH6sekEyXCds6jP4RVw5XIN9LGeOWlEKx/VR2rf8b9qzFcYRPzfH5M8I9rpuZkk72ANiTeLRM8C8zWFnitzDlh1B2M+jnjrg+jEYm0ugro7tvHYSmU4tKcGR3mPlDrROjtFf3eBO8+pZKzuQfdA/7kN5YekAzyNjLcixioycrDmjR+BbBKxVrwNlm0hmHLLdU1g42GYpmfUUythDnqwALAOtaZcuj1ObX50h6kmhIl4fAEcXdLKKpoASzafbHnIH0iNX1CefnflLxymDPjjTFqcGSpY1vZf2pxDxUNZPXsd3vbV4KbrYq9v/R5NJ+mW3lxm839aN0pNsMbMetyZTyX8tXofWERxKEZDDXRCoYS0Ijml5h0X58juM13hNtc48iuPyx8oBIy4WophJ+M4CJfsq1wfBK0q+a8P2Tj8odJRQbbFdCoQRRRKbFhk0nT/R3V23cRjMB/Z1DCFmo8ywhUfSlMhrs8f6f3myhmJpzP5MXPJgzRIAytYtUF34j+9fspaYtyQHg4j4f8OBIYrNOCgt6++1bmy0+aI3Y0DoBJ1eLfe9iHUt64cvPbPqmAxX8Jkb1kY+OVwjx7DTxFc5dCzkL/3VA1FAZe7IqfP0v/3fTT6oK7nuy951GUSU9sBynV8Z6zJecYUWbgFZ1u/K8ag6btR2IeRFz7dG+Ffkb8nsGTcNm0l54Q/XbudtfIPN2GTGp1PlgFZ5JERszVrQ8MIrMnHtPvnbtIlqdVzZ0KwR1YQnqtjCoNnI/TzniRZnydE/qJCc5ZwAQDJhl0XRmVes5sp4obxhreSdgGjoyybeFN70rb6uMvsuBlTS5Z6xg7q4eW0e8Xx0PlKYJi8eUsFtzQlN3iJzgFTeLGOlguK2GWnI/Myy5/nan2Np5+eZ2GZhdn6s/NYmiJGLlcbmcXRLOj53O1Z9Oornc+Hq5rz+eZKg4uYNbyFCbvJ9d/wNbRaQva9kETeEfGVosZXotnA2dxYRF4A24Qwjo+yNeRlbyQBf0V0BWY+rfJ+F2JMP4LZ5FNVhd5JI16z7PEgqvlGqm7zkfPmwlTjCzDFXYz749fz9hrzqOCALguEhmMYEsun8mK7IptW77qbKyx2jTu/2OC6pqdWhHB3PliKZXD5EgedpqzHcWQg/s9TloSXy9pE9PEs0j+el+j4yXyQcfrAjODWHSrUXNWSJc1rOM1ochIYJWYHn4pf2Jxuop90+c4DFYp5eih3k8BGy4Etp6L0N7PJ+ugSqZV8L0QYT2sLBwG2cS8FNUGJPoUkUn6R2Bg7bTQ=="
-
-
 def test_decryption():
     crypto = Crypto("KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM=")
     result = crypto.decrypt(
@@ -47,3 +33,217 @@ def test_decrypt_malformed_content():
         },
     )
     assert result is None
+
+
+def test_decryption_context_reuses_shared_key():
+    from nacl.public import Box, PrivateKey
+    from nacl.utils import random
+
+    from formsg.util.crypto import DecryptionContext
+
+    form_key = PrivateKey.generate()
+    submission_key = PrivateKey.generate()
+    box = Box(submission_key, form_key.public_key)
+    submission_public_key = base64.b64encode(bytes(submission_key.public_key)).decode()
+
+    nonce = random(Box.NONCE_SIZE)
+    content = box.encrypt(b"[]", nonce).ciphertext
+    encrypted_content = f"{submission_public_key};{base64.b64encode(nonce).decode()}:{base64.b64encode(content).decode()}"
+    file_nonce = random(Box.NONCE_SIZE)
+    encrypted_file = {
+        "submission_public_key": submission_public_key,
+        "nonce": base64.b64encode(file_nonce).decode(),
+        "binary": box.encrypt(b"file", file_nonce).ciphertext,
+    }
+
+    context = DecryptionContext(base64.b64encode(bytes(form_key)).decode())
+    assert context.decrypt_content(encrypted_content) == b"[]"
+    assert context.decrypt_file(encrypted_file) == b"file"
+    assert len(context._boxes) == 1
+
+
+def test_decrypt_result_failure_reasons():
+    from nacl.public import Box, PrivateKey
+    from nacl.signing import SigningKey
+    from nacl.utils import random
+
+    from formsg.result import DecryptFailureReason
+
+    signing_key = SigningKey.generate()
+    form_key = PrivateKey.generate()
+    form_secret_key = base64.b64encode(bytes(form_key)).decode()
+
+    def encrypt(plaintext: bytes) -> str:
+        submission_key = PrivateKey.generate()
+        nonce = random(Box.NONCE_SIZE)
+        ciphertext = Box(submission_key, form_key.public_key).encrypt(plaintext, nonce)
+        return ";".join(
+            [
+                base64.b64encode(bytes(submission_key.public_key)).decode(),
+                f"{base64.b64encode(nonce).decode()}:{base64.b64encode(ciphertext.ciphertext).decode()}",
+            ]
+        )
+
+    crypto = Crypto(base64.b64encode(bytes(signing_key.verify_key)).decode())
+    content = encrypt(json.dumps(plain_text).encode())
+    verified = encrypt(signing_key.sign(b'{"uinFin": "S1234567A"}'))
+    forged = encrypt(SigningKey.generate().sign(b'{"uinFin": "S1234567A"}'))
+    cases = [
+        ("not a key", {"encryptedContent": content}, "INVALID_SECRET_KEY"),
+        (form_secret_key, {"version": 1}, "MALFORMED_ENVELOPE"),
+        (form_secret_key, {"encryptedContent": "a;b:c"}, "MALFORMED_ENVELOPE"),
+        (
+            "H7B0nKJ+E7+naSkQApxGayz1y/lZe4thta4iPp1B+Ns=",
+            {"encryptedContent": content},
+            "WRONG_KEY",
+        ),
+        (form_secret_key, {"encryptedContent": encrypt(b"{")}, "BAD_JSON"),
+        (form_secret_key, {"encryptedContent": encrypt(b"{}")}, "SCHEMA_VIOLATION"),
+        (
+            form_secret_key,
+            {"encryptedContent": content, "verifiedContent": forged},
+            "VERIFIED_SIGNATURE",
+        ),
+    ]
+    for key, params, reason in cases:
+        result = crypto.decrypt_result(key, params)
+        assert not result and result.content is None
+        assert result.reason is DecryptFailureReason[reason]
+        assert crypto.decrypt(key, params) is None
+
+    result = crypto.decrypt_result(
+        form_secret_key, {"encryptedContent": content, "verifiedContent": verified}
+    )
+    assert result.ok and result.content["verified"] == {"uinFin": "S1234567A"}
+
+    counts = crypto.counters.snapshot()
+    assert counts["ok"] == 1
+    assert counts["malformed_envelope"] == 4
+    assert counts["wrong_key"] == 2
+
+
+def test_json_backends():
+    import pytest
+
+    from formsg.util.json_backend import JsonBackend, get_json_backend
+
+    assert get_json_backend("json").loads(b'{"a": [1]}') == {"a": [1]}
+    with pytest.raises(ValueError):
+        get_json_backend("simplejson")
+    backends = ["json"]
+    try:
+        backends.append(get_json_backend("orjson"))
+        assert get_json_backend().name == "orjson"
+    except ImportError:
+        assert type(get_json_backend()) is JsonBackend
+
+    for backend in backends:
+        crypto = Crypto(PUBLIC_KEY, json_backend=backend)
+        result = crypto.decrypt(
+            "H7B0nKJ+E7+naSkQApxGayz1y/lZe4thta4iPp1B+Ns=",
+            {"encryptedContent": cipertext, "version": 1},
+        )
+        assert result["responses"] == plain_text
+
+
+def test_encrypt_round_trip():
+    from formsg.util.crypto import generate_signing_keypair
+
+    keypair = Crypto.generate()
+    assert Crypto.valid(keypair["publicKey"], keypair["secretKey"])
+    assert not Crypto.valid(Crypto.generate()["publicKey"], keypair["secretKey"])
+    assert not Crypto.valid("not a key", keypair["secretKey"])
+
+    signing_keypair = generate_signing_keypair()
+    crypto = Crypto(signing_keypair["publicKey"])
+    verified = {"uinFin": "S1234567D"}
+    params = {
+        "encryptedContent": crypto.encrypt(plain_text, keypair["publicKey"]),
+        "verifiedContent": crypto.encrypt(
+            verified, keypair["publicKey"], signing_keypair["secretKey"]
+        ),
+        "version": 1,
+    }
+    result = crypto.decrypt(keypair["secretKey"], params)
+    assert result == {"responses": plain_text, "verified": verified}
+
+    encrypted_file = crypto.encrypt_file(b"file", keypair["publicKey"])
+    assert crypto.decrypt_file(keypair["secretKey"], encrypted_file) == b"file"
+
+
+def test_decrypt_bytes_like_envelopes(tmp_path):
+    import mmap
+
+    from formsg.testing import SyntheticForm
+    from formsg.util.crypto import DecryptionContext, parse_envelope
+
+    form = SyntheticForm()
+    encrypted_content = form.encrypt(b"[1, 2, 3]")
+    context = DecryptionContext(form.secret_key)
+    path = tmp_path / "envelope"
+    path.write_bytes(encrypted_content.encode())
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        for envelope in [
+            encrypted_content.encode(),
+            bytearray(encrypted_content.encode()),
+            memoryview(b"padding" + encrypted_content.encode())[7:],
+            m,
+        ]:
+            assert context.decrypt_content(envelope) == b"[1, 2, 3]"
+    assert len(context._boxes) == 1
+
+    # envelopes not laid out canonically are parsed as strings were before
+    key, rest = encrypted_content.split(";")
+    assert context.decrypt_content(f"{key};{rest[:40]}\n{rest[40:]}") == b"[1, 2, 3]"
+    assert parse_envelope(encrypted_content + ":") is None
+    assert parse_envelope(encrypted_content[:-1]) is None
+    assert parse_envelope(encrypted_content.split(":")[0] + ":AAAA") is None
+    assert parse_envelope("é" + encrypted_content) is None
+    assert parse_envelope(None) is None  # type: ignore
+
+
+def test_decrypt_into_reuses_buffer():
+    import pytest
+
+    from formsg.testing import SyntheticForm
+    from formsg.util.crypto import DecryptionContext, open_box_into, parse_envelope
+
+    form = SyntheticForm()
+    context = DecryptionContext(form.secret_key)
+    out = bytearray()
+    assert context.decrypt_into(form.encrypt(b"a longer plaintext"), out) == 18
+    assert out == b"a longer plaintext"
+    assert context.decrypt_into(form.encrypt(b"short").encode(), out) == 5
+    assert out[:5] == b"short" and len(out) == 18
+    assert context.decrypt_into(SyntheticForm(seed=1).encrypt(b"x"), out) is None
+
+    public_key, nonce, ciphertext = parse_envelope(form.encrypt(b"plaintext"))  # type: ignore
+    shared_key = context.box(public_key).shared_key()
+    with pytest.raises(ValueError):
+        open_box_into(shared_key, nonce, ciphertext, bytearray(8))
+    # a box can also be opened in place
+    buffer = bytearray(ciphertext)
+    assert open_box_into(shared_key, nonce, buffer, buffer) == 9
+    assert buffer[:9] == b"plaintext"
+
+
+def test_open_box_without_private_bindings(monkeypatch):
+    from formsg.testing import SyntheticForm
+    from formsg.util import crypto
+    from formsg.util.crypto import generate_signing_keypair, sign_message
+
+    monkeypatch.setattr(crypto, "lib", None)
+    form = SyntheticForm()
+    context = crypto.DecryptionContext(form.secret_key)
+    out = bytearray(b"-" * 12)
+    assert context.decrypt_into(form.encrypt(b"plaintext"), out) == 9
+    assert out == b"plaintext---"
+    assert context.decrypt_into(SyntheticForm(seed=1).encrypt(b"x"), out) is None
+    assert context.decrypt_content(form.encrypt(b"content")) == b"content"
+
+    keypair = generate_signing_keypair()
+    public_key = base64.b64decode(keypair["publicKey"])
+    signature = sign_message(b"message", keypair["secretKey"])[:64]
+    assert crypto.verify_detached(b"message", signature, public_key)
+    assert not crypto.verify_detached(b"massage", signature, public_key)
+    assert not crypto.verify_detached(b"message", signature[:63], public_key)
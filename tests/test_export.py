@@ -0,0 +1,186 @@
+import csv
+import json
+
+from formsg.cli import main
+from tests.helpers import cipertext, plain_text
+
+FORM_SECRET_KEY = "H7B0nKJ+E7+naSkQApxGayz1y/lZe4thta4iPp1B+Ns="
+
+
+def write_records(path, start: int, count: int, mode: str = "w"):
+    with open(path, mode) as f:
+        for i in range(start, start + count):
+            data = {
+                "formId": "someFormId",
+                "submissionId": f"submission{i}",
+                "created": "2020-03-22T00:00:00.000Z",
+                "encryptedContent": cipertext,
+                "version": 1,
+            }
+            f.write(json.dumps({"data": data}) + "\n")
+
+
+def export(*args):
+    return main(["export", "--secret-key", FORM_SECRET_KEY, "--workers", "2", *args])
+
+
+def test_export_ndjson(tmp_path):
+    write_records(tmp_path / "in.ndjson", 0, 3)
+    output = tmp_path / "out.ndjson"
+    assert export(str(tmp_path), "-o", str(output)) == 0
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row["submissionId"] for row in rows] == [
+        "submission0",
+        "submission1",
+        "submission2",
+    ]
+    assert rows[0]["Email"] == "test@open.gov.sg"
+    assert rows[0]["Checkbox"] == ["Option 2"]
+    assert "Header" not in rows[0]
+
+
+def test_export_csv_has_one_column_per_question(tmp_path):
+    write_records(tmp_path / "in.ndjson", 0, 2)
+    output = tmp_path / "out.csv"
+    assert (
+        export(str(tmp_path / "in.ndjson"), "-o", str(output), "--format", "csv") == 0
+    )
+
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    questions = [field["question"] for field in plain_text if not field.get("isHeader")]
+    assert list(rows[0]) == ["submissionId", "formId", "created"] + questions
+    assert len(rows) == 2
+
+
+def test_export_resumes_from_checkpoint(tmp_path):
+    source = tmp_path / "in.ndjson"
+    output = tmp_path / "out.csv"
+    checkpoint = tmp_path / "checkpoint.json"
+    args = ["-o", str(output), "--format", "csv", "--checkpoint", str(checkpoint)]
+
+    write_records(source, 0, 2)
+    assert export(str(source), *args) == 0
+    # rows written after the last checkpoint, eg. before a crash, are dropped
+    with open(output, "a") as f:
+        f.write("partial row")
+    write_records(source, 2, 2, mode="a")
+    assert export(str(source), *args) == 0
+
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["submissionId"] for row in rows] == [f"submission{i}" for i in range(4)]
+
+
+def test_export_checkpoints_across_failed_records(tmp_path, monkeypatch):
+    from formsg import export as export_module
+
+    source = tmp_path / "in.ndjson"
+    write_records(source, 0, 1)
+    with open(source, "a") as f:
+        f.write("not json\n" * 3)
+    write_records(source, 4, 1, mode="a")
+
+    saved = []
+    save_checkpoint = export_module.Exporter._save_checkpoint
+
+    def spy(self, out, records):
+        saved.append(records)
+        save_checkpoint(self, out, records)
+
+    monkeypatch.setattr(export_module, "CHECKPOINT_INTERVAL", 2)
+    monkeypatch.setattr(export_module.Exporter, "_save_checkpoint", spy)
+    checkpoint = tmp_path / "checkpoint.json"
+    output = tmp_path / "out.ndjson"
+    assert export(str(source), "-o", str(output), "--checkpoint", str(checkpoint)) == 0
+    assert saved == [2, 4, 5]
+    assert len(output.read_text().splitlines()) == 2
+
+
+def test_export_csv_reports_columns_not_in_header(tmp_path, caplog):
+    from formsg.testing import SyntheticForm
+
+    form = SyntheticForm()
+    first = [{"_id": "a", "question": "A", "fieldType": "textfield", "answer": "1"}]
+    second = first + [
+        {"_id": "b", "question": "B", "fieldType": "checkbox", "answerArray": [1, 2]}
+    ]
+    with open(tmp_path / "in.ndjson", "w") as f:
+        for i, responses in enumerate([first, second]):
+            content = form.encrypt(json.dumps(responses).encode())
+            data = {"submissionId": f"submission{i}", "encryptedContent": content}
+            f.write(json.dumps({"data": data}) + "\n")
+    source = str(tmp_path / "in.ndjson")
+    output = tmp_path / "out.csv"
+    args = ["export", "--secret-key", form.secret_key, source, "-o"]
+    assert main([*args, str(output), "--format", "csv"]) == 0
+
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["A"] for row in rows] == ["1", "1"]
+    assert "B" not in rows[0]
+    assert "Column 'B' first seen in record 2" in caplog.text
+
+    assert main([*args, str(tmp_path / "out.json")]) == 0
+    rows = [json.loads(line) for line in open(tmp_path / "out.json")]
+    assert rows[1]["B"] == [1, 2]
+
+
+def test_csv_value():
+    from formsg.export import _csv_value
+
+    assert _csv_value(["x", "y"]) == "x; y"
+    # lists of anything but strings are written as JSON
+    assert _csv_value([1, 2]) == "[1, 2]"
+    assert _csv_value([["a", "b"]]) == '[["a", "b"]]'
+
+
+def test_export_starts_over_without_output(tmp_path):
+    source = tmp_path / "in.ndjson"
+    output = tmp_path / "out.ndjson"
+    checkpoint = tmp_path / "checkpoint.json"
+    args = ["-o", str(output), "--checkpoint", str(checkpoint)]
+    write_records(source, 0, 2)
+    assert export(str(source), *args) == 0
+    output.unlink()
+    assert export(str(source), *args) == 0
+    assert len(output.read_text().splitlines()) == 2
+
+
+def test_export_skips_unsigned_records_when_verifying(tmp_path):
+    write_records(tmp_path / "in.ndjson", 0, 2)
+    output = tmp_path / "out.ndjson"
+    assert export(str(tmp_path), "-o", str(output), "--uri", "https://a.test") == 0
+    assert output.read_text() == ""
+
+
+def test_export_downloads_attachments(tmp_path):
+    from formsg.testing import AttachmentServer
+    from tests.helpers import FORM_SECRET_KEY as ATTACHMENT_FORM_KEY
+    from tests.helpers import attachment_submission
+
+    with AttachmentServer() as server:
+        data = dict(
+            attachment_submission(server, [b"first"]), submissionId="submission0"
+        )
+        (tmp_path / "in.ndjson").write_text(json.dumps({"data": data}) + "\n")
+        output = tmp_path / "out.ndjson"
+        assert (
+            main(
+                [
+                    "export",
+                    "--secret-key",
+                    ATTACHMENT_FORM_KEY,
+                    str(tmp_path / "in.ndjson"),
+                    "-o",
+                    str(output),
+                    "--attachments-dir",
+                    str(tmp_path / "attachments"),
+                ]
+            )
+            == 0
+        )
+    assert json.loads(output.read_text())["Attachment 0"] == "file0.txt"
+    saved = tmp_path / "attachments" / "submission0" / "field0-file0.txt"
+    assert saved.read_bytes() == b"first"
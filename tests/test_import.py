@@ -0,0 +1,77 @@
+import subprocess
+import sys
+from typing import Dict, Set, Tuple
+
+import pytest
+
+# cumulative `-X importtime` of `formsg` and the modules it imports, in microseconds.
+# Importing it eagerly took around 100 ms.
+IMPORT_BUDGET_US = 50000
+
+# loaded only once attachments are downloaded, or submissions decrypted
+DEFERRED = {"requests", "urllib3", "nacl", "orjson", "formsg.crypto"}
+
+WEBHOOK_RECEIVER = """
+import time
+from formsg import FormSdk
+from formsg.util.crypto import generate_signing_keypair
+from formsg.webhook import Webhook
+
+sdk = FormSdk("PRODUCTION")
+keypair = generate_signing_keypair()
+sdk.webhooks = webhook = Webhook(keypair["publicKey"], keypair["secretKey"])
+uri = "https://example.com/submissions"
+params = {"uri": uri, "submissionId": "s", "formId": "f", "epoch": int(time.time() * 1000)}
+header = webhook.construct_header(dict(params, signature=webhook.generate_signature(params)))
+assert sdk.webhooks.authenticate(header, uri)
+"""
+
+
+def import_times(code: str) -> Tuple[Dict[str, int], Set[str]]:
+    """
+    Runs code in a fresh interpreter with `-X importtime`.
+    :returns the cumulative import time of each top-level import, and the names of all modules imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    cumulative, modules = {}, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():  # the header
+            continue
+        modules.add(name.strip())
+        if not name.startswith("  "):
+            cumulative[name.strip()] = int(total)
+    return cumulative, modules
+
+
+def test_import_is_lazy_and_within_budget():
+    cumulative, modules = import_times(
+        "import formsg; from formsg import FormSdk; FormSdk('PRODUCTION')"
+    )
+    assert not {m for m in modules if m in DEFERRED or m.split(".")[0] in DEFERRED}
+    assert (
+        sum(t for name, t in cumulative.items() if name.startswith("formsg"))
+        < IMPORT_BUDGET_US
+    )
+
+
+def test_webhook_receiver_does_not_import_requests():
+    _, modules = import_times(WEBHOOK_RECEIVER)
+    assert "nacl" in modules
+    assert not {"requests", "urllib3", "formsg.crypto"} & modules
+
+
+def test_lazy_exports():
+    import formsg
+
+    assert "FormSdk" in dir(formsg) and "FormKeyring" in formsg.__all__
+    assert formsg.FormKeyring is __import__("formsg.keyring").keyring.FormKeyring
+    with pytest.raises(AttributeError):
+        formsg.Missing
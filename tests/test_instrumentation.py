@@ -0,0 +1,88 @@
+import logging
+import time
+
+import pytest
+
+from formsg.instrumentation import LoggingObserver, PrometheusObserver, Stage
+from formsg.sdk import FormSdk
+from formsg.webhook import Webhook
+from tests.helpers import (
+    FORM_SECRET_KEY,
+    PUBLIC_KEY,
+    SECRET_KEY,
+    attachment_submission,
+)
+
+uri = "https://some-endpoint.com/post"
+submission_id = "someSubmissionId"
+form_id = "someFormId"
+
+
+class Recorder(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, stage, duration, size):
+        assert duration >= 0
+        self.calls.append((stage, size))
+
+    @property
+    def stages(self):
+        return [stage for stage, _ in self.calls]
+
+
+def test_observes_each_stage(server):
+    recorder = Recorder()
+    sdk = FormSdk("STAGING", SECRET_KEY, observer=recorder)
+    assert sdk.webhooks.observer is recorder
+
+    params = attachment_submission(server, [b"first"])
+    assert sdk.crypto.decrypt_attachments(FORM_SECRET_KEY, params)
+    assert recorder.stages == [
+        Stage.BASE64_DECODE,
+        Stage.BOX_DECRYPT,
+        Stage.JSON_PARSE,
+        Stage.SCHEMA_VALIDATION,
+        Stage.ATTACHMENT_DOWNLOAD,
+        Stage.ATTACHMENT_DECRYPT,
+    ]
+    assert dict(recorder.calls)[Stage.ATTACHMENT_DECRYPT] == len(b"first") + 16
+
+
+def test_observes_webhook_authentication():
+    recorder = Recorder()
+    webhooks = Webhook(PUBLIC_KEY, SECRET_KEY, observer=recorder)
+    epoch = int(time.time() * 1000)
+    signature = webhooks.generate_signature(
+        {"uri": uri, "submissionId": submission_id, "formId": form_id, "epoch": epoch}
+    )
+    header = webhooks.construct_header(
+        {
+            "epoch": epoch,
+            "submissionId": submission_id,
+            "formId": form_id,
+            "signature": signature,
+        }
+    )
+    assert webhooks.authenticate(header, uri)
+    assert recorder.calls == [
+        (Stage.HEADER_PARSE, len(header)),
+        (Stage.SIGNATURE_VERIFY, None),
+    ]
+
+
+def test_logging_observer(caplog):
+    with caplog.at_level(logging.DEBUG, logger="formsg.instrumentation"):
+        LoggingObserver()(Stage.BOX_DECRYPT, 0.0015, 2048)
+    assert "stage=box_decrypt duration_ms=1.500 size=2048" in caplog.text
+
+
+def test_prometheus_observer():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    observer = PrometheusObserver(registry)
+    observer(Stage.JSON_PARSE, 0.01, 100)
+    observer(Stage.SIGNATURE_VERIFY, 0.01, None)
+    labels = {"stage": Stage.JSON_PARSE}
+    assert registry.get_sample_value("formsg_stage_duration_seconds_count", labels) == 1
+    assert registry.get_sample_value("formsg_stage_size_bytes_sum", labels) == 100
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+from nacl.public import PrivateKey
+
+from formsg.crypto import Crypto
+from formsg.exceptions import MissingSecretKeyException
+from formsg.keyring import FormKeyring
+
+PUBLIC_KEY = "KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM="
+FORM_SECRET_KEY = "H7B0nKJ+E7+naSkQApxGayz1y/lZe4thta4iPp1B+Ns="
+OTHER_SECRET_KEY = "KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM="
+
+
+def header(form_id: str) -> str:
+    return f"t=1583136171649,s=someSubmissionId,f={form_id},v1=someSignature"
+
+
+def write_keys(path, keys, mtime_ns):
+    with open(path, "w") as f:
+        json.dump(keys, f)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_routes_by_form_id_in_header():
+    keyring = FormKeyring({"formA": FORM_SECRET_KEY, "formB": OTHER_SECRET_KEY})
+    key = keyring.private_key_for_header(header("formA"))
+    assert isinstance(key, PrivateKey)
+    assert key is keyring.private_key("formA")
+    assert keyring.private_key("formB") != key
+
+
+def test_missing_form_raises():
+    keyring = FormKeyring({"formA": FORM_SECRET_KEY})
+    with pytest.raises(MissingSecretKeyException):
+        keyring.private_key_for_header(header("formB"))
+
+
+def test_decoded_keys_are_bounded():
+    keyring = FormKeyring(
+        {"formA": FORM_SECRET_KEY, "formB": OTHER_SECRET_KEY}, max_cached_keys=1
+    )
+    keyring.private_key("formA")
+    keyring.private_key("formB")
+    assert list(keyring._state.private_keys) == ["formB"]
+
+
+def test_reloads_keys_file_when_changed(tmp_path):
+    path = str(tmp_path / "keys.json")
+    write_keys(path, {"formA": FORM_SECRET_KEY}, 1_000_000_000)
+    keyring = FormKeyring.from_file(path, reload_interval=0)
+    assert "formA" in keyring
+    assert "formB" not in keyring
+
+    write_keys(path, {"formB": OTHER_SECRET_KEY}, 2_000_000_000)
+    assert "formB" in keyring
+    assert "formA" not in keyring
+
+
+def test_keeps_keys_when_reload_fails(tmp_path):
+    path = str(tmp_path / "keys.json")
+    write_keys(path, {"formA": FORM_SECRET_KEY}, 1_000_000_000)
+    keyring = FormKeyring.from_file(path, reload_interval=0)
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert "formA" in keyring
+
+
+def test_crypto_decrypts_with_keyring():
+    from tests.helpers import cipertext
+
+    crypto = Crypto(PUBLIC_KEY, FormKeyring({"formA": FORM_SECRET_KEY}))
+    result = crypto.decrypt_from_header(
+        header("formA"), {"encryptedContent": cipertext, "version": 1}
+    )
+    assert result is not None
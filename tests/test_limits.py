@@ -0,0 +1,173 @@
+import json
+
+import pytest
+
+from formsg.attachments import AttachmentDownloader
+from formsg.crypto import Crypto
+from formsg.exceptions import AttachmentTooLargeException, HeaderTooLongException
+from formsg.limits import Limits, exceeds_depth
+from formsg.result import DecryptFailureReason
+from formsg.sdk import FormSdk
+from formsg.testing import SyntheticForm, generate_responses
+from formsg.webhook import Webhook
+
+
+def test_exceeds_depth():
+    plaintext = json.dumps(generate_responses(20, seed=1)).encode()
+    assert not exceeds_depth(plaintext, 4)
+    assert exceeds_depth(plaintext, 3)
+    assert exceeds_depth(b"[" * 50 + b"]" * 50, 32)
+    assert not exceeds_depth(b"[" * 32 + b"]" * 32, 32)
+
+    # brackets in strings, including after escaped quotes, do not nest
+    assert not exceeds_depth(json.dumps(["[[[", {"a": '"{{{'}, "\\"]).encode(), 2)
+    assert exceeds_depth(json.dumps([["\\", [{"a": "]]]"}]]]).encode(), 3)
+    # unbalanced brackets are left to the parser
+    assert not exceeds_depth(b"[" * 50, 32)
+
+
+def test_decrypt_rejects_before_parsing():
+    form = SyntheticForm(field_count=12)
+    crypto = Crypto(
+        form.signing_public_key,
+        json_backend="json",
+        limits=Limits(max_content_length=4096, max_field_count=10),
+    )
+    params = form.submission()
+    result = crypto.decrypt_result(form.secret_key, params)
+    assert result.reason is DecryptFailureReason.TOO_MANY_FIELDS
+
+    params["encryptedContent"] = form.encrypt(b"[" * 5000)
+    result = crypto.decrypt_result(form.secret_key, params)
+    assert result.reason is DecryptFailureReason.CONTENT_TOO_LARGE
+
+    # nested deeper than `json` can parse, with no `max_depth` set
+    params["encryptedContent"] = form.encrypt(b"[" * 2000 + b"]" * 2000)
+    crypto.limits.max_content_length = None
+    result = crypto.decrypt_result(form.secret_key, params)
+    assert result.reason is DecryptFailureReason.TOO_DEEP
+
+    crypto.limits.max_depth = 8
+    params["encryptedContent"] = form.encrypt(b"[" * 9 + b"]" * 9)
+    result = crypto.decrypt_result(form.secret_key, params)
+    assert result.reason is DecryptFailureReason.TOO_DEEP
+
+    assert crypto.limits.rejections() == {
+        "header_length": 0,
+        "content_length": 1,
+        "attachment_size": 0,
+        "field_count": 1,
+        "depth": 2,
+    }
+    assert crypto.counters.snapshot()["too_deep"] == 2
+
+
+def test_decrypt_checks_type_before_size():
+    form = SyntheticForm()
+    crypto = Crypto(form.signing_public_key, observer=lambda *args: None)
+    for content in (123, ["a;b:c"], {"a": 1}):
+        result = crypto.decrypt_result(form.secret_key, {"encryptedContent": content})  # type: ignore
+        assert result.reason is DecryptFailureReason.MALFORMED_ENVELOPE
+        assert crypto.decrypt(form.secret_key, {"encryptedContent": content}) is None  # type: ignore
+
+    params = form.submission(verified=True)
+    params["verifiedContent"] = 123  # type: ignore
+    result = crypto.decrypt_result(form.secret_key, params)
+    assert result.reason is DecryptFailureReason.VERIFIED_SIGNATURE
+    assert crypto.limits.rejections()["content_length"] == 0
+
+
+def test_webhook_rejects_long_header():
+    form = SyntheticForm()
+    sdk = FormSdk("PRODUCTION", limits=Limits(max_header_length=256))
+    sdk.webhooks = Webhook(form.signing_public_key, limits=sdk.limits)
+    uri = "https://example.com/submissions"
+    header = form.signature_header(uri, "5e771c7a6b3c5100240368e0")
+    assert sdk.webhooks.authenticate(header, uri)
+    with pytest.raises(HeaderTooLongException):
+        sdk.webhooks.authenticate(header + ",x=" + "a" * 256, uri)
+    assert sdk.limits.rejections()["header_length"] == 1
+
+
+def test_download_rejects_large_attachment(server):
+    form = SyntheticForm(field_count=2)
+    limits = Limits(max_attachment_size=1000)
+    crypto = Crypto(form.signing_public_key, limits=limits)
+    params = form.submission(attachment_sizes=[100, 2000], server=server)
+    assert crypto.decrypt_attachments(form.secret_key, params) is None
+
+    urls = list(params["attachmentDownloadUrls"].values())
+    assert crypto.downloader.fetch(urls[0])
+    with pytest.raises(AttachmentTooLargeException):
+        crypto.downloader.fetch_stream(urls[1])
+    assert limits.rejections()["attachment_size"] == 2
+
+
+class ChunkedResponse(object):
+    """
+    A streamed response without a Content-Length.
+    """
+
+    headers: dict = {}
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i : i + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class ChunkedSession(object):
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def get(self, url, timeout=None, stream=False):
+        return ChunkedResponse(self.body)
+
+
+def test_download_counts_chunked_attachment():
+    body = json.dumps({"encryptedFile": {"binary": "a" * 2000}}).encode()
+    downloader = AttachmentDownloader(
+        session=ChunkedSession(body),  # type: ignore
+        chunk_size=256,
+        limits=Limits(max_attachment_size=len(body)),
+    )
+    assert downloader.fetch("https://attachments.test/a")["encryptedFile"]
+
+    downloader.limits.max_attachment_size = 1000
+    with pytest.raises(AttachmentTooLargeException):
+        downloader.fetch("https://attachments.test/a")
+    size, chunks = downloader.fetch_stream("https://attachments.test/a")
+    assert size is None
+    with pytest.raises(AttachmentTooLargeException):
+        list(chunks)
+    assert downloader.limits.rejections()["attachment_size"] == 2
+
+
+def test_async_rejects_large_attachment():
+    from formsg.aio import AsyncFormSdk
+    from formsg.testing import FakeTransport
+    from tests.helpers import FORM_SECRET_KEY, fake_attachment_submission, run
+
+    transport = FakeTransport()
+    sdk = AsyncFormSdk(
+        "PRODUCTION",
+        transport=transport,
+        limits=Limits(max_attachment_size=1000),
+    )
+    params = fake_attachment_submission(transport, [b"x" * 100, b"x" * 2000])
+    assert run(sdk.decrypt_attachments(FORM_SECRET_KEY, params)) is None
+    assert sdk.limits.rejections()["attachment_size"] == 1
@@ -0,0 +1,98 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from formsg.crypto import Crypto
+from formsg.loadtest import LoadGenerator, seeded_form
+from formsg.testing import AttachmentServer
+from formsg.webhook import Webhook
+
+
+class Receiver(object):
+    """
+    A webhook receiver that authenticates and decrypts each webhook, answering 200 or 401.
+    """
+
+    def __init__(self, form):
+        webhook = Webhook(form.signing_public_key)
+        crypto = Crypto(form.signing_public_key)
+        self.submission_ids = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                data = json.loads(body)["data"]
+                try:
+                    webhook.authenticate(
+                        self.headers["X-FormSG-Signature"], receiver.url
+                    )
+                    decrypted = crypto.decrypt_attachments(form.secret_key, data)
+                    status = 200 if decrypted else 400
+                except Exception:
+                    status = 401
+                receiver.submission_ids.append(data["submissionId"])
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/submissions"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def attachment_server():
+    with AttachmentServer() as server:
+        yield server
+
+
+def test_seeded_form_is_reproducible():
+    first, second = seeded_form(7, 5), seeded_form(7, 5)
+    assert first.secret_key == second.secret_key
+    assert first.signing_public_key == second.signing_public_key
+    assert seeded_form(8, 5).secret_key != first.secret_key
+
+    crypto = Crypto(first.signing_public_key)
+    assert crypto.decrypt(first.secret_key, first.submission()) == crypto.decrypt(
+        second.secret_key, second.submission()
+    )
+
+
+def test_load_generator(attachment_server):
+    form = seeded_form(1, 10)
+    receiver = Receiver(form)
+    try:
+        generator = LoadGenerator(
+            receiver.url,
+            form,
+            concurrency=4,
+            pool_size=3,
+            attachment_sizes=[100],
+            server=attachment_server,
+        )
+        result = generator.run(total=20)
+        assert result.count == 20 and result.ok == 20
+        assert result.statuses == {"200": 20}
+        assert len(set(receiver.submission_ids)) == 20
+        assert "p99=" in result.summary()
+
+        # signed for a different URI than the receiver checks
+        result = LoadGenerator(
+            receiver.url.replace("/submissions", "/elsewhere"),
+            form,
+            rate=100,
+            pool_size=1,
+        ).run(total=5)
+        assert result.statuses == {"401": 5}
+    finally:
+        receiver.close()
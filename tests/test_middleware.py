@@ -0,0 +1,159 @@
+import io
+
+import pytest
+
+from formsg.aio import AsyncFormSdk
+from formsg.exceptions import MissingSecretKeyException
+from formsg.keyring import FormKeyring
+from formsg.middleware import WebhookASGIMiddleware, WebhookWSGIMiddleware
+from formsg.testing import SyntheticForm
+from tests.helpers import (
+    URI,
+    App,
+    asgi_app,
+    call_asgi,
+    call_wsgi,
+    make_sdk,
+    webhook,
+)
+from tests.helpers import webhook_form as form
+
+
+def test_wsgi_hands_app_decrypted_submission():
+    app = App()
+    middleware = WebhookWSGIMiddleware(app, make_sdk(), URI, form.secret_key)
+    params = form.submission(verified=True)
+    header, body = webhook(params)
+
+    assert call_wsgi(middleware, header, body) == ("200 OK", b"ok")
+    submission = app.environ["formsg.submission"]
+    assert submission["submissionId"] == params["submissionId"]
+    assert submission["formId"] == params["formId"]
+    assert len(submission["content"]["responses"]) == 5
+    assert submission["content"]["verified"]["transactionId"] == params["submissionId"]
+    assert app.body == body
+
+
+def test_wsgi_rejects_before_reading_body():
+    app = App()
+    middleware = WebhookWSGIMiddleware(
+        app, make_sdk(), URI, form.secret_key, max_body_size=1024
+    )
+    header, body = webhook()
+
+    class Unreadable(io.BytesIO):
+        def read(self, *args):
+            raise AssertionError("body was read")
+
+    def call(header, length=None):
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/webhook",
+            "CONTENT_LENGTH": str(length or len(body)),
+            "wsgi.input": Unreadable(),
+        }
+        if header is not None:
+            environ["HTTP_X_FORMSG_SIGNATURE"] = header
+        statuses = []
+        middleware(environ, lambda status, headers: statuses.append(status))
+        return statuses[0]
+
+    assert call(None) == "401 Unauthorized"
+    assert call("garbage") == "401 Unauthorized"
+    assert call(form.signature_header(URI, "x", epoch=1)) == "401 Unauthorized"
+    assert call(form.signature_header("https://other.com/webhook", "x")) == (
+        "401 Unauthorized"
+    )
+    assert call(header, length=4096) == "413 Payload Too Large"
+    assert app.environ is None
+
+
+def test_wsgi_rejects_bad_bodies():
+    app = App()
+    middleware = WebhookWSGIMiddleware(
+        app, make_sdk(), URI, form.secret_key, max_body_size=4096
+    )
+    header, body = webhook()
+
+    # the body is not read without a Content-Length, nor past it
+    assert call_wsgi(middleware, header, body, length="")[0] == "411 Length Required"
+    assert call_wsgi(middleware, header, body, length=-1)[0] == "400 Bad Request"
+    status, _ = call_wsgi(middleware, header, body + b"x" * 4096, length=len(body))
+    assert status == "200 OK" and app.body == body
+    app.environ = None
+    assert call_wsgi(middleware, header, b"not json")[0] == "400 Bad Request"
+    assert call_wsgi(middleware, header, b'{"data": []}')[0] == "400 Bad Request"
+
+    # a submission encrypted for another form
+    _, other_body = webhook(SyntheticForm(field_count=5, seed=1).submission())
+    assert call_wsgi(middleware, header, other_body)[0] == "400 Bad Request"
+    assert app.environ is None
+
+
+def test_wsgi_passes_through_other_requests():
+    app = App()
+    middleware = WebhookWSGIMiddleware(app, make_sdk(), URI, form.secret_key)
+    assert call_wsgi(middleware, None, b"", path="/health")[0] == "200 OK"
+    assert call_wsgi(middleware, None, b"", method="GET")[0] == "200 OK"
+    assert "formsg.submission" not in app.environ
+
+
+def test_wsgi_picks_key_from_keyring():
+    app = App()
+    sdk = make_sdk(keyring=FormKeyring({form.form_id: form.secret_key}))
+    middleware = WebhookWSGIMiddleware(app, sdk, URI)
+    header, body = webhook()
+    assert call_wsgi(middleware, header, body)[0] == "200 OK"
+
+    signing_keypair = {
+        "publicKey": form.signing_public_key,
+        "secretKey": form.signing_secret_key,
+    }
+    other = SyntheticForm(field_count=5, seed=1, signing_keypair=signing_keypair)
+    params = other.submission()
+    header, body = webhook(params, other.signature_header(URI, params["submissionId"]))
+    assert call_wsgi(middleware, header, body)[0] == "403 Forbidden"
+
+    with pytest.raises(MissingSecretKeyException):
+        WebhookWSGIMiddleware(app, make_sdk(), URI)
+
+
+def test_wsgi_decrypts_attachments(server):
+    app = App()
+    middleware = WebhookWSGIMiddleware(
+        app, make_sdk(), URI, form.secret_key, attachments=True
+    )
+    header, body = webhook(form.submission(attachment_sizes=[10, 20], server=server))
+    assert call_wsgi(middleware, header, body)[0] == "200 OK"
+    attachments = app.environ["formsg.submission"]["attachments"]
+    assert [len(a["content"]) for a in attachments.values()] == [10, 20]
+
+
+def test_asgi_hands_app_decrypted_submission():
+    middleware = WebhookASGIMiddleware(
+        asgi_app, make_sdk(AsyncFormSdk), URI, form.secret_key
+    )
+    params = form.submission()
+    header, body = webhook(params)
+
+    scope, sent = call_asgi(middleware, header, body, chunk_size=100)
+    assert sent[0]["status"] == 200
+    assert sent[1]["body"] == body
+    submission = scope["formsg.submission"]
+    assert submission["submissionId"] == params["submissionId"]
+    assert len(submission["content"]["responses"]) == 5
+
+
+def test_asgi_rejections():
+    middleware = WebhookASGIMiddleware(
+        asgi_app, make_sdk(AsyncFormSdk), URI, form.secret_key, max_body_size=1024
+    )
+    header, body = webhook()
+
+    assert call_asgi(middleware, None, body)[1][0]["status"] == 401
+    assert call_asgi(middleware, "v1=x,t=1,s=x,f=x", body)[1][0]["status"] == 401
+    scope, sent = call_asgi(middleware, header, body * 2, chunk_size=100)
+    assert sent[0]["status"] == 413
+    assert "formsg.submission" not in scope
+    assert call_asgi(middleware, header, b"not json")[1][0]["status"] == 400
+    assert call_asgi(middleware, None, body, path="/other")[1][0]["status"] == 200
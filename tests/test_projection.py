@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from formsg.crypto import Crypto
+from formsg.result import DecryptFailureReason
+from formsg.testing import SyntheticForm, generate_responses
+from formsg.util.json_backend import JSON_BACKENDS, orjson
+from formsg.util.projection import project_fields
+
+RESPONSES = generate_responses(50)
+COMPACT = json.dumps(RESPONSES, separators=(",", ":")).encode()
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_project_fields(backend):
+    if backend == "orjson" and orjson is None:
+        pytest.skip("orjson is not installed")
+    json_backend = JSON_BACKENDS[backend]()
+    wanted = {RESPONSES[30]["_id"], RESPONSES[2]["_id"], RESPONSES[49]["_id"]}
+    assert project_fields(COMPACT, wanted, json_backend) == [
+        RESPONSES[2],
+        RESPONSES[30],
+        RESPONSES[49],
+    ]
+    assert project_fields(COMPACT, {"missing"}, json_backend) == []
+
+
+def test_project_fields_needs_formsg_layout():
+    json_backend = JSON_BACKENDS["json"]()
+    field_id = RESPONSES[0]["_id"]
+    assert (
+        project_fields(json.dumps(RESPONSES).encode(), {field_id}, json_backend) is None
+    )
+
+    # an answer that looks like the start of a field is escaped in JSON
+    tricky = [dict(RESPONSES[0], answer='{"_id":"' + RESPONSES[1]["_id"] + '"')]
+    tricky += RESPONSES[1:3]
+    plaintext = json.dumps(tricky, separators=(",", ":")).encode()
+    assert project_fields(plaintext, {RESPONSES[1]["_id"]}, json_backend) == [
+        RESPONSES[1]
+    ]
+
+
+def test_decrypt_projection():
+    form = SyntheticForm(field_count=50)
+    crypto = Crypto(form.signing_public_key)
+    params = form.submission(verified=True)
+    full = crypto.decrypt(form.secret_key, params)
+    wanted = [full["responses"][10]["_id"], full["responses"][3]["_id"]]
+
+    projected = crypto.decrypt(form.secret_key, params, fields=wanted)
+    assert projected["responses"] == [full["responses"][3], full["responses"][10]]
+    assert projected["verified"] == full["verified"]
+    assert (
+        crypto.decrypt_submission(form.secret_key, params, fields=wanted).answer(
+            wanted[0]
+        )
+        == full["responses"][10]["answer"]
+    )
+
+    # content not serialized as FormSG does is parsed in full, then projected
+    params["encryptedContent"] = form.encrypt(json.dumps(full["responses"]).encode())
+    assert crypto.decrypt(form.secret_key, params, fields=wanted) == projected
+
+
+def test_decrypt_attachments_projection(server):
+    form = SyntheticForm(field_count=5)
+    crypto = Crypto(form.signing_public_key)
+    params = form.submission(attachment_sizes=[10, 20, 30], server=server)
+    attachment_ids = list(params["attachmentDownloadUrls"])
+    wanted = [attachment_ids[1], "missing"]
+
+    count = server.request_count
+    result = crypto.decrypt_attachments(form.secret_key, params, fields=wanted)
+    assert server.request_count == count + 1
+    assert [r["_id"] for r in result["content"]["responses"]] == [attachment_ids[1]]
+    assert [len(a["content"]) for a in result["attachments"].values()] == [20]
+
+
+def test_decrypt_projection_of_deep_field():
+    form = SyntheticForm(field_count=3)
+    crypto = Crypto(form.signing_public_key, json_backend="json")
+    responses = generate_responses(3)
+    # the second field nests deeper than `json` can parse
+    responses[1]["answerArray"] = "deep"  # type: ignore
+    plaintext = json.dumps(responses, separators=(",", ":"))
+    plaintext = plaintext.replace('"deep"', "[" * 5000 + "]" * 5000)
+    params = form.submission()
+    params["encryptedContent"] = form.encrypt(plaintext.encode())
+
+    result = crypto.decrypt_result(
+        form.secret_key, params, fields=[responses[1]["_id"]]
+    )
+    assert result.reason is DecryptFailureReason.TOO_DEEP
@@ -0,0 +1,202 @@
+import json
+import time
+
+from formsg.crypto import Crypto
+from formsg.keyring import FormKeyring
+from formsg.middleware import WebhookASGIMiddleware, WebhookWSGIMiddleware
+from formsg.spool import Spool, SpoolWorker
+from formsg.testing import SyntheticForm
+from tests.helpers import (
+    URI,
+    App,
+    asgi_app,
+    call_asgi,
+    call_wsgi,
+    make_sdk,
+    webhook,
+    webhook_form,
+)
+
+form = SyntheticForm(field_count=5)
+
+
+def spooled(spool, params=None):
+    params = params or form.submission()
+    body = json.dumps({"data": params}).encode()
+    return spool.put(form.signature_header(URI, params["submissionId"]), body)
+
+
+def test_claims_hide_webhooks_until_they_time_out(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("formsg.spool.time.time", lambda: now[0])
+    spool = Spool(str(tmp_path / "spool.db"), visibility_timeout=10, max_attempts=2)
+    first, second = spooled(spool), spooled(spool)
+
+    [message] = spool.claim()
+    assert (message.id, message.attempts) == (first, 1)
+    assert spool.depth() == {"ready": 1, "in_flight": 1, "dead": 0}
+    assert [m.id for m in spool.claim(limit=5)] == [second]
+    assert spool.claim() == []
+
+    # the worker crashed, so the webhook is delivered again
+    now[0] += 11
+    [message, _] = spool.claim(limit=2)
+    assert (message.id, message.attempts) == (first, 2)
+    spool.ack(message)
+
+    now[0] += 11
+    assert spool.claim() == []
+    [dead] = spool.dead_letters()
+    assert dead.id == second and "visibility timeout" in dead.error
+    assert spool.depth() == {"ready": 0, "in_flight": 0, "dead": 1}
+
+
+def test_released_webhooks_are_retried_then_dead_lettered(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("formsg.spool.time.time", lambda: now[0])
+    spool = Spool(str(tmp_path / "spool.db"), max_attempts=2, retry_delay=5)
+    id = spooled(spool)
+
+    [message] = spool.claim()
+    spool.release(message, "try again")
+    assert spool.claim() == []
+    now[0] += 5
+    [message] = spool.claim()
+    spool.release(message, "failed again")
+    [dead] = spool.dead_letters()
+    assert (dead.id, dead.attempts, dead.error) == (id, 2, "failed again")
+
+    assert spool.requeue() == 1
+    assert spool.claim()[0].attempts == 1
+    assert spool.depth()["dead"] == 0
+
+
+def test_spool_survives_reopening(tmp_path):
+    path = str(tmp_path / "spool.db")
+    spool = Spool(path)
+    id = spooled(spool)
+    spool.close()
+    assert [m.id for m in Spool(path).claim()] == [id]
+
+
+def test_worker_decrypts_and_handles_webhooks(tmp_path):
+    spool = Spool(str(tmp_path / "spool.db"))
+    stages = []
+    crypto = Crypto(
+        form.signing_public_key,
+        keyring=FormKeyring({form.form_id: form.secret_key}),
+        observer=lambda stage, duration, size: stages.append(stage),
+    )
+    handled = []
+    worker = SpoolWorker(spool, crypto, handled.append)
+    params = form.submission(verified=True)
+    spooled(spool, params)
+
+    assert worker.drain() == 1
+    [submission] = handled
+    assert submission["submissionId"] == params["submissionId"]
+    assert len(submission["content"]["responses"]) == 5
+    assert submission["content"]["verified"]
+    assert stages[0] == "spool_wait" and stages[-1] == "spool_process"
+    stats = worker.stats()
+    assert stats["handled"] == 1 and stats["spool_ready"] == 0
+
+
+def test_worker_dead_letters_undecryptable_webhooks(tmp_path):
+    spool = Spool(str(tmp_path / "spool.db"), retry_delay=0)
+    crypto = Crypto(form.signing_public_key)
+    failures = []
+
+    def handler(submission):
+        failures.append(submission)
+        raise RuntimeError("database is down")
+
+    worker = SpoolWorker(spool, crypto, handler, form.secret_key)
+    spool.put("header", b"not json")
+    spooled(spool, SyntheticForm(field_count=5, seed=1).submission())
+    spooled(spool)
+
+    worker.drain()
+    assert [m.error for m in spool.dead_letters()] == [
+        "Body is not a webhook",
+        "wrong_key",
+        "Handler failed: RuntimeError('database is down')",
+    ]
+    assert len(failures) == spool.max_attempts
+    assert [m.attempts for m in spool.dead_letters()] == [1] + [spool.max_attempts] * 2
+    assert worker.stats()["dead"] == 3
+    assert worker.stats()["retried"] == 2 * (spool.max_attempts - 1)
+
+
+def test_worker_threads_drain_spool(tmp_path, server):
+    spool = Spool(str(tmp_path / "spool.db"))
+    handled = []
+    worker = SpoolWorker(
+        spool,
+        Crypto(form.signing_public_key),
+        handled.append,
+        form.secret_key,
+        attachments=True,
+        poll_interval=0.01,
+    )
+    for _ in range(10):
+        spooled(spool, form.submission(attachment_sizes=[100], server=server))
+    with worker:
+        deadline = time.monotonic() + 10
+        while len(handled) < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert len(handled) == 10
+    assert all(len(s["attachments"]) == 1 for s in handled)
+    assert spool.depth() == {"ready": 0, "in_flight": 0, "dead": 0}
+
+
+def test_worker_stops_with_backlog(tmp_path):
+    spool = Spool(str(tmp_path / "spool.db"))
+    handled = []
+
+    def handler(submission):
+        handled.append(submission)
+        time.sleep(0.05)
+
+    worker = SpoolWorker(
+        spool, Crypto(form.signing_public_key), handler, form.secret_key
+    )
+    for _ in range(40):
+        spooled(spool)
+    worker.start()
+    while not handled:
+        time.sleep(0.01)
+    threads = worker._threads
+    worker.stop(timeout=1)
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(handled) < 40 and spool.depth()["ready"] == 40 - len(handled)
+
+
+def test_middleware_spools_authenticated_webhooks(tmp_path):
+    spool = Spool(str(tmp_path / "spool.db"))
+    app = App()
+    middleware = WebhookWSGIMiddleware(app, make_sdk(), URI, spool=spool)
+    header, body = webhook()
+
+    assert call_wsgi(middleware, header, body)[0] == "202 Accepted"
+    assert call_wsgi(middleware, "garbage", body)[0] == "401 Unauthorized"
+    assert app.environ is None
+    [message] = spool.claim()
+    assert (message.header, message.body) == (header, body)
+
+    handled = []
+    SpoolWorker(
+        spool, make_sdk().crypto, handled.append, webhook_form.secret_key
+    ).process(message)
+    assert handled[0]["submissionId"] == json.loads(body)["data"]["submissionId"]
+
+
+def test_asgi_middleware_spools_with_sync_sdk(tmp_path):
+    spool = Spool(str(tmp_path / "spool.db"))
+    middleware = WebhookASGIMiddleware(asgi_app, make_sdk(), URI, spool=spool)
+    header, body = webhook()
+
+    _, sent = call_asgi(middleware, header, body)
+    assert sent[0]["status"] == 202
+    [message] = spool.claim()
+    assert (message.header, message.body) == (header, body)
@@ -0,0 +1,78 @@
+import pytest
+
+from formsg.crypto import Crypto
+from formsg.exceptions import VerifiedContentException
+from formsg.submission import Field, Submission
+from formsg.testing import SyntheticForm
+from tests.helpers import plain_text
+
+RESPONSES = plain_text
+CHECKBOX_ID = "5e771c7a6b3c5100240368e0"
+EMAIL_ID = "5e7479a086eaf2002488a20e"
+
+
+def test_field_is_compact_mapping():
+    response = RESPONSES[9]
+    field = Field(response)
+    assert not hasattr(field, "__dict__")
+    assert field == response
+    assert field["answerArray"] == field.answer_array == ["Option 2"]
+    assert field.answer is None and "answer" not in field
+    with pytest.raises(KeyError):
+        field["answer"]
+
+
+def test_submission_looks_fields_up_by_id():
+    submission = Submission(RESPONSES)
+    assert submission == {"responses": RESPONSES}
+    assert submission["responses"] is RESPONSES
+    assert submission.field(EMAIL_ID).answer == "test@open.gov.sg"
+    assert submission.field(EMAIL_ID) is submission.field(EMAIL_ID)
+    assert submission.answer(CHECKBOX_ID) == ["Option 2"]
+    assert submission.answer("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        submission.field("missing")
+    assert [field.id for field in submission.fields()] == [
+        response["_id"] for response in RESPONSES
+    ]
+    assert submission.verified is None and "verified" not in submission
+
+
+def test_decrypt_submission_opens_verified_content_lazily():
+    form = SyntheticForm(field_count=10)
+    stages = []
+    crypto = Crypto(
+        form.signing_public_key,
+        observer=lambda stage, duration, size: stages.append(stage),
+    )
+    params = form.submission(verified=True)
+
+    submission = crypto.decrypt_submission(form.secret_key, params)
+    assert "verified_content_open" not in stages
+    assert "verified" in submission
+    assert submission.verified["transactionId"] == params["submissionId"]
+    assert stages.count("verified_content_open") == 1
+    assert dict(submission) == crypto.decrypt(form.secret_key, params)
+    assert stages.count("verified_content_open") == 2
+
+    assert crypto.decrypt_submission(SyntheticForm(seed=1).secret_key, params) is None
+
+
+def test_invalid_verified_content_raises_when_read():
+    form, other = SyntheticForm(field_count=10), SyntheticForm(seed=1)
+    params = form.submission(verified=True)
+    # signed with another signing key
+    params["verifiedContent"] = other.submission(verified=True)["verifiedContent"]
+    crypto = Crypto(form.signing_public_key)
+
+    submission = crypto.decrypt_submission(form.secret_key, params)
+    assert len(submission.responses) == 10
+    with pytest.raises(VerifiedContentException):
+        submission.verified
+    # each call is counted once, however often `verified` is read
+    with pytest.raises(VerifiedContentException):
+        submission.verified
+    assert crypto.counters.snapshot()["ok"] == 1
+    assert crypto.decrypt(form.secret_key, params) is None
+    counts = crypto.counters.snapshot()
+    assert (counts["ok"], counts["verified_signature"]) == (1, 1)
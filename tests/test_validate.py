@@ -0,0 +1,72 @@
+import copy
+
+from formsg.crypto import Crypto
+from formsg.util.validate import (
+    FormSchema,
+    determine_is_form_fields,
+    is_strict_form_fields,
+)
+from tests.helpers import cipertext, plain_text
+
+PUBLIC_KEY = "KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM="
+FORM_SECRET_KEY = "H7B0nKJ+E7+naSkQApxGayz1y/lZe4thta4iPp1B+Ns="
+
+
+def table_field(answer_array):
+    return {
+        "_id": "table",
+        "question": "Table",
+        "fieldType": "table",
+        "answerArray": answer_array,
+    }
+
+
+def test_basic_validation():
+    assert determine_is_form_fields(plain_text)
+    assert determine_is_form_fields([])
+    assert not determine_is_form_fields({})
+    assert not determine_is_form_fields(plain_text + ["not a field"])
+    assert not determine_is_form_fields([{"_id": "a", "fieldType": "number"}])
+
+
+def test_strict_validation_checks_shape_of_each_type():
+    assert is_strict_form_fields(plain_text)
+    assert is_strict_form_fields([table_field([["a", "b"], ["c", "d"]])])
+    # a table answer must be a list of rows, each a list of strings
+    assert determine_is_form_fields([table_field(["a", "b"])])
+    assert not is_strict_form_fields([table_field(["a", "b"])])
+    assert not is_strict_form_fields([table_field([["a", 1]])])
+
+    checkbox = {"_id": "c", "question": "C", "fieldType": "checkbox", "answer": "a"}
+    assert not is_strict_form_fields([checkbox])
+    yes_no = {"_id": "y", "question": "Y", "fieldType": "yes_no", "answer": "Maybe"}
+    assert not is_strict_form_fields([yes_no])
+
+
+def test_compiled_schema():
+    schema = FormSchema.compile(plain_text)
+    assert len(schema) == len(plain_text)
+    assert schema.validate(plain_text)
+    assert schema.validate(plain_text[:3])
+
+    unknown = copy.deepcopy(plain_text)
+    unknown[0]["_id"] = "somethingElse"
+    assert not schema.validate(unknown)
+
+    changed_type = copy.deepcopy(plain_text)
+    changed_type[1]["fieldType"] = "table"
+    assert not schema.validate(changed_type)
+
+
+def test_crypto_uses_validator():
+    params = {"encryptedContent": cipertext, "version": 1}
+    assert Crypto(PUBLIC_KEY, validator=is_strict_form_fields).decrypt(
+        FORM_SECRET_KEY, params
+    )
+    assert Crypto(PUBLIC_KEY, validator=FormSchema.compile(plain_text)).decrypt(
+        FORM_SECRET_KEY, params
+    )
+    result = Crypto(
+        PUBLIC_KEY, validator=FormSchema.compile(plain_text[1:])
+    ).decrypt_result(FORM_SECRET_KEY, params)
+    assert result.reason.value == "schema_violation"
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from formsg.crypto import Crypto
+from formsg.exceptions import (
+    MissingPublicKeyException,
+    MissingSecretKeyException,
+    MissingTransactionExpiryException,
+)
+from formsg.sdk import FormSdk
+from formsg.testing import SyntheticForm, generate_responses
+from formsg.util.crypto import generate_signing_keypair
+from formsg.util.verification import sign_field
+from formsg.verification import Verification
+
+KEYPAIR = generate_signing_keypair(b"\x01" * 32)
+FORM_ID = "5e771c7a6b3c5100240368e0"
+TRANSACTION_ID = "5e771c7a6b3c5100240368e1"
+EXPIRY = 14400
+
+
+def signed_responses(created_at: int, field_count: int = 10):
+    """
+    Generated responses with every third field signed as verified shortly before created_at.
+    """
+    responses = generate_responses(field_count)
+    for response in responses[::3]:
+        response["answer"] = "test@open.gov.sg"
+        response["signature"] = sign_field(
+            TRANSACTION_ID,
+            FORM_ID,
+            response["_id"],
+            response["answer"],
+            KEYPAIR["secretKey"],
+            created_at - 1000,
+        )
+    return responses
+
+
+def test_authenticate_verified_field():
+    verification = Verification(
+        KEYPAIR["publicKey"], KEYPAIR["secretKey"], transaction_expiry=EXPIRY
+    )
+    field = {"fieldId": "field", "answer": "+6598765432"}
+    signature = verification.generate_signature(
+        dict(field, transactionId=TRANSACTION_ID, formId=FORM_ID)  # type: ignore
+    )
+    created_at = int(time.time() * 1000) + 1000
+    options = dict(field, signatureString=signature, submissionCreatedAt=created_at)
+    assert verification.authenticate(options)  # type: ignore
+    assert not verification.authenticate(dict(options, answer="+6512345678"))  # type: ignore
+
+    # the field must be verified before the submission, and within the expiry
+    assert not verification.authenticate(dict(options, submissionCreatedAt=created_at - 2000))  # type: ignore
+    assert not verification.authenticate(dict(options, submissionCreatedAt=created_at + EXPIRY * 1000))  # type: ignore
+    assert not verification.authenticate(dict(options, signatureString="garbage"))  # type: ignore
+
+    other = generate_signing_keypair()["publicKey"]
+    assert not verification.authenticate(dict(options, publicKey=other))  # type: ignore
+    assert Verification(other, transaction_expiry=EXPIRY).authenticate(
+        dict(options, publicKey=KEYPAIR["publicKey"])  # type: ignore
+    )
+
+
+def test_authenticate_submission():
+    created_at = int(time.time() * 1000)
+    responses = signed_responses(created_at)
+    responses[3]["answer"] = "tampered@open.gov.sg"
+    verification = Verification(KEYPAIR["publicKey"], transaction_expiry=EXPIRY)
+
+    expected = {responses[i]["_id"]: i != 3 for i in (0, 3, 6, 9)}
+    assert verification.authenticate_submission(responses, created_at) == expected
+    assert (
+        verification.authenticate_submission({"responses": responses}, created_at)
+        == expected
+    )
+    assert verification.authenticate_submission(generate_responses(5), 0) == {}
+
+
+def test_authenticate_decrypted_submission():
+    created_at = int(time.time() * 1000)
+    form = SyntheticForm()
+    crypto = Crypto(form.signing_public_key)
+    params = form.submission()
+    params["encryptedContent"] = crypto.encrypt(
+        signed_responses(created_at), form.public_key
+    )
+    sdk = FormSdk(
+        "PRODUCTION",
+        verification_public_key=KEYPAIR["publicKey"],
+        transaction_expiry=EXPIRY,
+    )
+
+    submission = crypto.decrypt_submission(form.secret_key, params)
+    results = sdk.verification.authenticate_submission(submission, created_at)  # type: ignore
+    assert len(results) == 4 and all(results.values())
+
+
+def test_verification_needs_keys_and_expiry():
+    options = {
+        "signatureString": "f=a,v=b,t=1,s=c",
+        "submissionCreatedAt": 2,
+        "fieldId": "field",
+        "answer": "answer",
+    }
+    with pytest.raises(MissingPublicKeyException):
+        Verification(transaction_expiry=EXPIRY).authenticate(options)  # type: ignore
+    with pytest.raises(MissingTransactionExpiryException):
+        Verification(KEYPAIR["publicKey"]).authenticate_submission([], 0)
+    with pytest.raises(MissingSecretKeyException):
+        Verification(KEYPAIR["publicKey"]).generate_signature(
+            {"transactionId": "t", "formId": "f", "fieldId": "i", "answer": "a"}
+        )
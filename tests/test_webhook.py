@@ -1,6 +1,9 @@
 import datetime
+import time
 
 import pytest
+from formsg.exceptions import WebhookAuthenticateException, WebhookReplayException
+from formsg.replay import MemoryReplayCache, RedisReplayCache, ReplayCache
 from formsg.webhook import Webhook
 
 PUBLIC_KEY = "KUY1XT30ar+XreVjsS1w/c3EpDs2oASbF6G3evvaUJM="
@@ -49,3 +52,98 @@ class TestWebhooks:
             }
         )
         assert self.webhooks().authenticate(header, uri)
+
+    def test_verify_key_is_shared_between_instances(self):
+        # the key is loaded on the first webhook
+        first, second = self.webhooks(), self.webhooks()
+        header = self.header()
+        assert first.authenticate(header, uri) and second.authenticate(header, uri)
+        assert first._verify_key is not None
+        assert first._verify_key is second._verify_key
+
+    def header(self, epoch=None, submission=submission_id):
+        epoch = epoch or int(time.time() * 1000)
+        signature = self.webhooks().generate_signature(
+            {"uri": uri, "submissionId": submission, "formId": form_id, "epoch": epoch}
+        )
+        return self.webhooks().construct_header(
+            {
+                "epoch": epoch,
+                "submissionId": submission,
+                "formId": form_id,
+                "signature": signature,
+            }
+        )
+
+    def test_rejects_stale_epoch_before_verifying_signature(self, monkeypatch):
+        def fail(*args):
+            raise AssertionError("signature was verified")
+
+        monkeypatch.setattr("formsg.webhook.is_signature_valid", fail)
+        header = self.header(epoch=int(time.time() * 1000) - 301000)
+        with pytest.raises(WebhookAuthenticateException, match="not recent"):
+            self.webhooks().authenticate(header, uri)
+
+    def test_rejects_replays(self):
+        cache = MemoryReplayCache()
+        webhooks = Webhook(PUBLIC_KEY, replay_cache=cache)
+        header = self.header()
+        assert webhooks.authenticate(header, uri)
+        with pytest.raises(WebhookReplayException):
+            webhooks.authenticate(header, uri)
+        assert webhooks.authenticate(self.header(submission="other"), uri)
+        assert len(cache) == 2
+
+        # forged webhooks are not recorded
+        forged = self.header(submission="forged").replace("v1=", "v1=AAAA")
+        with pytest.raises(WebhookAuthenticateException):
+            webhooks.authenticate(forged, uri)
+        assert len(cache) == 2
+
+    def test_shared_replay_cache(self):
+        class FakeRedis(object):
+            def __init__(self):
+                self.values = {}
+
+            def set(self, name, value, nx=False, px=None):
+                assert nx and 0 < px <= 301000
+                if name in self.values:
+                    return None
+                self.values[name] = value
+                return True
+
+        client = FakeRedis()
+        workers = [
+            Webhook(PUBLIC_KEY, replay_cache=RedisReplayCache(client)) for _ in range(2)
+        ]
+        header = self.header()
+        assert workers[0].authenticate(header, uri)
+        with pytest.raises(WebhookReplayException):
+            workers[1].authenticate(header, uri)
+        assert all(key.startswith("formsg:webhook:") for key in client.values)
+
+
+def test_memory_replay_cache_expires_and_is_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("formsg.replay.time.monotonic", lambda: now[0])
+    cache = MemoryReplayCache(max_entries=3)
+    assert cache.add("a", 10)
+    assert not cache.add("a", 10)
+    assert "a" in cache
+
+    now[0] += 11
+    assert "a" not in cache
+    assert cache.add("a", 10)
+
+    for key in "bcd":
+        assert cache.add(key, 10)
+    assert len(cache) == 3
+    assert "a" not in cache
+
+
+def test_replay_cache_must_implement_add():
+    class Incomplete(ReplayCache):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()